@@ -0,0 +1,154 @@
+"""Generator of synthetic Camunda Modeler DMN files, used by benchmarks"""
+
+import argparse
+import json
+import random
+import xml.etree.ElementTree
+from pathlib import Path
+
+
+namespace = 'https://www.omg.org/spec/DMN/20191111/MODEL/'
+
+
+def generate(path, decisions=10, depth=3, width=3, rules=20, values=10,
+             hit_policy='FIRST', wildcard=0.3, seed=0):
+    """Generates a DMN file. Decisions are split into layers, decisions of
+    the first layer depend only on input variables, while each decision of
+    other layers depends on at least one decision of the previous layer.
+    Every variable, including decisions, has values ``"v0"``, ``"v1"``...
+
+    Rules of tables with FIRST hit policy contain wildcards and end with a
+    rule that matches all inputs. Rules of other tables don't contain
+    wildcards and have distinct input entries, so that UNIQUE and ANY hit
+    policies aren't violated.
+
+    Args:
+        path (pathlib.Path): output path
+        decisions (int): number of decisions
+        depth (int): number of decision layers
+        width (int): number of inputs of each decision table
+        rules (int): number of rules of each decision table
+        values (int): number of distinct values of each variable
+        hit_policy (str): hit policy of all decision tables
+        wildcard (float): probability of an input entry being a wildcard
+        seed (int): random seed
+
+    Returns:
+        Dict[str, List[str]]: decision names and names of their inputs"""
+    randomizer = random.Random(seed)
+    inputs = [f'Input {i}' for i in range(max(width, decisions // depth))]
+    layers = [[] for _ in range(min(depth, decisions))]
+    for i in range(decisions):
+        layers[i * len(layers) // decisions].append(f'Decision {i}')
+
+    xml.etree.ElementTree.register_namespace('', namespace)
+    root = xml.etree.ElementTree.Element(_tag('definitions'), {
+        'id': 'Definitions_1', 'name': 'DRD',
+        'namespace': 'http://camunda.org/schema/1.0/dmn'})
+    dependencies = {}
+    available = list(inputs)
+    ids = {}
+    for layer_index, layer in enumerate(layers):
+        previous = layers[layer_index - 1] if layer_index > 0 else []
+        for name in layer:
+            table_inputs = [randomizer.choice(previous)] if previous else []
+            candidates = [candidate for candidate in available
+                          if candidate not in table_inputs]
+            table_inputs.extend(randomizer.sample(
+                candidates, min(width - len(table_inputs), len(candidates))))
+            dependencies[name] = table_inputs
+            ids[name] = f'Decision_{len(ids)}'
+            root.append(_decision(randomizer, ids, name, table_inputs, rules,
+                                  values, hit_policy, wildcard))
+        available.extend(layer)
+    xml.etree.ElementTree.ElementTree(root).write(
+        path, encoding='UTF-8', xml_declaration=True)
+    return dependencies
+
+
+def _decision(randomizer, ids, name, inputs, rule_count, values, hit_policy,
+              wildcard):
+    decision = xml.etree.ElementTree.Element(_tag('decision'), {
+        'id': ids[name], 'name': name})
+    for input_name in inputs:
+        if input_name in ids:
+            requirement = xml.etree.ElementTree.SubElement(
+                decision, _tag('informationRequirement'))
+            xml.etree.ElementTree.SubElement(
+                requirement, _tag('requiredDecision'),
+                {'href': f'#{ids[input_name]}'})
+    table = xml.etree.ElementTree.SubElement(
+        decision, _tag('decisionTable'),
+        {'id': f'Table_{ids[name]}', 'hitPolicy': hit_policy})
+    for i, input_name in enumerate(inputs):
+        input_element = xml.etree.ElementTree.SubElement(
+            table, _tag('input'), {'id': f'Input_{ids[name]}_{i}'})
+        expression = xml.etree.ElementTree.SubElement(
+            input_element, _tag('inputExpression'),
+            {'id': f'InputExpression_{ids[name]}_{i}', 'typeRef': 'string'})
+        _text(expression, input_name)
+    xml.etree.ElementTree.SubElement(table, _tag('output'), {
+        'id': f'Output_{ids[name]}', 'name': name, 'typeRef': 'string'})
+
+    entries = []
+    if hit_policy == 'FIRST':
+        for _ in range(rule_count - 1):
+            entries.append([None if randomizer.random() < wildcard
+                            else _value(randomizer, values)
+                            for _ in inputs])
+        entries.append([None] * len(inputs))
+    else:
+        rule_count = min(rule_count, values ** len(inputs))
+        keys = set()
+        while len(entries) < rule_count:
+            key = tuple(_value(randomizer, values) for _ in inputs)
+            if key not in keys:
+                keys.add(key)
+                entries.append(list(key))
+    for i, input_entries in enumerate(entries):
+        rule = xml.etree.ElementTree.SubElement(
+            table, _tag('rule'), {'id': f'Rule_{ids[name]}_{i}'})
+        for j, value in enumerate(input_entries):
+            entry = xml.etree.ElementTree.SubElement(
+                rule, _tag('inputEntry'),
+                {'id': f'InputEntry_{ids[name]}_{i}_{j}'})
+            _text(entry, None if value is None else json.dumps(value))
+        entry = xml.etree.ElementTree.SubElement(
+            rule, _tag('outputEntry'), {'id': f'OutputEntry_{ids[name]}_{i}'})
+        _text(entry, json.dumps(_value(randomizer, values)))
+    return decision
+
+
+def _text(parent, text):
+    element = xml.etree.ElementTree.SubElement(parent, _tag('text'))
+    element.text = text
+
+
+def _tag(name):
+    return f'{{{namespace}}}{name}'
+
+
+def _value(randomizer, values):
+    return f'v{randomizer.randrange(values)}'
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generates a synthetic Camunda Modeler DMN file.')
+    parser.add_argument('path', type=Path, help='Output path.')
+    parser.add_argument('--decisions', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--width', type=int, default=3)
+    parser.add_argument('--rules', type=int, default=20)
+    parser.add_argument('--values', type=int, default=10)
+    parser.add_argument('--hit-policy', default='FIRST',
+                        choices=['FIRST', 'UNIQUE', 'ANY'])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate(args.path, decisions=args.decisions, depth=args.depth,
+             width=args.width, rules=args.rules, values=args.values,
+             hit_policy=args.hit_policy, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
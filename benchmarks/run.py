@@ -0,0 +1,285 @@
+"""Benchmark harness, measures performance of ruly-dmn on a generated model
+and writes the results as JSON"""
+
+import argparse
+import concurrent.futures
+import datetime
+import json
+import multiprocessing
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import ruly
+
+import generate
+import ruly_dmn.artifact
+import ruly_dmn.common
+import ruly_dmn.dmn
+import ruly_dmn.knowledge_base
+import ruly_dmn.shared
+import ruly_dmn.table
+from ruly_dmn.handlers.camunda_modeler import CamundaModelerHandler
+
+
+default_config = {'decisions': 20,
+                  'depth': 4,
+                  'width': 3,
+                  'rules': 50,
+                  'values': 10,
+                  'hit_policy': 'FIRST',
+                  'records': 2000,
+                  'updates': 20,
+                  'workers': 4,
+                  'seed': 0}
+
+
+def run(config, directory):
+    """Runs all benchmarks
+
+    Args:
+        config (Dict[str, Any]): generated model and benchmark parameters, see
+            :data:`default_config`
+        directory (pathlib.Path): directory for generated files
+
+    Returns:
+        Dict[str, Any]: results"""
+    path = directory / 'model.dmn'
+    dependencies = generate.generate(
+        path, decisions=config['decisions'], depth=config['depth'],
+        width=config['width'], rules=config['rules'],
+        values=config['values'], hit_policy=config['hit_policy'],
+        seed=config['seed'])
+    goal = list(dependencies)[-1]
+    inputs = sorted(set(name for names in dependencies.values()
+                        for name in names) - set(dependencies))
+    randomizer = random.Random(config['seed'])
+    records = [{name: f'v{randomizer.randrange(config["values"])}'
+                for name in inputs}
+               for _ in range(config['records'])]
+
+    shared_path = ruly_dmn.shared.dump(CamundaModelerHandler(path),
+                                       directory / 'model.shm')
+    return {'parse': _parse(path, directory),
+            'decide': {'linear': _decide(path, goal, records, False),
+                       'indexed': _decide(path, goal, records, True),
+                       'compiled': _decide(path, goal, records, False,
+                                           compiled=True),
+                       'shared': _latencies(
+                           ruly_dmn.shared.load(shared_path), goal,
+                           records)},
+            'decide_many': _decide_many(path, goal, records),
+            'update': _update(path, directory, goal, inputs,
+                              config['updates']),
+            'memory': _memory(path, goal, records),
+            'workers': _workers(path, shared_path, goal, records,
+                                config['workers']),
+            'tables': _tables(path)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs ruly-dmn benchmarks.')
+    parser.add_argument('--output', '-o', type=Path, default=None,
+                        help='Path of the JSON results, printed to the '
+                        'standard output if not set.')
+    for name, value in default_config.items():
+        parser.add_argument(f'--{name.replace("_", "-")}', type=type(value),
+                            default=value)
+    args = parser.parse_args()
+    config = {name: getattr(args, name) for name in default_config}
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = run(config, Path(directory))
+    report = {'timestamp': datetime.datetime.now().isoformat(),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'config': config,
+              'results': results}
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text)
+
+
+class _NoRuleFactory(ruly_dmn.common.RuleFactory):
+
+    def create_rule(self, state, fired_rules, output_names):
+        return None
+
+
+def _dmn(handler, indexed=False, compiled=False):
+    return ruly_dmn.dmn.DMN(handler, lambda _: _NoRuleFactory(),
+                            indexed=indexed, compiled=compiled)
+
+
+def _parse(path, directory):
+    artifact_path = ruly_dmn.artifact.compile_model(
+        path, directory / 'model.compiled')
+    return {
+        'eager_s': _duration(lambda: CamundaModelerHandler(path)),
+        'lazy_s': _duration(lambda: CamundaModelerHandler(path, lazy=True)),
+        'artifact_s': _duration(lambda: CamundaModelerHandler(
+            path, artifact_path=artifact_path))}
+
+
+def _decide(path, goal, records, indexed, compiled=False):
+    return _latencies(_dmn(CamundaModelerHandler(path), indexed, compiled),
+                      goal, records)
+
+
+def _latencies(model, goal, records):
+    latencies = []
+    for record in records:
+        start = time.perf_counter()
+        model.decide(record, goal)
+        latencies.append(time.perf_counter() - start)
+    return _percentiles(latencies)
+
+
+def _decide_many(path, goal, records):
+    dmn = _dmn(CamundaModelerHandler(path))
+    duration = _duration(lambda: dmn.decide_many(records, goal))
+    return {'duration_s': duration,
+            'records_per_s': len(records) / duration}
+
+
+def _update(path, directory, goal, inputs, count):
+    results = {}
+    for name, dump_path in [('update', None),
+                            ('update_dump', directory / 'dump.dmn')]:
+        handler = CamundaModelerHandler(path, dump_path)
+        knowledge_base = ruly_dmn.knowledge_base.KnowledgeBase(
+            *handler.rules)
+        durations = []
+        for i in range(count):
+            knowledge_base.insert(0, ruly.Rule(
+                ruly.Expression(ruly.Operator.AND, (
+                    ruly.EqualsCondition(inputs[0], f'new {i}'),)),
+                {goal: 'v0'}))
+            start = time.perf_counter()
+            handler.update(knowledge_base)
+            durations.append(time.perf_counter() - start)
+        handler.close()
+        results[name] = _percentiles(durations)
+    return results
+
+
+def _memory(path, goal, records):
+    tracemalloc.start()
+    try:
+        dmn = _dmn(CamundaModelerHandler(path), indexed=True)
+        for record in records:
+            dmn.decide(record, goal)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'peak_bytes': peak}
+
+
+def _workers(path, shared_path, goal, records, count):
+    results = {'count': count, 'shared_bytes': shared_path.stat().st_size}
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(
+            count, mp_context=context) as executor:
+        for name, model_path in [('parsed', path),
+                                 ('shared', shared_path)]:
+            allocated = list(executor.map(
+                _worker_memory, *zip(*[(name, model_path, goal, records)
+                                       for _ in range(count)])))
+            results[name] = {
+                'bytes_per_worker': statistics.fmean(allocated),
+                'total_bytes': sum(allocated)}
+    results['shared']['total_bytes'] += results['shared_bytes']
+    results['saved_bytes'] = (results['parsed']['total_bytes']
+                              - results['shared']['total_bytes'])
+    return results
+
+
+def _worker_memory(name, path, goal, records):
+    tracemalloc.start()
+    try:
+        if name == 'shared':
+            model = ruly_dmn.shared.load(path)
+        else:
+            model = _dmn(CamundaModelerHandler(path), indexed=True)
+        for record in records:
+            model.decide(record, goal)
+        allocated, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del model
+    return allocated
+
+
+def _tables(path):
+    handler = CamundaModelerHandler(path)
+    rules = handler.rules
+    rule_ids = [f'DecisionRule_{i}' for i in range(len(rules))]
+
+    def create_rules():
+        copies = [ruly.Rule(ruly.Expression(ruly.Operator.AND, tuple(
+            type(condition)(*condition)
+            for condition in rule.antecedent.children)),
+            dict(rule.consequent)) for rule in rules]
+        return (copies, list(zip(copies, rule_ids)),
+                {ruly_dmn.knowledge_base.rule_key(rule): rule_id
+                 for rule, rule_id in zip(copies, rule_ids)})
+
+    def create_tables():
+        tables = {name: ruly_dmn.table.DecisionTable(name, inputs)
+                  for name, inputs in handler.dependencies.items()}
+        for rule, rule_id in zip(rules, rule_ids):
+            [(name, value)] = rule.consequent.items()
+            conditions = {condition.name: condition
+                          for condition in rule.antecedent.children}
+            tables[name].append([conditions.get(input_name)
+                                 for input_name in tables[name].inputs],
+                                value, rule_id)
+        return tables
+
+    return {'rules': len(rules),
+            'rules_bytes': _allocated(create_rules),
+            'tables_bytes': _allocated(create_tables)}
+
+
+def _allocated(fn):
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = fn()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return after - before
+
+
+def _duration(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _percentiles(durations):
+    durations = sorted(durations)
+    return {'count': len(durations),
+            'mean_s': statistics.fmean(durations),
+            'p50_s': _percentile(durations, 0.5),
+            'p90_s': _percentile(durations, 0.9),
+            'p99_s': _percentile(durations, 0.99),
+            'max_s': durations[-1]}
+
+
+def _percentile(durations, fraction):
+    return durations[min(len(durations) - 1, int(len(durations) * fraction))]
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -35,6 +35,17 @@ def task_check():
     return {'actions': [], 'task_dep': ['test', 'lint']}
 
 
+def task_bench():
+    """Run benchmarks, results are written to build/bench.json"""
+    def run(args):
+        args = args or []
+        subprocess.run(
+            ['python', 'benchmarks/run.py', '-o', 'build/bench.json', *args],
+            check=True)
+
+    return {'actions': [run], 'pos_arg': 'args'}
+
+
 def task_docs():
     """Build docs"""
     def run(args):
@@ -1,16 +1,24 @@
 from ruly_dmn.common import (ModelHandler,
                              RuleFactory,
+                             AsyncRuleFactory,
                              HitPolicy)
 from ruly_dmn.dmn import (DMN,
                           HitPolicyViolation,
+                          LearnSummary,
+                          Session,
                           rule_factory_cb)
 from ruly_dmn.handlers.camunda_modeler import (CamundaModelerHandler)
+from ruly_dmn.planner import ModelError
 
 
 __all__ = ['DMN',
            'ModelHandler',
            'RuleFactory',
+           'AsyncRuleFactory',
            'HitPolicy',
            'HitPolicyViolation',
+           'LearnSummary',
+           'Session',
+           'ModelError',
            'rule_factory_cb',
            'CamundaModelerHandler']
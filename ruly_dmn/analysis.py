@@ -0,0 +1,313 @@
+import collections
+import ruly
+
+from ruly_dmn import common
+from ruly_dmn import conditions
+
+
+Issue = collections.namedtuple('Issue', ['kind', 'output_name', 'rules'])
+Issue.__doc__ = """Problem found in a decision table
+
+Kinds of issues:
+
+    * ``overlap`` - rules of a table with UNIQUE hit policy can fire for
+      the same inputs
+    * ``conflict`` - rules of a table with ANY hit policy can fire for the
+      same inputs and have different outputs
+    * ``unreachable`` - rule of a table with FIRST hit policy can never
+      fire first, because an earlier rule fires whenever it does
+    * ``redundant`` - rule of a table with ANY or PRIORITY hit policy never
+      changes the decision, because another rule with the same output fires
+      whenever it does
+
+Attributes:
+    kind (str): kind of the issue
+    output_name (str): table's output name
+    rules (Tuple[ruly.Rule, ruly.Rule]): affected rule, followed by the rule
+        that overlaps, conflicts with, shadows or subsumes it"""
+
+
+def analyze(rules, hit_policies):
+    """Finds issues in decision tables
+
+    Args:
+        rules (Iterable[ruly.Rule]): rules of the tables, in knowledge base
+            order
+        hit_policies (Dict[str, ruly_dmn.HitPolicy]): hit policies of the
+            tables
+
+    Returns:
+        List[ruly_dmn.analysis.Issue]: issues"""
+    issues = []
+    for output_name, table_rules in _tables(rules).items():
+        issues.extend(table_issues(output_name, table_rules,
+                                   hit_policies.get(output_name)))
+    return issues
+
+
+def table_issues(output_name, rules, hit_policy, new_rules=None):
+    """Finds issues in a single decision table. Rules are compared pairwise,
+    but only rules that can fire for the same inputs are compared - rules
+    are first split into buckets by the value of the variable most of them
+    compare for equality.
+
+    Args:
+        output_name (str): table's output name
+        rules (List[ruly.Rule]): table's rules, in table order
+        hit_policy (Optional[ruly_dmn.HitPolicy]): table's hit policy
+        new_rules (Optional[Iterable[ruly.Rule]]): if set, only issues
+            involving these rules are found, e.g. after they were added to
+            an analyzed table
+
+    Returns:
+        List[ruly_dmn.analysis.Issue]: issues"""
+    if hit_policy not in (common.HitPolicy.UNIQUE, common.HitPolicy.ANY,
+                          common.HitPolicy.FIRST, common.HitPolicy.PRIORITY):
+        return []
+    rule_conditions = [_rule_conditions(rule) for rule in rules]
+    new_ids = (None if new_rules is None
+               else {id(rule) for rule in new_rules})
+    issues = []
+    unreachable = set()
+    for i, j in _candidate_pairs(rule_conditions):
+        first, second = rules[i], rules[j]
+        if new_ids is not None and not ({id(first), id(second)} & new_ids):
+            continue
+        if hit_policy == common.HitPolicy.FIRST:
+            if j not in unreachable and _subsumes(rule_conditions[i],
+                                                  rule_conditions[j]):
+                unreachable.add(j)
+                issues.append(Issue('unreachable', output_name,
+                                    (second, first)))
+            continue
+        if not _overlaps(rule_conditions[i], rule_conditions[j]):
+            continue
+        if hit_policy == common.HitPolicy.UNIQUE:
+            issues.append(Issue('overlap', output_name, (first, second)))
+        elif first.consequent != second.consequent:
+            if hit_policy == common.HitPolicy.ANY:
+                issues.append(Issue('conflict', output_name,
+                                    (first, second)))
+        elif _subsumes(rule_conditions[i], rule_conditions[j]):
+            issues.append(Issue('redundant', output_name, (second, first)))
+        elif _subsumes(rule_conditions[j], rule_conditions[i]):
+            issues.append(Issue('redundant', output_name, (first, second)))
+    return issues
+
+
+def minimize(rules, hit_policies, issues=None):
+    """Removes unreachable and redundant rules, creating equivalent tables -
+    every decision made with the remaining rules is the same as the decision
+    made with all of them
+
+    Args:
+        rules (Iterable[ruly.Rule]): rules of the tables, in knowledge base
+            order
+        hit_policies (Dict[str, ruly_dmn.HitPolicy]): hit policies of the
+            tables
+        issues (Optional[List[ruly_dmn.analysis.Issue]]): issues found with
+            :func:`analyze`, if None, the rules are analyzed
+
+    Returns:
+        List[ruly.Rule]: remaining rules, in knowledge base order"""
+    rules = list(rules)
+    if issues is None:
+        issues = analyze(rules, hit_policies)
+    removed = {id(rule) for rule in removable_rules(issues)}
+    return [rule for rule in rules if id(rule) not in removed]
+
+
+def removable_rules(issues):
+    """Finds rules that can be removed from their tables without changing
+    any decision
+
+    Args:
+        issues (List[ruly_dmn.analysis.Issue]): issues found with
+            :func:`analyze`
+
+    Returns:
+        List[ruly.Rule]: rules that can be removed"""
+    removed = {}
+    for issue in issues:
+        if issue.kind in ('unreachable', 'redundant'):
+            removed.setdefault(id(issue.rules[0]), issue.rules[0])
+    return list(removed.values())
+
+
+def overlaps(rule, other):
+    """Checks whether two rules can fire for the same inputs. If it can't be
+    determined, e.g. because the values of their conditions can't be
+    compared, rules are considered overlapping.
+
+    Args:
+        rule (ruly.Rule): rule
+        other (ruly.Rule): other rule
+
+    Returns:
+        bool"""
+    return _overlaps(_rule_conditions(rule), _rule_conditions(other))
+
+
+def subsumes(rule, other):
+    """Checks whether a rule fires whenever another rule fires. If it can't
+    be determined, the rule isn't considered subsuming.
+
+    Args:
+        rule (ruly.Rule): rule
+        other (ruly.Rule): other rule
+
+    Returns:
+        bool"""
+    return _subsumes(_rule_conditions(rule), _rule_conditions(other))
+
+
+def _tables(rules):
+    tables = {}
+    for rule in rules:
+        for output_name in rule.consequent:
+            tables.setdefault(output_name, []).append(rule)
+    return tables
+
+
+def _rule_conditions(rule):
+    if isinstance(rule.antecedent, ruly.Expression):
+        if rule.antecedent.operator != ruly.Operator.AND:
+            return None
+        children = rule.antecedent.children
+    else:
+        children = [rule.antecedent]
+    rule_conditions = {}
+    for child in children:
+        if not isinstance(child, ruly.Condition) or \
+                child.name in rule_conditions:
+            return None
+        rule_conditions[child.name] = child
+    return rule_conditions
+
+
+def _candidate_pairs(rule_conditions):
+    counts = collections.Counter(
+        name for conditions_by_name in rule_conditions
+        if conditions_by_name is not None
+        for name, condition in conditions_by_name.items()
+        if isinstance(condition, ruly.EqualsCondition))
+    name = counts.most_common(1)[0][0] if len(counts) > 0 else None
+    buckets = {}
+    others = []
+    for index, conditions_by_name in enumerate(rule_conditions):
+        condition = (conditions_by_name or {}).get(name)
+        if not isinstance(condition, ruly.EqualsCondition):
+            others.append(index)
+            continue
+        try:
+            buckets.setdefault(condition.value, []).append(index)
+        except TypeError:
+            others.append(index)
+    pairs = []
+    for bucket in buckets.values():
+        pairs.extend((bucket[i], j) for i in range(len(bucket))
+                     for j in bucket[i + 1:])
+    bucketed = [index for bucket in buckets.values() for index in bucket]
+    for k, i in enumerate(others):
+        pairs.extend((i, j) for j in others[k + 1:])
+        pairs.extend((min(i, j), max(i, j)) for j in bucketed)
+    pairs.sort()
+    return pairs
+
+
+def _overlaps(first, second):
+    if first is None or second is None:
+        return True
+    return all(_intersects(first[name], second[name])
+               for name in first.keys() & second.keys())
+
+
+def _subsumes(first, second):
+    if first is None or second is None:
+        return False
+    return all(name in second and _subset(second[name], first[name])
+               for name in first)
+
+
+def _intersects(condition, other):
+    if isinstance(condition, ruly.EqualsCondition):
+        return conditions.satisfies(other, condition.value)
+    if isinstance(other, ruly.EqualsCondition):
+        return conditions.satisfies(condition, other.value)
+    if isinstance(condition, conditions.AnyCondition):
+        return any(_intersects(child, other)
+                   for child in condition.conditions)
+    if isinstance(other, conditions.AnyCondition):
+        return any(_intersects(condition, child)
+                   for child in other.conditions)
+    if isinstance(condition, conditions.NotCondition):
+        if isinstance(other, conditions.NotCondition):
+            return True
+        return not _subset(other, condition.condition)
+    if isinstance(other, conditions.NotCondition):
+        return not _subset(condition, other.condition)
+    if (isinstance(condition, conditions.RangeCondition)
+            and isinstance(other, conditions.RangeCondition)):
+        try:
+            return not _empty(_intersection(tuple(condition[1:]),
+                                            tuple(other[1:])))
+        except TypeError:
+            return False
+    return True
+
+
+def _subset(condition, other):
+    if isinstance(condition, ruly.EqualsCondition):
+        return conditions.satisfies(other, condition.value)
+    if isinstance(condition, conditions.AnyCondition):
+        return all(_subset(child, other) for child in condition.conditions)
+    if isinstance(other, conditions.NotCondition):
+        return not _intersects(condition, other.condition)
+    if not isinstance(condition, conditions.RangeCondition):
+        return False
+    other_intervals = conditions.intervals(other)
+    if other_intervals is None:
+        return False
+    remaining = [tuple(condition[1:])]
+    try:
+        for interval in other_intervals:
+            remaining = [part for remaining_interval in remaining
+                         for part in _difference(remaining_interval,
+                                                 interval)]
+    except TypeError:
+        return False
+    return len(remaining) == 0
+
+
+def _difference(interval, removed):
+    start, end, start_closed, end_closed = removed
+    parts = []
+    if start is not None:
+        parts.append(_intersection(interval,
+                                   (None, start, False, not start_closed)))
+    if end is not None:
+        parts.append(_intersection(interval,
+                                   (end, None, not end_closed, False)))
+    return [part for part in parts if not _empty(part)]
+
+
+def _intersection(interval, other):
+    start, start_closed = interval[0], interval[2]
+    if other[0] is not None and (start is None or other[0] > start):
+        start, start_closed = other[0], other[2]
+    elif other[0] is not None and other[0] == start:
+        start_closed = start_closed and other[2]
+    end, end_closed = interval[1], interval[3]
+    if other[1] is not None and (end is None or other[1] < end):
+        end, end_closed = other[1], other[3]
+    elif other[1] is not None and other[1] == end:
+        end_closed = end_closed and other[3]
+    return start, end, start_closed, end_closed
+
+
+def _empty(interval):
+    start, end, start_closed, end_closed = interval
+    if start is None or end is None:
+        return False
+    return start > end or (start == end and not (start_closed
+                                                 and end_closed))
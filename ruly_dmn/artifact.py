@@ -0,0 +1,95 @@
+import hashlib
+import marshal
+import pathlib
+import struct
+import sys
+
+from ruly_dmn.handlers import camunda_modeler
+
+
+version = 4
+"""int: version of the artifact format"""
+
+_magic = b'RULYDMN\0'
+_header = struct.Struct('>8sHBB32s')
+
+
+def default_artifact_path(path):
+    """Returns the path where the artifact of a DMN file is stored by default,
+    next to the DMN file
+
+    Args:
+        path (pathlib.Path): path to the DMN file
+
+    Returns:
+        pathlib.Path"""
+    path = pathlib.Path(path)
+    return path.with_name(f'{path.name}.compiled')
+
+
+def compile_model(path, artifact_path=None):
+    """Parses a Camunda Modeler DMN file and stores the parsed model into a
+    binary artifact. The artifact is keyed by a hash of the DMN file's
+    content, so it can be detected when it becomes stale.
+
+    Args:
+        path (pathlib.Path): path to the DMN file
+        artifact_path (Optional[pathlib.Path]): path of the artifact, if None,
+            :func:`default_artifact_path` is used
+
+    Returns:
+        pathlib.Path: path of the artifact"""
+    if artifact_path is None:
+        artifact_path = default_artifact_path(path)
+    digest = content_hash(path)
+    handler = camunda_modeler.CamundaModelerHandler(path)
+    payload = marshal.dumps(handler.export_model())
+    with open(artifact_path, 'wb') as f:
+        f.write(_header.pack(_magic, version, *sys.version_info[:2], digest))
+        f.write(payload)
+    return pathlib.Path(artifact_path)
+
+
+def read(artifact_path, path=None):
+    """Reads the model stored in an artifact
+
+    Args:
+        artifact_path (pathlib.Path): path of the artifact
+        path (Optional[pathlib.Path]): path to the DMN file, if set, the
+            model is returned only if the artifact was compiled from the
+            file's current content
+
+    Returns:
+        Optional[Dict[str, Any]]: model in the format of
+        :meth:`ruly_dmn.CamundaModelerHandler.export_model`, None if the
+        artifact doesn't exist, is stale or its format isn't supported"""
+    try:
+        with open(artifact_path, 'rb') as f:
+            header = f.read(_header.size)
+            if len(header) != _header.size:
+                return None
+            magic, artifact_version, major, minor, digest = \
+                _header.unpack(header)
+            if (magic != _magic or artifact_version != version
+                    or (major, minor) != sys.version_info[:2]):
+                return None
+            if path is not None and digest != content_hash(path):
+                return None
+            return marshal.loads(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def content_hash(path):
+    """Calculates the hash of a file's content
+
+    Args:
+        path (pathlib.Path): file path
+
+    Returns:
+        bytes: SHA-256 digest"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.digest()
@@ -0,0 +1,220 @@
+import collections
+import concurrent.futures
+import csv
+import itertools
+import json
+
+from ruly_dmn import common
+from ruly_dmn import dmn
+from ruly_dmn.handlers.camunda_modeler import CamundaModelerHandler
+
+
+Result = collections.namedtuple('Result', ['index', 'record', 'decisions',
+                                           'error'])
+Result.__doc__ = """Result of evaluating a record
+
+Attributes:
+    index (int): position of the record in the input
+    record (Union[Dict[str, Any], str]): input record, or the text of a line
+        that couldn't be parsed, see :class:`InvalidRecord`
+    decisions (Optional[Dict[str, Any]]): goal-decision pairs, None if the
+        evaluation failed
+    error (Optional[str]): error message, None if the evaluation succeeded"""
+
+
+InvalidRecord = collections.namedtuple('InvalidRecord', ['text', 'error'])
+InvalidRecord.__doc__ = """Line of a records file that couldn't be parsed,
+yielded by :func:`read_records` in place of a record. :func:`evaluate`
+yields it as a result with an error.
+
+Attributes:
+    text (str): text of the line
+    error (str): error message"""
+
+
+def evaluate(path, goals, records, workers=None, chunk_size=100,
+             lazy=False, artifact_path=None):
+    """Evaluates goals for a stream of records. The model is loaded once per
+    worker process and records are sent to workers in chunks, with the goals
+    of each record evaluated with :meth:`ruly_dmn.DMN.decide_all`. At most a
+    bounded number of chunks is read ahead of the one whose results are
+    yielded, so memory use doesn't depend on the number of records.
+
+    No new rules are created. Records whose evaluation fails, e.g. because a
+    hit policy is violated or the record isn't an object, and
+    :class:`InvalidRecord` objects are yielded with an error instead of
+    decisions.
+
+    Args:
+        path (pathlib.Path): path to the DMN file
+        goals (List[str]): names of decisions evaluated for each record
+        records (Iterable[Dict[str, Any]]): input records
+        workers (Optional[int]): number of worker processes, if None or less
+            than 2, records are evaluated within the calling process
+        chunk_size (int): number of records sent to a worker at once
+        lazy (bool): passed to :class:`ruly_dmn.CamundaModelerHandler`
+        artifact_path (Optional[pathlib.Path]): passed to
+            :class:`ruly_dmn.CamundaModelerHandler`
+
+    Returns:
+        Iterable[ruly_dmn.batch.Result]: results, in input order
+
+    Raises:
+        ValueError: raised, before any record is read, if a goal isn't a
+        decision of the model"""
+    model_args = (path, lazy, artifact_path)
+    in_process = workers is None or workers < 2
+    if in_process:
+        _init_worker(*model_args)
+        decisions = _dmn.decisions
+    else:
+        decisions = CamundaModelerHandler(
+            path, lazy=True, artifact_path=artifact_path).dependencies
+    unknown = [goal for goal in goals if goal not in decisions]
+    if unknown:
+        raise ValueError(f'unknown decisions: {unknown}')
+    chunks = _chunks(enumerate(records), chunk_size)
+    if in_process:
+        return itertools.chain.from_iterable(
+            _results(chunk, _evaluate_chunk(goals, chunk))
+            for chunk in chunks)
+    return _evaluate_in_workers(workers, model_args, goals, chunks)
+
+
+def read_records(f, record_format):
+    """Reads records from a text stream, one at a time
+
+    Args:
+        f (TextIO): input stream
+        record_format (str): ``jsonl`` for one JSON object per line, or
+            ``csv`` for comma-separated values with a header row. CSV values
+            are parsed as JSON if possible, otherwise they are strings, and
+            empty values are omitted
+
+    Returns:
+        Iterable[Union[Dict[str, Any], ruly_dmn.batch.InvalidRecord]]:
+        records, and invalid records in place of JSONL lines that aren't
+        valid JSON"""
+    if record_format == 'jsonl':
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield InvalidRecord(text=line.rstrip('\r\n'),
+                                    error=f'line {line_number}: {e}')
+    elif record_format == 'csv':
+        for row in csv.DictReader(f):
+            yield {name: _parse_value(value) for name, value in row.items()
+                   if value}
+    else:
+        raise ValueError(f'unsupported record format {record_format}')
+
+
+class RecordWriter:
+    """Writes input records extended with their decisions into a text stream
+
+    Args:
+        f (TextIO): output stream
+        record_format (str): ``jsonl`` or ``csv``, see :func:`read_records`
+        goals (List[str]): names of the decisions"""
+
+    def __init__(self, f, record_format, goals):
+        if record_format not in ('jsonl', 'csv'):
+            raise ValueError(f'unsupported record format {record_format}')
+        self._f = f
+        self._format = record_format
+        self._goals = goals
+        self._csv_writer = None
+
+    def write(self, record, decisions):
+        """Writes a record
+
+        Args:
+            record (Dict[str, Any]): input record
+            decisions (Dict[str, Any]): goal-decision pairs"""
+        record = dict(record, **decisions)
+        if self._format == 'jsonl':
+            self._f.write(json.dumps(record) + '\n')
+            return
+        if self._csv_writer is None:
+            fieldnames = list(dict.fromkeys(itertools.chain(record,
+                                                            self._goals)))
+            self._csv_writer = csv.DictWriter(self._f, fieldnames,
+                                              extrasaction='ignore')
+            self._csv_writer.writeheader()
+        self._csv_writer.writerow({
+            name: value if isinstance(value, str) else json.dumps(value)
+            for name, value in record.items() if value is not None})
+
+
+class _NoRuleFactory(common.RuleFactory):
+
+    def create_rule(self, state, fired_rules, output_names):
+        return None
+
+
+_dmn = None
+
+
+def _init_worker(path, lazy, artifact_path):
+    global _dmn
+    handler = CamundaModelerHandler(path, lazy=lazy,
+                                    artifact_path=artifact_path)
+    _dmn = dmn.DMN(handler, lambda _: _NoRuleFactory(), indexed=True)
+
+
+def _evaluate_in_workers(workers, model_args, goals, chunks):
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_init_worker,
+            initargs=model_args) as executor:
+        window = collections.deque()
+        for chunk in chunks:
+            window.append((chunk, executor.submit(_evaluate_chunk, goals,
+                                                  chunk)))
+            if len(window) >= workers * 2:
+                chunk, future = window.popleft()
+                yield from _results(chunk, future.result())
+        while window:
+            chunk, future = window.popleft()
+            yield from _results(chunk, future.result())
+
+
+def _evaluate_chunk(goals, chunk):
+    return [_evaluate_record(goals, record) for _, record in chunk]
+
+
+def _evaluate_record(goals, record):
+    if isinstance(record, InvalidRecord):
+        return None, record.error
+    try:
+        return _dmn.decide_all(record, goals), None
+    except dmn.HitPolicyViolation as e:
+        return None, str(e)
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}'
+
+
+def _results(chunk, chunk_results):
+    for (index, record), (decisions, error) in zip(chunk, chunk_results):
+        if isinstance(record, InvalidRecord):
+            record = record.text
+        yield Result(index=index, record=record, decisions=decisions,
+                     error=error)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _parse_value(value):
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return value
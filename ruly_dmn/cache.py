@@ -0,0 +1,75 @@
+import collections
+import threading
+
+
+CacheInfo = collections.namedtuple('CacheInfo',
+                                   ['hits', 'misses', 'maxsize', 'currsize'])
+CacheInfo.__doc__ = """Decision cache statistics
+
+Attributes:
+    hits (int): number of lookups that found a cached decision
+    misses (int): number of lookups that didn't find a cached decision
+    maxsize (int): maximum number of cached decisions
+    currsize (int): current number of cached decisions"""
+
+
+class DecisionCache:
+    """Bounded cache of calculated decisions, evicting least recently used
+    entries when full. Safe to use from multiple threads.
+
+    Args:
+        maxsize (int): maximum number of cached decisions"""
+
+    def __init__(self, maxsize):
+        if maxsize < 1:
+            raise ValueError('cache size should be a positive integer')
+        self._maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def info(self):
+        """ruly_dmn.cache.CacheInfo: cache statistics"""
+        with self._lock:
+            return CacheInfo(hits=self._hits,
+                             misses=self._misses,
+                             maxsize=self._maxsize,
+                             currsize=len(self._entries))
+
+    def get(self, key):
+        """Looks up a cached decision and marks it as recently used
+
+        Args:
+            key (Hashable): cache key
+
+        Returns:
+            Tuple[bool, Any]: whether the decision was found and its value"""
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self._misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return True, value
+
+    def put(self, key, value):
+        """Caches a decision, evicting the least recently used one if the
+        cache is full
+
+        Args:
+            key (Hashable): cache key
+            value (Any): decision"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Removes all cached decisions, statistics are kept"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,461 @@
+import ast
+import hashlib
+import importlib.util
+import math
+import pathlib
+import py_compile
+
+import ruly
+
+from ruly_dmn import common
+from ruly_dmn import conditions
+from ruly_dmn import persistence
+from ruly_dmn import planner
+
+
+class CompiledModel:
+    """Decision tables compiled into a Python module by
+    :func:`compile_rules`. Each table is a function that dispatches on the
+    values of its equality conditions with nested dicts and evaluates only
+    the remaining conditions of the rules it finds, with the table's hit
+    policy inlined, and each decision is a function that evaluates the
+    tables it depends on, like
+    :meth:`ruly_dmn.engine.IndexedEngine.evaluate_plan`.
+
+    Compiled decisions never consult a rule factory. If a table that a
+    decision needs has no fired rules or its hit policy is violated, the
+    decision isn't made, so that the caller can evaluate it with an engine
+    which handles those cases.
+
+    Args:
+        source (str): generated source
+        namespace (Dict[str, Any]): namespace of the executed source"""
+
+    def __init__(self, source, namespace):
+        self._source = source
+        self._goals = namespace['GOALS']
+
+    @property
+    def source(self):
+        """str: generated source"""
+        return self._source
+
+    @property
+    def goals(self):
+        """Set[str]: names of decisions that can be made"""
+        return set(self._goals)
+
+    def evaluate(self, goal, inputs):
+        """Makes a decision
+
+        Args:
+            goal (str): decision name
+            inputs (Dict[str, Any]): names and values of input variables
+
+        Returns:
+            Optional[Dict[str, Any]]: state containing the variables of the
+            decision's plan, None if the decision can't be made without a
+            rule factory or it violates a hit policy"""
+        goal_fn = self._goals.get(goal)
+        if goal_fn is None:
+            return None
+        return goal_fn(inputs)
+
+
+def compile_rules(rules, graph, hit_policies, output_values=None, path=None):
+    """Generates Python source from rules of decision tables and compiles it
+
+    If path is set, the source is cached in that file, with its bytecode
+    cached by the import system next to it. The file contains a hash of the
+    rules and it is regenerated when they change. Rules with values that
+    can't be written as Python literals are compiled without caching.
+
+    Args:
+        rules (Iterable[ruly.Rule]): rules, in knowledge base order
+        graph (Dict[str, Tuple[str, ...]]): graph created with
+            :func:`ruly_dmn.planner.dependency_graph`
+        hit_policies (Dict[str, ruly_dmn.HitPolicy]): hit policies of the
+            tables, FIRST is used for tables without one
+        output_values (Optional[Dict[str, List[Any]]]): allowed output values
+            used by PRIORITY and OUTPUT_ORDER hit policies
+        path (Optional[pathlib.Path]): path of the generated ``.py`` file
+
+    Returns:
+        ruly_dmn.codegen.CompiledModel"""
+    rules = list(rules)
+    output_values = output_values or {}
+    key = _key(rules, graph, hit_policies, output_values)
+    if path is not None:
+        path = pathlib.Path(path)
+        if _cached_key(path) == key:
+            return CompiledModel(path.read_text(), _load(path))
+    generator = _Generator(rules, graph, hit_policies, output_values)
+    source = generator.generate(key)
+    if path is not None and generator.literal:
+        persistence.atomic_write(path, lambda f: f.write(source.encode()))
+        py_compile.compile(
+            str(path), doraise=True,
+            invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH)
+        return CompiledModel(source, _load(path))
+    namespace = {}
+    if not generator.literal:
+        namespace['_k'] = generator.constants
+    exec(compile(source, '<ruly_dmn.codegen>', 'exec'), namespace)
+    return CompiledModel(source, namespace)
+
+
+_header = '# generated by ruly_dmn.codegen, do not edit\n# key: '
+
+_min_dispatch_rules = 4
+
+_helpers = '''
+
+def _in_range(value, start, end, start_closed, end_closed):
+    if value is None:
+        return False
+    try:
+        if start is not None and (value < start if start_closed
+                                  else value <= start):
+            return False
+        if end is not None and (value > end if end_closed
+                                else value >= end):
+            return False
+    except TypeError:
+        return False
+    return True
+
+
+def _collect(consequents, aggregate):
+    names = dict.fromkeys(name for consequent in consequents
+                          for name in consequent)
+    return {name: aggregate([consequent[name] for consequent in consequents
+                             if name in consequent])
+            for name in names}
+'''
+
+_aggregations = {common.HitPolicy.COLLECT_SUM: 'sum',
+                 common.HitPolicy.COLLECT_MIN: 'min',
+                 common.HitPolicy.COLLECT_MAX: 'max',
+                 common.HitPolicy.COLLECT_COUNT: 'len'}
+
+
+class _Generator:
+
+    def __init__(self, rules, graph, hit_policies, output_values):
+        self._graph = graph
+        self._hit_policies = hit_policies
+        self._output_values = output_values
+        self._tables = {}
+        for rule in rules:
+            for output_name in rule.consequent:
+                self._tables.setdefault(output_name, []).append(rule)
+        self.constants = []
+        self._constant_ids = {}
+        self.literal = True
+        self._lines = []
+        self._count = 0
+
+    def generate(self, key):
+        self._lines = [_header + key, _helpers]
+        table_fns = {output_name: self._table(output_name, table_rules)
+                     for output_name, table_rules in self._tables.items()}
+        goal_fns = {}
+        for goal in self._graph:
+            try:
+                plan = planner.create_plan(self._graph, goal)
+            except planner.ModelError:
+                continue
+            goal_fns[goal] = self._goal(plan, table_fns)
+        self._lines.append('')
+        self._lines.append('GOALS = {' + ', '.join(
+            f'{goal!r}: {fn}' for goal, fn in goal_fns.items()) + '}')
+        if self.literal:
+            self._lines.insert(1, f'_k = {self.constants!r}')
+        return '\n'.join(self._lines) + '\n'
+
+    def _name(self, prefix):
+        self._count += 1
+        return f'{prefix}{self._count}'
+
+    def _constant(self, value):
+        index = self._constant_ids.get(id(value))
+        if index is None:
+            index = len(self.constants)
+            self.constants.append(value)
+            self._constant_ids[id(value)] = index
+            if self.literal and not _is_literal(value):
+                self.literal = False
+        return f'_k[{index}]'
+
+    def _value(self, value):
+        if _is_scalar(value):
+            return repr(value)
+        return self._constant(value)
+
+    def _table(self, output_name, rules):
+        hit_policy = self._hit_policies.get(output_name)
+        priorities = {}
+        if hit_policy in (common.HitPolicy.PRIORITY,
+                          common.HitPolicy.OUTPUT_ORDER):
+            values = self._output_values.get(output_name) or []
+            for rule in rules:
+                value = rule.consequent.get(output_name)
+                priorities[id(rule)] = (values.index(value) if value in values
+                                        else len(values))
+        entries = [(rule, _dispatchable(rule)) for rule in rules]
+        return self._node(entries, frozenset(), hit_policy, priorities)
+
+    def _node(self, entries, matched, hit_policy, priorities):
+        name = None
+        if len(entries) >= _min_dispatch_rules:
+            counts = {}
+            for _, equalities in entries:
+                for column in equalities:
+                    if column not in matched:
+                        counts[column] = counts.get(column, 0) + 1
+            if len(counts) > 0:
+                name = max(counts, key=counts.get)
+                if counts[name] * 2 <= len(entries):
+                    name = None
+        if name is None:
+            return self._leaf(entries, matched, hit_policy, priorities)
+        branches = {}
+        for _, equalities in entries:
+            if name in equalities:
+                branches.setdefault(equalities[name], [])
+        default = []
+        for entry in entries:
+            equalities = entry[1]
+            if name in equalities:
+                branches[equalities[name]].append(entry)
+                continue
+            default.append(entry)
+            for branch in branches.values():
+                branch.append(entry)
+        if len(branches) < 2 and len(default) > 0:
+            return self._leaf(entries, matched, hit_policy, priorities)
+        matched = matched | {name}
+        branch_fns = {value: self._node(branch, matched, hit_policy,
+                                        priorities)
+                      for value, branch in branches.items()}
+        default_fn = self._leaf(default, matched, hit_policy, priorities)
+        fn = self._name('_node')
+        self._lines.append('')
+        self._lines.append(f'{fn}_d = {{' + ', '.join(
+            f'{value!r}: {branch_fn}'
+            for value, branch_fn in branch_fns.items()) + '}')
+        self._lines.extend(['', '', f'def {fn}(s):',
+                            '    try:',
+                            f'        fn = {fn}_d.get(s[{name!r}], '
+                            f'{default_fn})',
+                            '    except TypeError:',
+                            f'        fn = {default_fn}',
+                            '    return fn(s)'])
+        return fn
+
+    def _leaf(self, entries, matched, hit_policy, priorities):
+        fn = self._name('_leaf')
+        lines = ['', '', f'def {fn}(s):']
+        if hit_policy in (common.HitPolicy.UNIQUE, common.HitPolicy.ANY):
+            lines.append('    r = None')
+        elif hit_policy == common.HitPolicy.PRIORITY:
+            lines.append('    r = None')
+            lines.append('    p = None')
+        elif hit_policy in _multiple_hit_policies:
+            lines.append('    f = []')
+        for rule, equalities in entries:
+            consequent = self._constant(rule.consequent)
+            test, may_raise = self._test(rule, equalities, matched)
+            body = self._hit(hit_policy, consequent, priorities.get(id(rule)))
+            if may_raise:
+                lines.extend(['    try:',
+                              f'        m = {test}',
+                              '    except TypeError:',
+                              '        m = False',
+                              '    if m:'])
+            elif test != 'True':
+                lines.append(f'    if {test}:')
+            else:
+                lines.append('    if True:')
+            lines.extend('        ' + line for line in body)
+        if hit_policy in (common.HitPolicy.UNIQUE, common.HitPolicy.ANY,
+                          common.HitPolicy.PRIORITY):
+            lines.append('    return r')
+        elif hit_policy == common.HitPolicy.OUTPUT_ORDER:
+            lines.append('    if len(f) == 0:')
+            lines.append('        return None')
+            lines.append('    f.sort(key=lambda item: item[0])')
+            lines.append('    return _collect([item[1] for item in f], list)')
+        elif hit_policy in _multiple_hit_policies:
+            lines.append('    if len(f) == 0:')
+            lines.append('        return None')
+            lines.append(f'    return _collect(f, '
+                         f'{_aggregations.get(hit_policy, "list")})')
+        else:
+            lines.append('    return None')
+        self._lines.extend(lines)
+        return fn
+
+    def _hit(self, hit_policy, consequent, priority):
+        if hit_policy == common.HitPolicy.UNIQUE:
+            return ['if r is not None:',
+                    '    return None',
+                    f'r = {consequent}']
+        if hit_policy == common.HitPolicy.ANY:
+            return [f'if r is not None and r != {consequent}:',
+                    '    return None',
+                    f'r = {consequent}']
+        if hit_policy == common.HitPolicy.PRIORITY:
+            return [f'if p is None or {priority} < p:',
+                    f'    r, p = {consequent}, {priority}']
+        if hit_policy == common.HitPolicy.OUTPUT_ORDER:
+            return [f'f.append(({priority}, {consequent}))']
+        if hit_policy in _multiple_hit_policies:
+            return [f'f.append({consequent})']
+        return [f'return {consequent}']
+
+    def _test(self, rule, equalities, matched):
+        tests = []
+        may_raise = False
+        skipped = {name for name in matched if name in equalities}
+        for condition in _children(rule.antecedent):
+            if (isinstance(condition, ruly.EqualsCondition)
+                    and condition.name in skipped):
+                skipped.discard(condition.name)
+                continue
+            test, condition_may_raise = self._condition(condition)
+            tests.append(test)
+            may_raise = may_raise or condition_may_raise
+        if len(tests) == 0:
+            return 'True', False
+        return ' and '.join(tests), may_raise
+
+    def _condition(self, condition, nested=False):
+        variable = f's[{condition.name!r}]'
+        if isinstance(condition, ruly.EqualsCondition):
+            return f'{variable} == {self._value(condition.value)}', False
+        if isinstance(condition, conditions.RangeCondition):
+            start, end = (None if value is None else self._value(value)
+                          for value in (condition.start, condition.end))
+            if nested:
+                return (f'_in_range({variable}, {start}, {end}, '
+                        f'{condition.start_closed}, {condition.end_closed})',
+                        False)
+            tests = [f'{variable} is not None']
+            if start is not None:
+                operator = '>=' if condition.start_closed else '>'
+                tests.append(f'{variable} {operator} {start}')
+            if end is not None:
+                operator = '<=' if condition.end_closed else '<'
+                tests.append(f'{variable} {operator} {end}')
+            return '(' + ' and '.join(tests) + ')', True
+        if isinstance(condition, conditions.AnyCondition):
+            tests = [self._condition(child, True)[0]
+                     for child in condition.conditions]
+            return (f'({variable} is not None and '
+                    f'({" or ".join(tests) or "False"}))', False)
+        if isinstance(condition, conditions.NotCondition):
+            test, _ = self._condition(condition.condition, True)
+            return f'({variable} is not None and not {test})', False
+        return 'False', False
+
+    def _goal(self, plan, table_fns):
+        fn = self._name('_goal')
+        lines = ['', '', f'def {fn}(i):',
+                 '    s = {' + ', '.join(
+                     f'{name!r}: i.get({name!r})'
+                     for name in planner.plan_variables(plan)) + '}']
+        needed = {name: self._name('n') for name in plan.order}
+        dependents = {}
+        for name in plan.order:
+            for dependency in plan.dependencies[name]:
+                if dependency in needed:
+                    dependents.setdefault(dependency, []).append(name)
+        for name in reversed(plan.order):
+            if name == plan.goal:
+                lines.append(f'    {needed[name]} = s[{name!r}] is None')
+                continue
+            lines.append(f'    {needed[name]} = s[{name!r}] is None and (' +
+                         ' or '.join(needed[dependent] for dependent
+                                     in dependents.get(name, ())) + ')')
+        for name in plan.order:
+            lines.append(f'    if {needed[name]} and s[{name!r}] is None:')
+            table_fn = table_fns.get(name)
+            if table_fn is None:
+                lines.append('        return None')
+                continue
+            lines.extend([f'        r = {table_fn}(s)',
+                          '        if r is None:',
+                          '            return None',
+                          '        s.update(r)'])
+        lines.append('    return s')
+        self._lines.extend(lines)
+        return fn
+
+
+_multiple_hit_policies = {common.HitPolicy.COLLECT,
+                          common.HitPolicy.COLLECT_SUM,
+                          common.HitPolicy.COLLECT_MIN,
+                          common.HitPolicy.COLLECT_MAX,
+                          common.HitPolicy.COLLECT_COUNT,
+                          common.HitPolicy.RULE_ORDER,
+                          common.HitPolicy.OUTPUT_ORDER}
+
+
+def _children(antecedent):
+    if isinstance(antecedent, ruly.Expression):
+        for child in antecedent.children:
+            yield from _children(child)
+    else:
+        yield antecedent
+
+
+def _dispatchable(rule):
+    equalities = {}
+    for condition in _children(rule.antecedent):
+        if (isinstance(condition, ruly.EqualsCondition)
+                and condition.name not in equalities
+                and _is_scalar(condition.value)):
+            equalities[condition.name] = condition.value
+    return equalities
+
+
+def _is_scalar(value):
+    if isinstance(value, float):
+        return math.isfinite(value)
+    return value is None or isinstance(value, (str, int))
+
+
+def _is_literal(value):
+    try:
+        return ast.literal_eval(repr(value)) == value
+    except (ValueError, SyntaxError, TypeError, MemoryError,
+            RecursionError):
+        return False
+
+
+def _key(rules, graph, hit_policies, output_values):
+    data = repr((rules, sorted(graph.items()),
+                 sorted((name, hit_policy.name)
+                        for name, hit_policy in hit_policies.items()),
+                 sorted(output_values.items())))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _cached_key(path):
+    try:
+        with open(path) as f:
+            header = f.readline() + f.readline()
+    except OSError:
+        return None
+    if not header.startswith(_header):
+        return None
+    return header[len(_header):].strip()
+
+
+def _load(path):
+    spec = importlib.util.spec_from_file_location(
+        f'_ruly_dmn_codegen_{path.stem.replace(".", "_")}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return vars(module)
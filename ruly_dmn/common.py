@@ -22,6 +22,14 @@ class ModelHandler(abc.ABC):
     def hit_policies(self):
         """Dict[str, ruly_dmn.HitPolicy]: hit policies for outputs"""
 
+    @property
+    def output_values(self):
+        """Dict[str, List[Any]]: allowed values of outputs, in order of
+        priority, used by the PRIORITY and OUTPUT_ORDER hit policies. Outputs
+        without allowed values are omitted. Default implementation returns an
+        empty dictionary."""
+        return {}
+
     @abc.abstractmethod
     def update(self, knowledge_base):
         """Updates handler with a new knowledge base
@@ -30,6 +38,33 @@ class ModelHandler(abc.ABC):
             knowledge_base (ruly.KnowledgeBase): new knowledge base
         """
 
+    def flush(self):
+        """Writes pending updates, if the handler delays writing them. Default
+        implementation does nothing."""
+
+    def close(self):
+        """Writes pending updates and releases resources held by the handler.
+        Default implementation does nothing."""
+
+    def discard(self):
+        """Releases resources held by the handler without writing pending
+        updates, e.g. when the model was changed by someone else. Default
+        implementation does nothing."""
+
+    def load_rules(self, output_names):
+        """Loads rules of the given outputs, if they weren't loaded already.
+        Handlers that load rules lazily should add them to :attr:`rules` and
+        return them from this method. Default implementation assumes that all
+        rules are loaded upfront and returns an empty list.
+
+        Args:
+            output_names (Iterable[str]): names of outputs whose rules are
+                needed
+
+        Returns:
+            List[ruly.Rule]: newly loaded rules"""
+        return []
+
 
 class RuleFactory(abc.ABC):
     """Abstract class whose instances should implement rule creation methods"""
@@ -50,6 +85,29 @@ class RuleFactory(abc.ABC):
             created with given inputs"""
 
 
+class AsyncRuleFactory(abc.ABC):
+    """Abstract class whose instances should implement asynchronous rule
+    creation methods, so that rule creation (e.g. waiting for a review) does
+    not block the event loop. Can be used only with
+    :meth:`ruly_dmn.DMN.adecide` and :meth:`ruly_dmn.DMN.decide_many_async`.
+    """
+
+    @abc.abstractmethod
+    async def create_rule(self, state, fired_rules, output_names):
+        """Creates a new rule
+
+        Args:
+            state (Dict[str, Any]): state
+            fired_rules (List[ruly.Rule]): rules activated for state and output
+                combination
+            output_names (str): output values for the new rule's
+                consequent
+
+        Returns:
+            Optional[ruly.Rule]: generated rule, if None, new rule couldn't be
+            created with given inputs"""
+
+
 class HitPolicy(enum.Enum):
     UNIQUE = enum.auto()
     FIRST = enum.auto()
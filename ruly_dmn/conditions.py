@@ -0,0 +1,352 @@
+import bisect
+import collections
+import json
+import ruly
+
+
+class RangeCondition(collections.namedtuple('RangeCondition', [
+        'name', 'start', 'end', 'start_closed', 'end_closed']),
+        ruly.Condition):
+    """Condition that checks whether variable value is within a range, a
+    comparison such as ``< 18`` is a range with only one endpoint
+
+    Attributes:
+        name (str): variable name
+        start (Any): lower endpoint, None if the range is unbounded below
+        end (Any): upper endpoint, None if the range is unbounded above
+        start_closed (bool): whether the lower endpoint is in the range
+        end_closed (bool): whether the upper endpoint is in the range"""
+
+    def __str__(self):
+        text = format_unary_tests(self)
+        if self.start is None or self.end is None:
+            return f'{self.name} {text}'
+        return f'{self.name} in {text}'
+
+
+class AnyCondition(collections.namedtuple('AnyCondition', [
+        'name', 'conditions']), ruly.Condition):
+    """Condition that checks whether variable value satisfies any of the
+    conditions, which all reference the same variable
+
+    Attributes:
+        name (str): variable name
+        conditions (Tuple[ruly.Condition, ...]): conditions"""
+
+    def __str__(self):
+        return f'{self.name} in ({format_unary_tests(self)})'
+
+
+class NotCondition(collections.namedtuple('NotCondition', [
+        'name', 'condition']), ruly.Condition):
+    """Condition that checks whether variable value doesn't satisfy a
+    condition that references the same variable
+
+    Attributes:
+        name (str): variable name
+        condition (ruly.Condition): negated condition"""
+
+    def __str__(self):
+        return f'{self.name} {format_unary_tests(self)}'
+
+
+def evaluate(state, antecedent):
+    """Evaluates truthiness of an antecedent, equivalent to
+    :func:`ruly.evaluate`, but also supports conditions of this module. Only
+    equality conditions can be satisfied by an undecided (None) value.
+
+    Args:
+        state (Dict[str, Any]): variable values
+        antecedent (Union[ruly.Expression, ruly.Condition]): rule
+            antecedent
+
+    Returns:
+        bool"""
+    if isinstance(antecedent, ruly.Expression):
+        return all(evaluate(state, child) for child in antecedent.children)
+    return satisfies(antecedent, state[antecedent.name])
+
+
+def satisfies(condition, value):
+    """Checks whether a value satisfies a condition
+
+    Args:
+        condition (ruly.Condition): condition
+        value (Any): value of the condition's variable
+
+    Returns:
+        bool"""
+    if isinstance(condition, ruly.EqualsCondition):
+        return condition.value == value
+    if value is None:
+        return False
+    if isinstance(condition, RangeCondition):
+        try:
+            if condition.start is not None and (
+                    value < condition.start if condition.start_closed
+                    else value <= condition.start):
+                return False
+            if condition.end is not None and (
+                    value > condition.end if condition.end_closed
+                    else value >= condition.end):
+                return False
+        except TypeError:
+            return False
+        return True
+    if isinstance(condition, AnyCondition):
+        return any(satisfies(child, value) for child in condition.conditions)
+    if isinstance(condition, NotCondition):
+        return not satisfies(condition.condition, value)
+    return False
+
+
+def intervals(condition):
+    """Calculates intervals of values that satisfy a condition, used for
+    indexing
+
+    Args:
+        condition (ruly.Condition): condition
+
+    Returns:
+        Optional[List[Tuple[Any, Any, bool, bool]]]: start, end and whether
+        they are closed for each interval, with None endpoints if the
+        interval is unbounded, or None if the condition can't be
+        represented with intervals"""
+    if isinstance(condition, ruly.EqualsCondition):
+        if condition.value is None:
+            return None
+        return [(condition.value, condition.value, True, True)]
+    if isinstance(condition, RangeCondition):
+        return [tuple(condition[1:])]
+    if isinstance(condition, AnyCondition):
+        result = []
+        for child in condition.conditions:
+            child_intervals = intervals(child)
+            if child_intervals is None:
+                return None
+            result.extend(child_intervals)
+        return result
+    return None
+
+
+def parse_unary_tests(name, text):
+    """Parses FEEL simple unary tests of a decision table's input entry.
+    Supported tests are JSON literals (``"Fall"``, ``18``, ``true``),
+    comparisons (``< 18``, ``>= 65``), ranges (``[18..65]``, ``(0..1]``,
+    ``]0..1[``), lists of those (``"Fall", "Winter"``) and negation of a
+    list (``not("Fall", "Winter")``). ``-`` or an empty text matches any
+    value.
+
+    Args:
+        name (str): name of the input variable
+        text (Optional[str]): text of the input entry
+
+    Returns:
+        Optional[ruly.Condition]: condition, None if any value matches
+
+    Raises:
+        ValueError: if the text can't be parsed"""
+    if text is None:
+        return None
+    text = text.strip()
+    if text in ('', '-'):
+        return None
+    try:
+        return ruly.EqualsCondition(name, json.loads(text))
+    except json.JSONDecodeError:
+        pass
+    negated = text.startswith('not(') and text.endswith(')')
+    if negated:
+        text = text[4:-1]
+    tests = _parse_tests(name, text)
+    condition = (tests[0] if len(tests) == 1
+                 else AnyCondition(name, tuple(tests)))
+    if negated:
+        return NotCondition(name, condition)
+    return condition
+
+
+def format_unary_tests(condition):
+    """Formats a condition as FEEL simple unary tests, inverse of
+    :func:`parse_unary_tests`
+
+    Args:
+        condition (Optional[ruly.Condition]): condition, None if any value
+            matches
+
+    Returns:
+        Optional[str]: text of an input entry, None if any value matches"""
+    if condition is None:
+        return None
+    if isinstance(condition, ruly.EqualsCondition):
+        return json.dumps(condition.value)
+    if isinstance(condition, RangeCondition):
+        if condition.start is None:
+            operator = '<=' if condition.end_closed else '<'
+            return f'{operator} {json.dumps(condition.end)}'
+        if condition.end is None:
+            operator = '>=' if condition.start_closed else '>'
+            return f'{operator} {json.dumps(condition.start)}'
+        return (f'{"[" if condition.start_closed else "("}'
+                f'{json.dumps(condition.start)}..{json.dumps(condition.end)}'
+                f'{"]" if condition.end_closed else ")"}')
+    if isinstance(condition, AnyCondition):
+        return ', '.join(format_unary_tests(child)
+                         for child in condition.conditions)
+    if isinstance(condition, NotCondition):
+        return f'not({format_unary_tests(condition.condition)})'
+    raise ValueError(f'unsupported condition {condition!r}')
+
+
+class IntervalIndex:
+    """Index of entries by intervals of values, built once and queried with
+    a value. Endpoints of all intervals split the values into elementary
+    slots, alternately open segments between endpoints and the endpoints
+    themselves. Intervals are stored as ranges of slots in a segment tree,
+    each in O(log n) nodes, so overlapping intervals don't multiply the
+    index size. A lookup is a binary search over the endpoints followed by
+    a walk from the value's slot to the root of the tree, and takes
+    O(log n + k log k) for k found entries.
+
+    Args:
+        entries (Iterable[Tuple[List[Tuple[Any, Any, bool, bool]], Any]]):
+            intervals, in the format returned by :func:`intervals`, and the
+            entry they belong to
+
+    Raises:
+        TypeError: if endpoints can't be compared with each other"""
+
+    def __init__(self, entries):
+        entries = list(entries)
+        points = sorted({endpoint for entry_intervals, _ in entries
+                         for interval in entry_intervals
+                         for endpoint in interval[:2]
+                         if endpoint is not None})
+        slot_count = 2 * len(points) + 1
+        size = 1
+        while size < slot_count:
+            size *= 2
+        nodes = {}
+        for i, (entry_intervals, _) in enumerate(entries):
+            for start, end, start_closed, end_closed in entry_intervals:
+                first = (0 if start is None
+                         else 2 * bisect.bisect_left(points, start)
+                         + (1 if start_closed else 2))
+                last = (slot_count - 1 if end is None
+                        else 2 * bisect.bisect_left(points, end)
+                        + (1 if end_closed else 0))
+                first += size
+                last += size + 1
+                while first < last:
+                    if first & 1:
+                        nodes.setdefault(first, []).append(i)
+                        first += 1
+                    if last & 1:
+                        last -= 1
+                        nodes.setdefault(last, []).append(i)
+                    first //= 2
+                    last //= 2
+        self._points = points
+        self._size = size
+        self._nodes = nodes
+        self._entries = [entry for _, entry in entries]
+
+    def lookup(self, value):
+        """Finds entries whose intervals contain a value
+
+        Args:
+            value (Any): value
+
+        Returns:
+            List[Any]: entries, in the order they were passed to the
+            constructor
+
+        Raises:
+            TypeError: if the value can't be compared with the endpoints"""
+        i = bisect.bisect_left(self._points, value)
+        if i < len(self._points) and self._points[i] == value:
+            node = self._size + 2 * i + 1
+        else:
+            node = self._size + 2 * i
+        found = set()
+        while node > 0:
+            found.update(self._nodes.get(node, ()))
+            node //= 2
+        return [self._entries[i] for i in sorted(found)]
+
+
+def _parse_tests(name, text):
+    # brackets and parentheses of ranges don't have to match, e.g. ]1..2],
+    # so they can't be tracked while splitting, and commas within JSON
+    # arrays are split on too - parts that don't parse on their own are
+    # joined with the following ones
+    tests = []
+    item = None
+    error = None
+    for part in _split(text, ','):
+        item = part if item is None else f'{item},{part}'
+        try:
+            tests.append(_parse_test(name, item))
+        except ValueError as e:
+            error = e
+            continue
+        item = None
+    if item is not None:
+        raise error
+    return tests
+
+
+def _parse_test(name, text):
+    text = text.strip()
+    for operator in ('<=', '>=', '<', '>'):
+        if text.startswith(operator):
+            value = _parse_endpoint(text[len(operator):])
+            if operator[0] == '<':
+                return RangeCondition(name, None, value, False,
+                                      operator == '<=')
+            return RangeCondition(name, value, None, operator == '>=',
+                                  False)
+    if len(text) > 1 and text[0] in '[(]' and text[-1] in '])[':
+        endpoints = _split(text[1:-1], '..')
+        if len(endpoints) == 2:
+            return RangeCondition(name,
+                                  _parse_endpoint(endpoints[0]),
+                                  _parse_endpoint(endpoints[1]),
+                                  text[0] == '[', text[-1] == ']')
+    return ruly.EqualsCondition(name, json.loads(text))
+
+
+def _parse_endpoint(text):
+    value = json.loads(text)
+    if value is None:
+        raise ValueError('range endpoint can\'t be null')
+    return value
+
+
+def _split(text, separator):
+    parts = []
+    depth = 0
+    in_string = False
+    start = 0
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            if char == '\\':
+                i += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+        elif depth == 0 and text.startswith(separator, i):
+            parts.append(text[start:i])
+            start = i + len(separator)
+            i = start
+            continue
+        i += 1
+    parts.append(text[start:])
+    return parts
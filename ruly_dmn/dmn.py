@@ -1,25 +1,95 @@
+import asyncio
+import collections
+import collections.abc
 import itertools
 import json
 import ruly
+import threading
+import time
 
+from ruly_dmn import analysis
+from ruly_dmn import cache
+from ruly_dmn import codegen
 from ruly_dmn import common
+from ruly_dmn import engine
+from ruly_dmn import knowledge_base
+from ruly_dmn import planner
 
 
 class DMN:
     """Class that contains the DMN implementation.
 
+    Instances can be shared between threads. Decisions are made against an
+    immutable snapshot of the rules, so concurrent decisions don't lock each
+    other. When rules are added, either by the rule factory or by loading
+    them lazily from the handler, they are added to a copy of the latest
+    snapshot, which then replaces it. Adding rules is serialized with a
+    separate lock, and decisions made in the meantime keep using the snapshot
+    they started with, except that fired rules are looked up in the latest
+    snapshot before the rule factory is consulted.
+
     Args:
         handler (ruly_dmn.ModelHandler): model handler
         rule_factory_cb (Optional[Callable]): function that creates a rule
             factory - if None, a factory that uses console is used. Signature
-            should match the signature of :func:`ruly_dmn.rule_factory_cb`"""
+            should match the signature of :func:`ruly_dmn.rule_factory_cb`.
+            Asynchronous factories can only be used with :meth:`adecide` and
+            :meth:`decide_many_async`
+        indexed (bool): if True, decisions are evaluated with an
+            :class:`ruly_dmn.engine.IndexedEngine`, which looks up fired rules
+            in hash tables instead of testing every rule of a decision,
+            otherwise with a :class:`ruly_dmn.engine.LinearEngine`
+        cache_size (Optional[int]): if set, up to this many decisions are
+            cached, keyed by the decision and values of the variables it
+            transitively depends on, including given values of intermediate
+            decisions. The cache is cleared whenever new rules are added
+        instrumentation (Optional[ruly_dmn.instrumentation.Instrumentation]):
+            if set, its hooks are called while decisions are made, e.g. a
+            :class:`ruly_dmn.instrumentation.Stats` instance collects
+            statistics
+        analyze (bool): if True, decision tables are analyzed with
+            :func:`ruly_dmn.analysis.analyze` when their rules are loaded,
+            and unreachable and redundant rules are left out of the
+            knowledge base. Tables with UNIQUE or ANY hit policy whose rules
+            don't overlap or conflict are then evaluated only until their
+            first rule fires, and rules added later are checked against
+            them. Found issues are available in :attr:`issues`
+        compiled (bool): if True, :meth:`decide` makes decisions with rules
+            compiled into Python code by
+            :func:`ruly_dmn.codegen.compile_rules`, which is regenerated
+            after new rules are added. The rule factory is consulted, and
+            the instrumentation notified of evaluated tables, only for
+            decisions that the compiled code can't make, i.e. when a needed
+            table has no fired rules or its hit policy is violated
+        compiled_path (Optional[pathlib.Path]): if set, the code generated
+            when compiled is set is cached in this ``.py`` file
+
+    Raises:
+        ruly_dmn.ModelError: raised if decisions depend on each other
+        cyclically or if a decision table has an input without a name"""
 
-    def __init__(self, handler, rule_factory_cb=None):
+    def __init__(self, handler, rule_factory_cb=None, indexed=False,
+                 cache_size=None, instrumentation=None, analyze=False,
+                 compiled=False, compiled_path=None):
         self._handler = handler
-        self._knowledge_base = ruly.KnowledgeBase(*handler.rules)
         self._factory_cb = rule_factory_cb
+        self._instrumentation = instrumentation
+        self._engine_cls = (engine.IndexedEngine if indexed
+                            else engine.LinearEngine)
+        self._cache = (cache.DecisionCache(cache_size)
+                       if cache_size is not None else None)
+        self._compiled = compiled
+        self._compiled_path = compiled_path
+        self._learn_lock = threading.RLock()
+        self._loaded_decisions = frozenset()
+        self._snapshot = None
+        self._analyze = analyze
+        self._issues = []
+        self._unverified = set()
+        snapshot = self._publish(enumerate(self._analyzed(handler.rules)))
+        snapshot.plans.update(planner.create_plans(snapshot.graph))
 
-        all_outputs = set(itertools.chain(*handler.dependencies.keys()))
+        all_outputs = set(handler.dependencies.keys())
         all_inputs = set(itertools.chain(*handler.dependencies.values()))
         self._inputs = all_inputs - all_outputs
 
@@ -28,6 +98,53 @@ class DMN:
         """List[str]: input variables for all available decisions"""
         return self._inputs
 
+    @property
+    def decisions(self):
+        """List[str]: names of all available decisions"""
+        return list(self._handler.dependencies)
+
+    @property
+    def issues(self):
+        """List[ruly_dmn.analysis.Issue]: issues found by analyzing decision
+        tables, empty unless the instance was created with analyze set"""
+        return list(self._issues)
+
+    def plan(self, decision):
+        """Returns the evaluation plan of a decision, containing decisions
+        and inputs it depends on
+
+        Args:
+            decision (str): decision name
+
+        Returns:
+            ruly_dmn.planner.Plan
+
+        Raises:
+            ruly_dmn.ModelError: raised if learned rules created a cyclic
+            dependency"""
+        return self._snapshot.plan(decision)
+
+    @property
+    def knowledge_base(self):
+        """ruly_dmn.knowledge_base.KnowledgeBase: latest snapshot of the rules,
+        it shouldn't be modified"""
+        return self._snapshot.knowledge_base
+
+    def cache_info(self):
+        """Returns decision cache statistics
+
+        Returns:
+            Optional[ruly_dmn.cache.CacheInfo]: statistics, None if caching
+            is disabled"""
+        if self._cache is None:
+            return None
+        return self._cache.info
+
+    def cache_clear(self):
+        """Removes all cached decisions"""
+        if self._cache is not None:
+            self._cache.clear()
+
     def decide(self, inputs, decision):
         """Attempts to solve for decision based on given inputs. May create
         new rules if the factory creates them.
@@ -39,49 +156,488 @@ class DMN:
         Returns:
             Any: calculated decision
 
+        Raises:
+            ruly_dmn.HitPolicyViolation: raised if hit policy violation is
+            detected
+            TypeError: raised if the rule factory is asynchronous"""
+        return self._measure(
+            lambda: self._decide(inputs, decision, self._create_rule_factory(
+                synchronous=True)),
+            decision, None)
+
+    def decide_all(self, inputs, goals):
+        """Solves for several decisions with the same inputs. Goals are
+        resolved in order, and the values of all decisions made for a goal
+        are passed on to the following goals, so decisions they share, as
+        well as other outputs of multi-output tables, are evaluated once.
+
+        Args:
+            inputs (Dict[str, Any]): name-value pairs of all inputs
+            goals (Iterable[str]): names of the decisions that should be
+                resolved
+
+        Returns:
+            Dict[str, Any]: calculated decisions, by name
+
+        Raises:
+            ruly_dmn.HitPolicyViolation: raised if hit policy violation is
+            detected
+            TypeError: raised if the rule factory is asynchronous"""
+        rule_factory = self._create_rule_factory(synchronous=True)
+        state = dict(inputs)
+        decisions = {}
+        for goal in goals:
+            if state.get(goal) is None:
+                state.update(self._measure(
+                    lambda: self._decide_state(state, goal, rule_factory),
+                    goal, None))
+            decisions[goal] = state.get(goal)
+        return decisions
+
+    def session(self, inputs=None):
+        """Creates an evaluation session, which remembers decisions made with
+        its inputs and reevaluates only the decisions affected by changed
+        inputs or rules, see :class:`Session`
+
+        Args:
+            inputs (Optional[Dict[str, Any]]): name-value pairs of initial
+                inputs
+
+        Returns:
+            ruly_dmn.Session"""
+        return Session(self, inputs)
+
+    def decide_many(self, inputs, decision):
+        """Solves for decision for a batch of inputs. Each decision table is
+        evaluated once for the whole batch, with fired rules looked up once
+        per distinct combination of the table's input values. Results are
+        the same as when calling :meth:`decide` for every record, but the
+        rule factory is consulted once per such combination, with the state
+        of the first record that contains it.
+
+        Args:
+            inputs (Union[Iterable[Dict[str, Any]], Mapping[str, Sequence]]):
+                either name-value pairs for each record, or a mapping of input
+                names to equally long columns of values (lists, NumPy arrays,
+                etc.)
+            decision (str): name of the decision that should be resolved
+
+        Returns:
+            List[Any]: calculated decisions, in input order
+
+        Raises:
+            ruly_dmn.HitPolicyViolation: raised if hit policy violation is
+            detected
+            TypeError: raised if the rule factory is asynchronous"""
+        return self._measure(
+            lambda: self._decide_many(inputs, decision,
+                                      self._create_rule_factory(
+                                          synchronous=True)),
+            decision, inputs)
+
+    async def adecide(self, inputs, decision, executor=None):
+        """Asynchronous variant of :meth:`decide`, that can be used with
+        an asynchronous rule factory. While the factory is creating a rule,
+        the event loop is free to run other tasks, including other decisions.
+        Once the rule is created, the decision is evaluated again from the
+        start, with the factory's answers reused.
+
+        Args:
+            inputs (Dict[str, Any]): name-value pairs of all inputs
+            decision (str): name of the decision that should be resolved
+            executor (Optional[concurrent.futures.Executor]): if set,
+                decisions are evaluated within the executor, otherwise they
+                are evaluated on the event loop's thread
+
+        Returns:
+            Any: calculated decision
+
         Raises:
             ruly_dmn.HitPolicyViolation: raised if hit policy violation is
             detected"""
-        rules = list(self._knowledge_base.rules)
-        if self._factory_cb is None:
-            rule_factory = _ConsoleRuleFactory(self._handler)
-        else:
-            rule_factory = self._factory_cb(self._handler)
+        start = time.perf_counter()
+        result = await self._run_async(
+            lambda rule_factory: self._decide(inputs, decision, rule_factory),
+            executor)
+        self._report(decision, None, result, start)
+        return result
+
+    async def decide_many_async(self, inputs, decision, executor=None):
+        """Asynchronous variant of :meth:`decide_many`, see :meth:`adecide`
+
+        Args:
+            inputs (Union[Iterable[Dict[str, Any]], Mapping[str, Sequence]]):
+                either name-value pairs for each record, or a mapping of input
+                names to equally long columns of values
+            decision (str): name of the decision that should be resolved
+            executor (Optional[concurrent.futures.Executor]): if set,
+                decisions are evaluated within the executor, otherwise they
+                are evaluated on the event loop's thread
+
+        Returns:
+            List[Any]: calculated decisions, in input order
+
+        Raises:
+            ruly_dmn.HitPolicyViolation: raised if hit policy violation is
+            detected"""
+        inputs = inputs if isinstance(inputs, collections.abc.Mapping) \
+            else list(inputs)
+        start = time.perf_counter()
+        result = await self._run_async(
+            lambda rule_factory: self._decide_many(inputs, decision,
+                                                   rule_factory),
+            executor)
+        self._report(decision, inputs, result, start)
+        return result
+
+    def learn(self, records, decisions):
+        """Learns rules from labeled records, e.g. historical decisions. For
+        each record and each decision whose expected value the record
+        contains, decisions that the decision's table depends on are made
+        from the record, unless the record contains their values, and a rule
+        is created with equality conditions for the values of the table's
+        inputs. Inputs that are neither in the record nor decided, e.g.
+        because of a hit policy violation, get no condition. Rules are
+        skipped if they are already in the knowledge base or were created
+        from an earlier record, if the record's decision is already made with
+        the expected value, or if an earlier record expects a different value
+        for the same inputs. Other rules are inserted before the first rule
+        that fires for their record, or at the end of the table if no rule
+        fires.
+
+        All new rules are added with a single knowledge base update, followed
+        by a single handler update.
+
+        Args:
+            records (Iterable[Dict[str, Any]]): name-value pairs of inputs
+                and expected decisions
+            decisions (Iterable[str]): names of the decisions that are
+                learned
+
+        Returns:
+            ruly_dmn.LearnSummary: numbers of added and skipped rules"""
+        decisions = list(decisions)
+        for decision in decisions:
+            self._load_rules(decision)
+        with self._learn_lock:
+            snapshot = self._snapshot
+            rules = snapshot.knowledge_base
+            insertions = []
+            keys = set()
+            antecedent_keys = {}
+            duplicates = redundant = conflicts = 0
+            for i, record in enumerate(records):
+                for decision in decisions:
+                    expected = record.get(decision)
+                    if expected is None:
+                        continue
+                    state = self._record_state(snapshot, record, decision)
+                    rule = _expected_rule(self._handler, state, decision,
+                                          expected)
+                    key = knowledge_base.rule_key(rule)
+                    antecedent_key = (decision, knowledge_base.value_key(
+                        rule.antecedent))
+                    if key in keys or rule in rules:
+                        duplicates += 1
+                        continue
+                    if antecedent_key in antecedent_keys:
+                        conflicts += 1
+                        continue
+                    fired_rules = snapshot.engine.fired_rules(
+                        snapshot.complete_state(state), decision)
+                    if _decides(self._handler, fired_rules, decision,
+                                expected):
+                        redundant += 1
+                        continue
+                    keys.add(key)
+                    antecedent_keys[antecedent_key] = expected
+                    position = (rules.index(fired_rules[0])
+                                if len(fired_rules) > 0 else len(rules))
+                    insertions.append((position, i, rule))
+            if len(insertions) > 0:
+                self._check([rule for _, _, rule in insertions])
+                insertions.sort(key=lambda insertion: insertion[:2],
+                                reverse=True)
+                self._publish((position, rule)
+                              for position, _, rule in insertions)
+                start = time.perf_counter()
+                self._handler.update(self._snapshot.knowledge_base)
+                if self._instrumentation is not None:
+                    self._instrumentation.handler_updated(
+                        time.perf_counter() - start)
+        return LearnSummary(added=len(insertions), duplicates=duplicates,
+                            redundant=redundant, conflicts=conflicts)
+
+    def _record_state(self, snapshot, record, decision):
 
         def post_eval_cb(state, output_name, fired_rules):
-            fired_rules = _resolve_hit_policy(
-                fired_rules, self._handler.hit_policies[output_name])
-            new_rule = rule_factory.create_rule(state, fired_rules,
-                                                output_name)
-            if new_rule is not None and new_rule not in rules:
-                if len(fired_rules) == 0:
-                    rules.append(new_rule)
-                else:
-                    rules.insert(rules.index(fired_rules[0]), new_rule)
-                raise _CancelEvaluationException()
-            elif len(fired_rules) > 0:
-                state = dict(state, **fired_rules[0].consequent)
-            return state
+            try:
+                _, consequent = _resolve_hit_policy(
+                    fired_rules, self._handler.hit_policies[output_name],
+                    output_name, self._handler.output_values.get(output_name))
+            except HitPolicyViolation:
+                return state
+            if consequent is None:
+                return state
+            return dict(state, **consequent)
 
+        state = {name: value for name, value in record.items()
+                 if name != decision}
+        for name in self._handler.dependencies[decision]:
+            if (state.get(name) is not None
+                    or name not in self._handler.dependencies):
+                continue
+            state.update(snapshot.engine.evaluate_plan(
+                snapshot.plan(name), state, post_eval_cb=post_eval_cb))
+        return state
+
+    def _decide(self, inputs, decision, rule_factory):
+        return self._decide_state(inputs, decision, rule_factory)[decision]
+
+    def _decide_state(self, inputs, decision, rule_factory):
+        self._load_rules(decision)
+        key = None
+        if self._cache is not None:
+            key = _cache_key(self._snapshot, inputs, decision)
+            if key is not None:
+                found, value = self._cache.get(key)
+                if self._instrumentation is not None:
+                    self._instrumentation.cache_lookup(found)
+                if found:
+                    return {decision: value}
         state = None
-        rule_count = len(rules)
-        rules_changed = False
-        while state is None:
+        if self._compiled:
+            state = self._snapshot.compiled_model(
+                self._handler.output_values, self._compiled_path).evaluate(
+                    decision, inputs)
+        if state is None:
+            state = self._evaluate(
+                lambda snapshot, post_eval_cb: snapshot.engine.evaluate_plan(
+                    snapshot.plan(decision), inputs,
+                    post_eval_cb=post_eval_cb),
+                rule_factory)
+        value = state[decision]
+        if key is not None and value is not None:
+            self._cache.put(key, value)
+        return state
+
+    def _decide_many(self, inputs, decision, rule_factory):
+        self._load_rules(decision)
+        columns, count = _to_columns(inputs)
+        columns = self._evaluate(
+            lambda snapshot, post_eval_cb:
+            snapshot.indexed_engine().backward_chain_many(
+                decision, columns, count, post_eval_cb=post_eval_cb),
+            rule_factory)
+        return columns[decision]
+
+    async def _run_async(self, fn, executor):
+        rule_factory = self._create_rule_factory(synchronous=False)
+        deferred_factory = None
+        if isinstance(rule_factory, common.AsyncRuleFactory):
+            deferred_factory = _DeferredRuleFactory()
+        loop = asyncio.get_running_loop()
+        while True:
             try:
-                state = ruly.backward_chain(self._knowledge_base, decision,
-                                            post_eval_cb=post_eval_cb,
-                                            **inputs)
-            except _CancelEvaluationException:
-                if len(rules) == rule_count:
+                if executor is None:
+                    return fn(deferred_factory or rule_factory)
+                return await loop.run_in_executor(
+                    executor, fn, deferred_factory or rule_factory)
+            except _RuleRequested as e:
+                rule = await rule_factory.create_rule(*e.request)
+                deferred_factory.answer(e.request, rule)
+
+    def _measure(self, fn, decision, inputs):
+        if self._instrumentation is None:
+            return fn()
+        start = time.perf_counter()
+        result = fn()
+        self._report(decision, inputs, result, start)
+        return result
+
+    def _report(self, decision, inputs, result, start):
+        if self._instrumentation is None:
+            return
+        duration = time.perf_counter() - start
+        if inputs is None:
+            self._instrumentation.decision_made(decision, duration)
+        else:
+            self._instrumentation.batch_made(decision, len(result), duration)
+
+    def _create_rule_factory(self, synchronous):
+        if self._factory_cb is None:
+            return _ConsoleRuleFactory(self._handler)
+        rule_factory = self._factory_cb(self._handler)
+        if synchronous and isinstance(rule_factory, common.AsyncRuleFactory):
+            raise TypeError('asynchronous rule factories can only be used '
+                            'with adecide and decide_many_async')
+        return rule_factory
+
+    def _evaluate(self, evaluate_fn, rule_factory):
+        rules_changed = False
+        snapshot = None
+        instrumentation = self._instrumentation
+        if instrumentation is not None:
+            rule_factory = _MeasuredRuleFactory(rule_factory, instrumentation)
+
+        def post_eval_cb(state, output_name, fired_rules):
+            nonlocal rules_changed
+            hit_policy = self._handler.hit_policies[output_name]
+            output_values = self._handler.output_values.get(output_name)
+            current = self._snapshot
+            if current is not snapshot:
+                fired_rules = current.engine.fired_rules(
+                    current.complete_state(state), output_name)
+            if instrumentation is None:
+                fired_rules, consequent = _resolve_hit_policy(
+                    fired_rules, hit_policy, output_name, output_values)
+            else:
+                start = time.perf_counter()
+                fired_rules, consequent = _resolve_hit_policy(
+                    fired_rules, hit_policy, output_name, output_values)
+                instrumentation.hit_policy_resolved(
+                    output_name, time.perf_counter() - start)
+            new_rule = rule_factory.create_rule(state, fired_rules,
+                                                output_name)
+            while new_rule is not None:
+                latest, inserted = self._learn(new_rule, fired_rules)
+                if not inserted and latest is current:
                     break
-                else:
+                current = latest
+                if inserted:
                     rules_changed = True
-                    self._knowledge_base = ruly.KnowledgeBase(*rules)
+                    if not _can_evaluate(latest.knowledge_base, state,
+                                         new_rule):
+                        raise _CancelEvaluationException()
+                fired_rules, consequent = _resolve_hit_policy(
+                    latest.engine.fired_rules(latest.complete_state(state),
+                                              output_name),
+                    hit_policy, output_name, output_values)
+                if not inserted:
+                    break
+                new_rule = rule_factory.create_rule(state, fired_rules,
+                                                    output_name)
+            if consequent is not None:
+                state = dict(state, **consequent)
+            return state
 
-        if rules_changed:
-            self._handler.update(self._knowledge_base)
+        try:
+            while True:
+                snapshot = self._snapshot
+                try:
+                    return evaluate_fn(snapshot, post_eval_cb)
+                except _CancelEvaluationException:
+                    if instrumentation is not None:
+                        instrumentation.evaluation_restarted()
+        finally:
+            if rules_changed:
+                with self._learn_lock:
+                    start = time.perf_counter()
+                    self._handler.update(self._snapshot.knowledge_base)
+                    if instrumentation is not None:
+                        instrumentation.handler_updated(
+                            time.perf_counter() - start)
 
-        return state[decision]
+    def _learn(self, rule, fired_rules):
+        with self._learn_lock:
+            rules = self._snapshot.knowledge_base
+            if rule in rules:
+                return self._snapshot, False
+            if len(fired_rules) == 0:
+                position = len(rules)
+            else:
+                position = rules.index(fired_rules[0])
+            self._check([rule])
+            return self._publish([(position, rule)]), True
+
+    def _load_rules(self, decision):
+        if decision in self._loaded_decisions:
+            return
+        with self._learn_lock:
+            if decision in self._loaded_decisions:
+                return
+            rules = self._snapshot.knowledge_base
+            names = planner.plan_variables(self._snapshot.plan(decision))
+            new_rules = self._analyzed(self._handler.load_rules(names))
+            if len(new_rules) > 0:
+                self._publish(enumerate(new_rules, len(rules)))
+            self._loaded_decisions = self._loaded_decisions.union(names)
+
+    def _publish(self, insertions):
+        start = time.perf_counter()
+        insertions = list(insertions)
+        if self._snapshot is None:
+            rules = knowledge_base.KnowledgeBase()
+            generation = 0
+            graph = planner.dependency_graph(
+                self._handler.dependencies,
+                [rule for _, rule in insertions])
+            plans = {}
+        else:
+            rules = self._snapshot.knowledge_base.copy()
+            generation = self._snapshot.generation + 1
+            graph = planner.add_rules(self._snapshot.graph,
+                                      [rule for _, rule in insertions])
+            plans = ({} if graph is not self._snapshot.graph
+                     else self._snapshot.plans)
+        for position, rule in insertions:
+            rules.insert(position, rule)
+        hit_policies = self._engine_hit_policies()
+        if self._snapshot is None:
+            rules_engine = self._engine_cls(rules, hit_policies,
+                                            self._instrumentation)
+        else:
+            rules_engine = self._snapshot.engine.updated(
+                rules, dict.fromkeys(itertools.chain.from_iterable(
+                    rule.consequent for _, rule in insertions)),
+                hit_policies)
+        snapshot = _Snapshot(
+            rules, rules_engine, hit_policies, generation,
+            self._instrumentation, graph, plans)
+        self._snapshot = snapshot
+        if self._cache is not None:
+            self._cache.clear()
+        if self._instrumentation is not None:
+            self._instrumentation.rules_published(
+                len(rules), time.perf_counter() - start)
+        return snapshot
+
+    def _analyzed(self, rules):
+        if not self._analyze:
+            return rules
+        issues = analysis.analyze(rules, self._handler.hit_policies)
+        self._issues.extend(issues)
+        self._unverified.update(issue.output_name for issue in issues
+                                if issue.kind in ('overlap', 'conflict'))
+        return analysis.minimize(rules, self._handler.hit_policies, issues)
+
+    def _check(self, new_rules):
+        if not self._analyze:
+            return
+        rules = self._snapshot.knowledge_base
+        output_names = dict.fromkeys(itertools.chain.from_iterable(
+            rule.consequent for rule in new_rules))
+        for output_name in output_names:
+            table_rules = [rule for rule in new_rules
+                           if output_name in rule.consequent]
+            issues = [issue for issue in analysis.table_issues(
+                output_name, rules.output_rules(output_name) + table_rules,
+                self._handler.hit_policies.get(output_name), table_rules)
+                if issue.kind in ('overlap', 'conflict')]
+            if len(issues) > 0:
+                self._issues.extend(issues)
+                self._unverified.add(output_name)
+
+    def _engine_hit_policies(self):
+        hit_policies = self._handler.hit_policies
+        if not self._analyze:
+            return hit_policies
+        return {output_name: (common.HitPolicy.FIRST
+                              if hit_policy in (common.HitPolicy.UNIQUE,
+                                                common.HitPolicy.ANY)
+                              and output_name not in self._unverified
+                              else hit_policy)
+                for output_name, hit_policy in hit_policies.items()}
 
 
 def rule_factory_cb(handler):
@@ -91,24 +647,165 @@ def rule_factory_cb(handler):
         handler (ruly_dmn.ModelHandler): model handler
 
     Returns:
-        ruly_dmn.RuleFactory: rule factory"""
+        Union[ruly_dmn.RuleFactory, ruly_dmn.AsyncRuleFactory]: rule
+        factory"""
+
+
+class Session:
+    """Evaluation session for inputs that change one at a time, e.g. in an
+    interactive form. Decisions made by the session, including the
+    intermediate decisions they depend on, are remembered until an input
+    they transitively depend on is changed. Rules added to the model, by
+    the rule factory or otherwise, invalidate the remembered decisions of
+    tables whose rules or hit policies changed, and the decisions depending
+    on them. Decisions that couldn't be made aren't remembered, so they are
+    attempted again, with the rule factory, on every call.
+
+    Dependencies are taken from the model's dependency graph, i.e. the
+    handler's dependencies extended with variables referenced by the rules.
+    Sessions aren't thread-safe, they should be created with
+    :meth:`DMN.session`.
+
+    Args:
+        model (ruly_dmn.DMN): model
+        inputs (Optional[Dict[str, Any]]): name-value pairs of initial
+            inputs"""
+
+    def __init__(self, model, inputs=None):
+        self._model = model
+        self._inputs = {name: value for name, value in (inputs or {}).items()
+                        if value is not None}
+        self._decisions = {}
+        self._snapshot = model._snapshot
+        self._dependents = _dependents(self._snapshot.graph)
+
+    @property
+    def inputs(self):
+        """Dict[str, Any]: current inputs"""
+        return dict(self._inputs)
+
+    @property
+    def decisions(self):
+        """Dict[str, Any]: remembered decisions, by name"""
+        self._refresh()
+        return dict(self._decisions)
+
+    def update(self, inputs):
+        """Changes input values and forgets decisions that depend on the
+        changed ones
+
+        Args:
+            inputs (Dict[str, Any]): name-value pairs of changed inputs,
+                inputs whose value is None are removed
+
+        Returns:
+            Set[str]: names of forgotten decisions"""
+        changed = []
+        for name, value in inputs.items():
+            if self._inputs.get(name) == value:
+                continue
+            changed.append(name)
+            if value is None:
+                del self._inputs[name]
+            else:
+                self._inputs[name] = value
+        return self._invalidate(changed)
+
+    def decide(self, decision):
+        """Makes a decision with the current inputs, evaluating only the
+        tables whose decisions aren't remembered
+
+        Args:
+            decision (str): name of the decision that should be resolved
+
+        Returns:
+            Any: calculated decision
+
+        Raises:
+            ruly_dmn.HitPolicyViolation: raised if hit policy violation is
+            detected
+            TypeError: raised if the rule factory is asynchronous"""
+        self._refresh()
+        if decision in self._inputs:
+            return self._inputs[decision]
+        if decision in self._decisions:
+            return self._decisions[decision]
+        model = self._model
+        state = dict(self._decisions, **self._inputs)
+        state = model._measure(
+            lambda: model._decide_state(
+                state, decision,
+                model._create_rule_factory(synchronous=True)),
+            decision, None)
+        graph = self._snapshot.graph
+        self._decisions.update(
+            (name, value) for name, value in state.items()
+            if value is not None and name in graph
+            and name not in self._inputs)
+        return state[decision]
+
+    def _refresh(self):
+        snapshot = self._model._snapshot
+        old_snapshot = self._snapshot
+        if snapshot is old_snapshot:
+            return
+        self._snapshot = snapshot
+        if snapshot.graph is not old_snapshot.graph:
+            self._dependents = _dependents(snapshot.graph)
+        rules = snapshot.knowledge_base
+        old_rules = old_snapshot.knowledge_base
+        self._invalidate([
+            name for name in snapshot.graph
+            if len(rules.output_rules(name))
+            != len(old_rules.output_rules(name))
+            or snapshot.hit_policies.get(name)
+            != old_snapshot.hit_policies.get(name)])
+
+    def _invalidate(self, names):
+        forgotten = set()
+        visited = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name in visited:
+                continue
+            visited.add(name)
+            if self._decisions.pop(name, None) is not None:
+                forgotten.add(name)
+            stack.extend(self._dependents.get(name, ()))
+        return forgotten
 
 
 class HitPolicyViolation(Exception):
     """Exception raised when a hit policy is violated"""
 
 
+LearnSummary = collections.namedtuple('LearnSummary', [
+    'added', 'duplicates', 'redundant', 'conflicts'])
+LearnSummary.__doc__ = """Result of :meth:`DMN.learn`
+
+Attributes:
+    added (int): number of added rules
+    duplicates (int): number of rules skipped because they were already in
+        the knowledge base or were created from an earlier record
+    redundant (int): number of rules skipped because their decision was
+        already made with the expected value
+    conflicts (int): number of rules skipped because an earlier record
+        expected a different value for the same inputs"""
+
+
 class _ConsoleRuleFactory(common.RuleFactory):
 
     def __init__(self, handler):
-        self._rejections = []
+        self._rejections = set()
         self._handler = handler
 
     def create_rule(self, state, fired_rules, output_name):
         input_names = self._handler.dependencies[output_name]
         input_values = {name: state[name] for name in input_names
                         if state[name] is not None}
-        if (input_values, output_name) in self._rejections:
+        rejection = (knowledge_base.value_key(input_values), output_name)
+        if rejection in self._rejections:
             return None
         if not self._show_prompts(fired_rules, state, input_names):
             return None
@@ -120,7 +817,7 @@ class _ConsoleRuleFactory(common.RuleFactory):
                         f'available input decisions - {input_values}, would '
                         f'you like to create a new rule that does?')
         if not self._confirm_creation(question):
-            self._rejections.append((input_values, output_name))
+            self._rejections.add(rejection)
             return None
 
         rule = self._create_prompt(input_values, output_name)
@@ -173,18 +870,218 @@ class _CancelEvaluationException(Exception):
     pass
 
 
-def _resolve_hit_policy(fired_rules, hit_policy):
+_RuleRequest = collections.namedtuple('_RuleRequest',
+                                      ['state', 'fired_rules', 'output_name'])
+
+
+class _RuleRequested(Exception):
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.request = request
+
+
+class _DeferredRuleFactory(common.RuleFactory):
+
+    def __init__(self):
+        self._answers = []
+
+    def create_rule(self, state, fired_rules, output_name):
+        request = _RuleRequest(dict(state), list(fired_rules), output_name)
+        for answered_request, rule in self._answers:
+            if answered_request == request:
+                return rule
+        raise _RuleRequested(request)
+
+    def answer(self, request, rule):
+        self._answers.append((request, rule))
+
+
+class _MeasuredRuleFactory(common.RuleFactory):
+
+    def __init__(self, rule_factory, instrumentation):
+        self._rule_factory = rule_factory
+        self._instrumentation = instrumentation
+
+    def create_rule(self, state, fired_rules, output_name):
+        start = time.perf_counter()
+        try:
+            return self._rule_factory.create_rule(state, fired_rules,
+                                                  output_name)
+        finally:
+            self._instrumentation.rule_factory_called(
+                output_name, time.perf_counter() - start)
+
+
+class _Snapshot:
+
+    def __init__(self, rules, output_engine, hit_policies, generation,
+                 instrumentation, graph, plans):
+        self.knowledge_base = rules
+        self.engine = output_engine
+        self.generation = generation
+        self.graph = graph
+        self.plans = plans
+        self.hit_policies = hit_policies
+        self._instrumentation = instrumentation
+        self._batch_engine = None
+        self._compiled_model = None
+
+    def indexed_engine(self):
+        if isinstance(self.engine, engine.IndexedEngine):
+            return self.engine
+        if self._batch_engine is None:
+            self._batch_engine = engine.IndexedEngine(
+                self.knowledge_base, self.hit_policies,
+                self._instrumentation)
+        return self._batch_engine
+
+    def compiled_model(self, output_values, path):
+        if self._compiled_model is None:
+            self._compiled_model = codegen.compile_rules(
+                self.knowledge_base.rules, self.graph, self.hit_policies,
+                output_values, path)
+        return self._compiled_model
+
+    def plan(self, decision):
+        plan = self.plans.get(decision)
+        if plan is None:
+            plan = planner.create_plan(self.graph, decision)
+            self.plans[decision] = plan
+        return plan
+
+    def complete_state(self, state):
+        names = self.knowledge_base.input_variables.union(
+            self.knowledge_base.derived_variables)
+        if names.issubset(state):
+            return state
+        return dict(dict.fromkeys(names), **state)
+
+
+def _dependents(graph):
+    dependents = {}
+    for decision, names in graph.items():
+        for name in names:
+            dependents.setdefault(name, []).append(decision)
+    return dependents
+
+
+def _expected_rule(handler, state, decision, expected):
+    antecedent = ruly.Expression(
+        ruly.Operator.AND, tuple(ruly.EqualsCondition(name, state[name])
+                                 for name in handler.dependencies[decision]
+                                 if state.get(name) is not None))
+    return ruly.Rule(antecedent, {decision: expected})
+
+
+def _decides(handler, fired_rules, decision, expected):
+    try:
+        _, consequent = _resolve_hit_policy(
+            fired_rules, handler.hit_policies[decision], decision,
+            handler.output_values.get(decision))
+    except HitPolicyViolation:
+        return False
+    return consequent is not None and consequent.get(decision) == expected
+
+
+def _cache_key(snapshot, inputs, decision):
+    key = (snapshot.generation, decision,
+           tuple(inputs.get(name) for name
+                 in planner.plan_variables(snapshot.plan(decision))))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _can_evaluate(knowledge_base, state, rule):
+    if any(name not in state for name in rule.consequent):
+        return False
+    for name in ruly.get_rule_depending_variables(rule):
+        if name not in state:
+            return False
+        if state[name] is None and name in knowledge_base.derived_variables:
+            return False
+    return True
+
+
+def _to_columns(inputs):
+    if isinstance(inputs, collections.abc.Mapping):
+        columns = {name: _to_list(values) for name, values in inputs.items()}
+        counts = set(len(values) for values in columns.values())
+        if len(counts) > 1:
+            raise ValueError('input columns have different lengths')
+        return columns, counts.pop() if counts else 0
+    records = list(inputs)
+    names = dict.fromkeys(itertools.chain.from_iterable(records))
+    columns = {name: [record.get(name) for record in records]
+               for name in names}
+    return columns, len(records)
+
+
+def _to_list(values):
+    if hasattr(values, 'tolist'):
+        return values.tolist()
+    return list(values)
+
+
+def _resolve_hit_policy(fired_rules, hit_policy, output_name,
+                        output_values):
     if hit_policy == common.HitPolicy.UNIQUE:
         if len(fired_rules) > 1:
             raise HitPolicyViolation(f'multiple rules fired for a decision '
                                      f'with unique hit policy: {fired_rules}')
-        return fired_rules
-    if hit_policy == common.HitPolicy.FIRST:
-        return [fired_rules[0]] if len(fired_rules) > 0 else []
-    if hit_policy == common.HitPolicy.ANY:
+    elif hit_policy == common.HitPolicy.FIRST:
+        fired_rules = fired_rules[:1]
+    elif hit_policy == common.HitPolicy.ANY:
         if not all(r.consequent == fired_rules[0].consequent
                    for r in fired_rules):
             raise HitPolicyViolation(f'rules with different outputs '
                                      f'satisfied, while hit policy is any: '
                                      f'{fired_rules}')
-        return [fired_rules[0]]
+        fired_rules = fired_rules[:1]
+    elif hit_policy == common.HitPolicy.PRIORITY:
+        if len(fired_rules) > 0:
+            fired_rules = [min(fired_rules, key=_priority_key_fn(
+                output_name, output_values))]
+    elif hit_policy == common.HitPolicy.OUTPUT_ORDER:
+        fired_rules = sorted(fired_rules, key=_priority_key_fn(
+            output_name, output_values))
+    if len(fired_rules) == 0:
+        return fired_rules, None
+    if hit_policy not in _multiple_hit_policies:
+        return fired_rules, fired_rules[0].consequent
+    aggregate = _aggregations.get(hit_policy, list)
+    names = dict.fromkeys(itertools.chain.from_iterable(
+        rule.consequent for rule in fired_rules))
+    return fired_rules, {
+        name: aggregate([rule.consequent[name] for rule in fired_rules
+                         if name in rule.consequent])
+        for name in names}
+
+
+def _priority_key_fn(output_name, output_values):
+    output_values = output_values or []
+
+    def key(rule):
+        try:
+            return output_values.index(rule.consequent.get(output_name))
+        except ValueError:
+            return len(output_values)
+
+    return key
+
+
+_multiple_hit_policies = {common.HitPolicy.COLLECT,
+                          common.HitPolicy.COLLECT_SUM,
+                          common.HitPolicy.COLLECT_MIN,
+                          common.HitPolicy.COLLECT_MAX,
+                          common.HitPolicy.COLLECT_COUNT,
+                          common.HitPolicy.RULE_ORDER,
+                          common.HitPolicy.OUTPUT_ORDER}
+
+_aggregations = {common.HitPolicy.COLLECT_SUM: sum,
+                 common.HitPolicy.COLLECT_MIN: min,
+                 common.HitPolicy.COLLECT_MAX: max,
+                 common.HitPolicy.COLLECT_COUNT: len}
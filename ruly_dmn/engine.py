@@ -0,0 +1,476 @@
+import copy
+import heapq
+import operator
+import ruly
+
+from ruly_dmn import common
+from ruly_dmn import conditions
+from ruly_dmn import planner
+
+
+class LinearEngine:
+    """Evaluation engine equivalent to :func:`ruly.backward_chain`, which
+    evaluates rules of an output one by one, in knowledge base order. Unlike
+    :func:`ruly.backward_chain`, it stops evaluating an output's rules as soon
+    as the result of its hit policy is known - after the first fired rule for
+    the FIRST policy, after the second one for UNIQUE and after the first one
+    with a different output for ANY.
+
+    Args:
+        knowledge_base (ruly.KnowledgeBase): knowledge base
+        hit_policies (Optional[Dict[str, ruly_dmn.HitPolicy]]): hit policies
+            of outputs, if None or if an output's hit policy isn't set, all of
+            its rules are evaluated
+        instrumentation (Optional[ruly_dmn.instrumentation.Instrumentation]):
+            instrumentation notified after each table is evaluated"""
+
+    def __init__(self, knowledge_base, hit_policies=None,
+                 instrumentation=None):
+        self._knowledge_base = knowledge_base
+        self._hit_policies = hit_policies or {}
+        self._instrumentation = instrumentation
+
+    @property
+    def knowledge_base(self):
+        """ruly.KnowledgeBase: knowledge base"""
+        return self._knowledge_base
+
+    def backward_chain(self, output_name, post_eval_cb=None, **kwargs):
+        """Evaluates the output, equivalent to :func:`ruly.backward_chain`,
+        except that post_eval_cb may receive only the fired rules needed to
+        resolve the output's hit policy
+
+        Args:
+            output_name (str): name of the goal variable
+            post_eval_cb (Optional[Callable]): callback called after
+                determining which rules fired, signature should match
+                :func:`ruly.post_eval_cb`
+            **kwargs (Dict[str, Any]): names and values of input variables
+
+        Returns:
+            Dict[str, Any]: state containing calculated values"""
+        variables = self._knowledge_base.input_variables.union(
+            self._knowledge_base.derived_variables)
+        state = {name: kwargs.get(name) for name in variables}
+        return self._chain(state, output_name, post_eval_cb)
+
+    def evaluate_plan(self, plan, inputs, post_eval_cb=None):
+        """Evaluates the goal of a plan, equivalent to
+        :meth:`backward_chain`, except that the state contains only the
+        variables of the plan
+
+        Args:
+            plan (ruly_dmn.planner.Plan): plan created from the knowledge
+                base's rules
+            inputs (Dict[str, Any]): names and values of input variables
+            post_eval_cb (Optional[Callable]): callback called after
+                determining which rules fired, signature should match
+                :func:`ruly.post_eval_cb`
+
+        Returns:
+            Dict[str, Any]: state containing calculated values"""
+        state = {name: inputs.get(name)
+                 for name in planner.plan_variables(plan)}
+        return self._chain(state, plan.goal, post_eval_cb)
+
+    def updated(self, knowledge_base, output_names, hit_policies=None):
+        """Creates an engine for a knowledge base that differs from this
+        engine's knowledge base only in rules of the given outputs. Rules are
+        read from the knowledge base on every evaluation, so nothing is
+        shared. Exists so the engines can be used interchangeably.
+
+        Args:
+            knowledge_base (ruly.KnowledgeBase): new knowledge base
+            output_names (Iterable[str]): outputs whose rules have changed
+            hit_policies (Optional[Dict[str, ruly_dmn.HitPolicy]]): hit
+                policies of outputs
+
+        Returns:
+            ruly_dmn.engine.LinearEngine"""
+        return LinearEngine(knowledge_base, hit_policies,
+                            self._instrumentation)
+
+    def fired_rules(self, state, output_name):
+        """Finds rules for an output whose antecedents are satisfied
+
+        Args:
+            state (Dict[str, Any]): variable values
+            output_name (str): output name
+
+        Returns:
+            List[ruly.Rule]: fired rules, in knowledge base order"""
+        return [rule for rule in _output_rules(self._knowledge_base,
+                                               output_name)
+                if conditions.evaluate(state, rule.antecedent)]
+
+    def _chain(self, state, output_name, post_eval_cb):
+        if state[output_name] is not None:
+            return state
+        hit_policy = self._hit_policies.get(output_name)
+        fired_rules = []
+        evaluated = 0
+        for rule in list(_output_rules(self._knowledge_base, output_name)):
+            for name in ruly.get_rule_depending_variables(rule):
+                if state[name] is not None:
+                    continue
+                if name in self._knowledge_base.input_variables:
+                    break
+                state = dict(state, **self._chain(dict(state), name,
+                                                  post_eval_cb))
+                if state[name] is None:
+                    break
+            evaluated += 1
+            if not conditions.evaluate(state, rule.antecedent):
+                continue
+            fired_rules.append(rule)
+            if post_eval_cb is None or _is_decided(hit_policy, fired_rules):
+                break
+        if self._instrumentation is not None:
+            self._instrumentation.table_evaluated(output_name, evaluated,
+                                                  len(fired_rules))
+        if post_eval_cb is None:
+            if len(fired_rules) > 0:
+                return dict(state, **fired_rules[0].consequent)
+            return state
+        return post_eval_cb(state, output_name, fired_rules)
+
+
+class IndexedEngine:
+    """Evaluation engine that indexes the rules of a knowledge base, used as a
+    faster alternative to :func:`ruly.backward_chain`.
+
+    Rules of every output are grouped by the variables their equality
+    conditions reference, with each group stored in a hash table keyed by the
+    values of those variables. A variable without a condition in some rule
+    acts as a wildcard for that rule, so finding fired rules costs one lookup
+    per group instead of evaluating each rule's antecedent. Rules without
+    equality conditions are indexed by the intervals of their first range,
+    comparison or list condition, in a sorted interval index per variable.
+    Other conditions of found rules are evaluated afterwards, and rules that
+    can't be indexed (e.g. unhashable values) are evaluated one by one.
+
+    Like :class:`LinearEngine`, it stops matching an output's rules as soon
+    as the result of its hit policy is known.
+
+    Args:
+        knowledge_base (ruly.KnowledgeBase): knowledge base whose rules are
+            indexed
+        hit_policies (Optional[Dict[str, ruly_dmn.HitPolicy]]): hit policies
+            of outputs, if None or if an output's hit policy isn't set, all of
+            its rules are matched
+        instrumentation (Optional[ruly_dmn.instrumentation.Instrumentation]):
+            instrumentation notified after each table is evaluated"""
+
+    def __init__(self, knowledge_base, hit_policies=None,
+                 instrumentation=None):
+        self._knowledge_base = knowledge_base
+        self._hit_policies = hit_policies or {}
+        self._instrumentation = instrumentation
+        self._refresh_variables()
+        table_rules = {}
+        for rule in knowledge_base.rules:
+            for output_name in rule.consequent:
+                table_rules.setdefault(output_name, []).append(rule)
+        self._tables = {output_name: _Table(rules)
+                        for output_name, rules in table_rules.items()}
+
+    @property
+    def knowledge_base(self):
+        """ruly.KnowledgeBase: indexed knowledge base"""
+        return self._knowledge_base
+
+    def backward_chain(self, output_name, post_eval_cb=None, **kwargs):
+        """Evaluates the output, equivalent to :func:`ruly.backward_chain`,
+        except that a derived variable is evaluated at most once per call and
+        that post_eval_cb may receive only the fired rules needed to resolve
+        the output's hit policy
+
+        Args:
+            output_name (str): name of the goal variable
+            post_eval_cb (Optional[Callable]): callback called after
+                determining which rules fired, signature should match
+                :func:`ruly.post_eval_cb`
+            **kwargs (Dict[str, Any]): names and values of input variables
+
+        Returns:
+            Dict[str, Any]: state containing calculated values"""
+        state = {name: kwargs.get(name) for name in self._variables}
+        return self._chain(state, output_name, post_eval_cb, set())
+
+    def evaluate_plan(self, plan, inputs, post_eval_cb=None):
+        """Evaluates the goal of a plan, by matching the tables of the plan's
+        decisions in order. The state contains only the variables of the
+        plan and tables of decisions that aren't needed, because the values
+        of decisions depending on them are given as inputs, are skipped.
+
+        Args:
+            plan (ruly_dmn.planner.Plan): plan created from the knowledge
+                base's rules
+            inputs (Dict[str, Any]): names and values of input variables
+            post_eval_cb (Optional[Callable]): callback called after
+                determining which rules fired, signature should match
+                :func:`ruly.post_eval_cb`
+
+        Returns:
+            Dict[str, Any]: state containing calculated values"""
+        state = {name: inputs.get(name)
+                 for name in planner.plan_variables(plan)}
+        needed = {plan.goal}
+        for name in reversed(plan.order):
+            if name in needed and state[name] is None:
+                needed.update(plan.dependencies[name])
+        for name in plan.order:
+            if name not in needed or state[name] is not None:
+                continue
+            table = self._tables.get(name)
+            fired_rules = ([] if table is None
+                           else self._match(table, state, name))
+            if post_eval_cb is not None:
+                state = post_eval_cb(state, name, fired_rules)
+            elif len(fired_rules) > 0:
+                state = dict(state, **fired_rules[0].consequent)
+        return state
+
+    def backward_chain_many(self, output_name, columns, count,
+                            post_eval_cb=None):
+        """Evaluates the output for a batch of inputs, one decision table at a
+        time. Fired rules are looked up once per distinct combination of a
+        table's variable values, and the result is shared between all records
+        containing that combination.
+
+        Args:
+            output_name (str): name of the goal variable
+            columns (Dict[str, List[Any]]): names of input variables and their
+                values for each record
+            count (int): number of records
+            post_eval_cb (Optional[Callable]): callback called after
+                determining which rules fired, signature should match
+                :func:`ruly.post_eval_cb`. Called with the state of the first
+                record containing a combination
+
+        Returns:
+            Dict[str, List[Any]]: calculated values of all variables, for each
+            record"""
+        columns = {name: (list(columns[name]) if name in columns
+                          else [None] * count)
+                   for name in self._variables}
+        self._chain_many(columns, count, output_name, post_eval_cb, set())
+        return columns
+
+    def updated(self, knowledge_base, output_names, hit_policies=None):
+        """Creates an engine for a knowledge base that differs from this
+        engine's knowledge base only in rules of the given outputs. Only
+        those outputs are indexed again, indexes of other outputs are shared
+        with this engine.
+
+        Args:
+            knowledge_base (ruly.KnowledgeBase): new knowledge base
+            output_names (Iterable[str]): outputs whose rules have changed
+            hit_policies (Optional[Dict[str, ruly_dmn.HitPolicy]]): hit
+                policies of outputs
+
+        Returns:
+            ruly_dmn.engine.IndexedEngine"""
+        engine = copy.copy(self)
+        engine._knowledge_base = knowledge_base
+        engine._hit_policies = hit_policies or {}
+        engine._tables = dict(self._tables)
+        for output_name in output_names:
+            engine._tables[output_name] = _Table(
+                _output_rules(knowledge_base, output_name))
+        engine._refresh_variables()
+        return engine
+
+    def fired_rules(self, state, output_name):
+        """Finds rules for an output whose antecedents are satisfied
+
+        Args:
+            state (Dict[str, Any]): variable values
+            output_name (str): output name
+
+        Returns:
+            List[ruly.Rule]: fired rules, in knowledge base order"""
+        table = self._tables.get(output_name)
+        if table is None:
+            return []
+        return table.match(state)[0]
+
+    def _refresh_variables(self):
+        self._derived_variables = set(self._knowledge_base.derived_variables)
+        self._variables = self._knowledge_base.input_variables.union(
+            self._derived_variables)
+
+    def _match(self, table, state, output_name):
+        fired_rules, evaluated = table.match(
+            state, self._hit_policies.get(output_name))
+        if self._instrumentation is not None:
+            self._instrumentation.table_evaluated(output_name, evaluated,
+                                                  len(fired_rules))
+        return fired_rules
+
+    def _chain(self, state, output_name, post_eval_cb, visited):
+        if state[output_name] is not None or output_name in visited:
+            return state
+        visited.add(output_name)
+        table = self._tables[output_name]
+        for name in table.variables:
+            if name in self._derived_variables and state[name] is None:
+                state = self._chain(state, name, post_eval_cb, visited)
+        fired_rules = self._match(table, state, output_name)
+        if post_eval_cb is not None:
+            return post_eval_cb(state, output_name, fired_rules)
+        if len(fired_rules) > 0:
+            return dict(state, **fired_rules[0].consequent)
+        return state
+
+    def _chain_many(self, columns, count, output_name, post_eval_cb,
+                    visited):
+        if output_name in visited:
+            return
+        visited.add(output_name)
+        table = self._tables[output_name]
+        for name in table.variables:
+            if name in self._derived_variables:
+                self._chain_many(columns, count, name, post_eval_cb, visited)
+        output_column = columns[output_name]
+        table_columns = [columns[name] for name in table.variables]
+        changes_by_key = {}
+        for row in range(count):
+            if output_column[row] is not None:
+                continue
+            key = tuple(column[row] for column in table_columns)
+            try:
+                changes = changes_by_key.get(key)
+            except TypeError:
+                changes = self._row_changes(columns, row, output_name,
+                                            post_eval_cb)
+            else:
+                if changes is None:
+                    changes = self._row_changes(columns, row, output_name,
+                                                post_eval_cb)
+                    changes_by_key[key] = changes
+            for name, value in changes:
+                columns[name][row] = value
+
+    def _row_changes(self, columns, row, output_name, post_eval_cb):
+        state = {name: column[row] for name, column in columns.items()}
+        fired_rules = self._match(self._tables[output_name], state,
+                                  output_name)
+        if post_eval_cb is not None:
+            new_state = post_eval_cb(state, output_name, fired_rules)
+        elif len(fired_rules) > 0:
+            new_state = dict(state, **fired_rules[0].consequent)
+        else:
+            new_state = state
+        return [(name, value) for name, value in new_state.items()
+                if value is not state[name]]
+
+
+class _Table:
+
+    def __init__(self, rules):
+        variables = {}
+        groups = {}
+        interval_entries = {}
+        unindexed = []
+        for position, rule in enumerate(rules):
+            variables.update(dict.fromkeys(
+                ruly.get_rule_depending_variables(rule)))
+            split = _split_conditions(rule.antecedent)
+            if split is None:
+                unindexed.append((position, rule, False))
+                continue
+            equalities, others = split
+            if len(equalities) > 0 or len(others) == 0:
+                names = tuple(sorted(equalities))
+                key = tuple(equalities[name] for name in names)
+                try:
+                    groups.setdefault(names, {}).setdefault(key, []).append(
+                        (position, rule, len(others) == 0))
+                except TypeError:
+                    unindexed.append((position, rule, False))
+                continue
+            for condition in others:
+                condition_intervals = conditions.intervals(condition)
+                if condition_intervals is not None:
+                    interval_entries.setdefault(condition.name, []).append(
+                        (condition_intervals,
+                         (position, rule, len(others) == 1)))
+                    break
+            else:
+                unindexed.append((position, rule, False))
+        interval_indexes = {}
+        for name, entries in interval_entries.items():
+            try:
+                interval_indexes[name] = conditions.IntervalIndex(entries)
+            except TypeError:
+                unindexed.extend((position, rule, False)
+                                 for _, (position, rule, _) in entries)
+        unindexed.sort(key=operator.itemgetter(0))
+        self.variables = tuple(variables)
+        self._groups = groups
+        self._interval_indexes = interval_indexes
+        self._unindexed = unindexed
+
+    def match(self, state, hit_policy=None):
+        matches = [self._unindexed]
+        for names, index in self._groups.items():
+            try:
+                group_matches = index.get(tuple(state[name]
+                                                for name in names))
+            except TypeError:
+                continue
+            if group_matches is not None:
+                matches.append(group_matches)
+        for name, index in self._interval_indexes.items():
+            try:
+                matches.append(index.lookup(state[name]))
+            except TypeError:
+                continue
+        fired_rules = []
+        evaluated = 0
+        for _, rule, matched in heapq.merge(*matches,
+                                            key=operator.itemgetter(0)):
+            evaluated += 1
+            if matched or conditions.evaluate(state, rule.antecedent):
+                fired_rules.append(rule)
+                if _is_decided(hit_policy, fired_rules):
+                    break
+        return fired_rules, evaluated
+
+
+def _output_rules(knowledge_base, output_name):
+    if hasattr(knowledge_base, 'output_rules'):
+        return knowledge_base.output_rules(output_name)
+    return [rule for rule in knowledge_base.rules
+            if output_name in rule.consequent]
+
+
+def _is_decided(hit_policy, fired_rules):
+    if hit_policy == common.HitPolicy.FIRST:
+        return len(fired_rules) > 0
+    if hit_policy == common.HitPolicy.UNIQUE:
+        return len(fired_rules) > 1
+    if hit_policy == common.HitPolicy.ANY:
+        return fired_rules[-1].consequent != fired_rules[0].consequent
+    return False
+
+
+def _split_conditions(antecedent):
+    if isinstance(antecedent, ruly.Expression):
+        if antecedent.operator != ruly.Operator.AND:
+            return None
+        children = antecedent.children
+    else:
+        children = [antecedent]
+    equalities = {}
+    others = []
+    for child in children:
+        if not isinstance(child, ruly.Condition):
+            return None
+        if (isinstance(child, ruly.EqualsCondition)
+                and child.name not in equalities):
+            equalities[child.name] = child.value
+        else:
+            others.append(child)
+    return equalities, others
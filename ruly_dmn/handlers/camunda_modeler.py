@@ -1,11 +1,24 @@
+import hashlib
+import io
+import itertools
 import json
-import ruly
+import pathlib
+import threading
+import time
 import uuid
 import xml.etree.ElementTree
+import xml.parsers.expat
+import xml.sax.saxutils
 
+from ruly_dmn import artifact
 from ruly_dmn import common
+from ruly_dmn import conditions
+from ruly_dmn import persistence
+from ruly_dmn import table
+from ruly_dmn.knowledge_base import rule_key
 
 
+_namespace = 'https://www.omg.org/spec/DMN/20191111/MODEL/'
 _tags = {
     'decision': '{https://www.omg.org/spec/DMN/20191111/MODEL/}decision',
     'decisionTable': '{https://www.omg.org/spec/DMN/20191111/MODEL/}'
@@ -16,58 +29,92 @@ _tags = {
     'inputExpression': '{https://www.omg.org/spec/DMN/20191111/MODEL/}'
                        'inputExpression',
     'inputValues': '{https://www.omg.org/spec/DMN/20191111/MODEL/}inputValues',
+    'outputValues': '{https://www.omg.org/spec/DMN/20191111/MODEL/}'
+                    'outputValues',
     'text': '{https://www.omg.org/spec/DMN/20191111/MODEL/}text',
     'inputEntry': '{https://www.omg.org/spec/DMN/20191111/MODEL/}inputEntry',
     'outputEntry': '{https://www.omg.org/spec/DMN/20191111/MODEL/}outputEntry'}
 
 
 class CamundaModelerHandler(common.ModelHandler):
-    """Implementation of the handler that expects a Camunda Modeler DMN file
+    """Implementation of the handler that expects a Camunda Modeler DMN file.
+    Input entries of decision tables are parsed as FEEL simple unary tests,
+    see :func:`ruly_dmn.conditions.parse_unary_tests`. Each output of a table
+    is a decision, and rules of a table with multiple outputs assign all of
+    them at once, except outputs whose entries are empty. Parsed tables are
+    kept as :class:`ruly_dmn.table.DecisionTable` objects, which materialize
+    :attr:`rules` of each table when they are first requested. The XML tree
+    isn't kept after parsing, it is parsed again by the first update.
 
     Args:
         path (pathlib.Path): path to the DMN file
         dump_path (Optional[pathlib.Path]): path where updated DMN files will
             be dumped. Can be the same as path. If None, they aren't dumped
-            anywhere"""
+            anywhere
+        lazy (bool): if True, the file is scanned incrementally and only the
+            metadata and byte offsets of decisions are kept. Rules of a
+            decision are parsed when they are first requested with
+            :meth:`load_rules`, and its XML elements are read again when
+            the decision is first updated
+        artifact_path (Optional[pathlib.Path]): path of an artifact created
+            with :func:`ruly_dmn.artifact.compile_model`. If the artifact was
+            compiled from the current content of the DMN file, the model is
+            loaded from it and the XML is parsed only when it needs to be
+            updated, otherwise the artifact is ignored
+        flush_interval (Optional[float]): if set, updates are dumped on a
+            background thread, at most this many seconds after they are made
+        flush_count (Optional[int]): if set, updates are dumped on a
+            background thread, after this many updates. If neither
+            flush_interval nor flush_count are set, every update is dumped
+            immediately. Either way, dumps are atomic and pending updates are
+            dumped by :meth:`flush` and :meth:`close`
+        instrumentation (Optional[ruly_dmn.instrumentation.Instrumentation]):
+            instrumentation notified after each dump"""
 
-    def __init__(self, path, dump_path=None):
+    def __init__(self, path, dump_path=None, lazy=False, artifact_path=None,
+                 flush_interval=None, flush_count=None, instrumentation=None):
+        self._path = path
         self._dump_path = dump_path
-        tree = xml.etree.ElementTree.parse(path)
-        root = tree.getroot()
-        rules = []
-        dependencies = {}
-        hit_policies = {}
-        rule_ids = []
-        for decision in root.findall(_tags['decision']):
-            table = decision.find(_tags['decisionTable'])
-            inputs = [e.find(_tags['inputExpression']).find(_tags['text']).text
-                      for e in table.findall(_tags['input'])]
-            outputs = [e.get('name') for e in table.findall(_tags['output'])]
-            output_name = outputs[0]
-            dependencies[output_name] = inputs
-            hit_policy_str = table.attrib.get('hitPolicy') or 'UNIQUE'
-            hit_policies[output_name] = common.HitPolicy[hit_policy_str]
-            for rule_element in table.findall(_tags['rule']):
-                input_values = [
-                    e.find(_tags['text']).text
-                    for e in rule_element.findall(_tags['inputEntry'])]
-                antecedent = ruly.Expression(
-                    ruly.Operator.AND,
-                    tuple(ruly.EqualsCondition(input_name, json.loads(value))
-                          for input_name, value in zip(inputs, input_values)
-                          if value is not None))
-
-                output_values = [
-                    json.loads(e.find(_tags['text']).text)
-                    for e in rule_element.findall(_tags['outputEntry'])]
-                rule = ruly.Rule(antecedent, {output_name: output_values[0]})
-                rules.append(rule)
-                rule_ids.append((rule, rule_element.attrib['id']))
-        self._tree = tree
-        self._dependencies = dependencies
-        self._hit_policies = hit_policies
-        self._rule_ids = rule_ids
-        self._rules = [rule for rule, _ in self._rule_ids]
+        self._instrumentation = instrumentation
+        self._lock = threading.RLock()
+        self._persister = None
+        self._dump_digest = None
+        if dump_path is not None:
+            self._persister = persistence.Persister(
+                self._dump, flush_interval=flush_interval,
+                flush_count=flush_count)
+        self._dependencies = {}
+        self._hit_policies = {}
+        self._output_values = {}
+        self._rule_ids = []
+        self._rule_id_index = {}
+        self._tables = {}
+        self._table_outputs = {}
+        self._table_names = {}
+        self._table_revisions = {}
+        self._dirty_tables = set()
+        self._decisions = {}
+        self._tree = None
+        self._namespaces = None
+        self._locations = None
+        model = (artifact.read(artifact_path, path)
+                 if artifact_path is not None else None)
+        if model is not None:
+            self._import_model(model)
+            return
+        if lazy:
+            self._namespaces, locations = _scan(path)
+            self._locations = {}
+            for location in locations:
+                self._add_outputs(location.output_names, location.inputs,
+                                  location.hit_policy,
+                                  location.output_values)
+                self._locations[location.output_name] = location
+            return
+        self._tree = xml.etree.ElementTree.parse(path)
+        for decision in self._tree.getroot().findall(_tags['decision']):
+            self._add_decision(decision)
+        self._tree = None
 
     @property
     def dependencies(self):
@@ -75,52 +122,600 @@ class CamundaModelerHandler(common.ModelHandler):
 
     @property
     def rules(self):
-        return self._rules
+        return list(itertools.chain.from_iterable(
+            decision_table.rules()
+            for decision_table in self._tables.values()))
 
     @property
     def hit_policies(self):
         return self._hit_policies
 
+    @property
+    def output_values(self):
+        return self._output_values
+
+    @property
+    def dump_digest(self):
+        """Optional[bytes]: SHA-256 digest of the content of the last dump,
+        see :func:`ruly_dmn.artifact.content_hash`. It is set before the
+        dumped file replaces the old one, so a reader that sees the new
+        content can tell that it was written by this handler. None if
+        nothing was dumped"""
+        return self._dump_digest
+
+    def load_rules(self, output_names):
+        if self._locations is None:
+            return []
+        rules = []
+        with self._lock:
+            for output_name in output_names:
+                location = self._locations.get(
+                    self._table_names.get(output_name))
+                if location is None or location.loaded:
+                    continue
+                with open(self._path, 'rb') as f:
+                    decision = _read_decision(f, location, self._namespaces)
+                rules.extend(self._add_decision(decision).rules())
+                location.loaded = True
+        return rules
+
+    def export_model(self):
+        """Exports the parsed model, loading rules of all decisions first
+
+        Returns:
+            Dict[str, Any]: model containing only built-in types, with keys
+            ``dependencies``, ``hit_policies`` (names of hit policies),
+            ``output_values``, ``tables`` (names of outputs of each table)
+            and
+            ``rules`` (rule ID, conditions and consequent of each rule, with
+            each condition stored as its variable name and the text of its
+            unary tests)"""
+        self.load_rules(self._dependencies)
+        rule_ids = []
+        with self._lock:
+            learned_rules = {rule_id: rule
+                             for rule, rule_id in self._rule_ids}
+            for output_name, decision_table in self._tables.items():
+                rules = {decision_table.rule_id(index):
+                         decision_table.rule(index)
+                         for index in range(len(decision_table))}
+                for rule_id in self._table_rule_ids(output_name, rules):
+                    rule = (rules[rule_id] if rule_id in rules
+                            else learned_rules[rule_id])
+                    rule_ids.append((rule, rule_id))
+        return {
+            'dependencies': self._dependencies,
+            'hit_policies': {name: hit_policy.name for name, hit_policy
+                             in self._hit_policies.items()},
+            'output_values': self._output_values,
+            'tables': self._table_outputs,
+            'rules': [(rule_id,
+                       tuple((c.name, conditions.format_unary_tests(c))
+                             for c in rule.antecedent.children),
+                       rule.consequent)
+                      for rule, rule_id in rule_ids]}
+
     def update(self, knowledge_base):
-        root = self._tree.getroot()
-        for decision in root.findall(_tags['decision']):
-            table = decision.find(_tags['decisionTable'])
-            inputs = [e.find(_tags['inputExpression']).find(_tags['text']).text
-                      for e in table.findall(_tags['input'])]
-            outputs = [e.get('name') for e in table.findall(_tags['output'])]
-            output_name = outputs[0]
-            rules = [rule for rule in knowledge_base.rules
-                     if set(rule.consequent) == set([output_name])]
-            rule_index_elem_iter = ((i, el) for i, el in
-                                    enumerate(table.getchildren())
-                                    if el.tag == _tags['rule'])
-            elem = None
+        with self._lock:
+            self._load_tree()
+            for output_name in self._tables:
+                revision = _table_revision(knowledge_base,
+                                           self._table_outputs[output_name])
+                if (revision is None or
+                        revision != self._table_revisions.get(output_name)):
+                    self._dirty_tables.add(output_name)
+                self._table_revisions[output_name] = revision
+            output_rules = _output_rules_fn(knowledge_base)
+            updated = False
+            for output_name in self._dirty_tables:
+                rules = output_rules(self._table_outputs[output_name])
+                if self._update_table(self._decision(output_name),
+                                      output_name, rules):
+                    updated = True
+                    if self._locations is not None:
+                        self._locations[output_name].modified = True
+            self._dirty_tables.clear()
+        if updated and self._persister is not None:
+            self._persister.schedule()
+
+    def remove_rules(self, rules):
+        """Removes rules from their decision tables, e.g. rules found with
+        :func:`ruly_dmn.analysis.removable_rules`. Rules of all decisions are
+        loaded first, and the updated model is dumped like after
+        :meth:`update`. Rules that aren't in the model are ignored.
+
+        Args:
+            rules (Iterable[ruly.Rule]): rules
+
+        Returns:
+            int: number of removed rules"""
+        self.load_rules(self._dependencies)
+        removed_ids = {}
+        with self._lock:
+            self._load_tree()
             for rule in rules:
-                if elem is None:
-                    try:
-                        elem = next(rule_index_elem_iter)
-                    except StopIteration:
-                        elem = None
-                rule_ids = [rule_id for saved_rule, rule_id in self._rule_ids
-                            if saved_rule == rule]
-                if len(rule_ids) == 0:
-                    rule_id = None
-                else:
-                    rule_id = rule_ids[0]
-                if rule_id is not None:
-                    elem = None
+                for output_name in dict.fromkeys(
+                        self._table_names.get(name)
+                        for name in rule.consequent):
+                    rule_id = self._remove_rule(rule, output_name)
+                    if rule_id is not None:
+                        removed_ids.setdefault(output_name, set()).add(
+                            rule_id)
+            for output_name, rule_ids in removed_ids.items():
+                decision = self._decision(output_name)
+                if decision is None:
                     continue
-                rule_element = _rule_to_xml_element(rule, inputs, output_name)
-                self._rule_ids.append((rule, rule_element.attrib['id']))
-                if elem is None:
-                    table.append(rule_element)
-                else:
-                    table.insert(elem[0], rule_element)
-        if self._dump_path is not None:
-            self._tree.write(self._dump_path)
+                self._dirty_tables.add(output_name)
+                decision_table = decision.find(_tags['decisionTable'])
+                decision_table[:] = [
+                    element for element in decision_table
+                    if element.tag != _tags['rule']
+                    or element.attrib.get('id') not in rule_ids]
+                if self._locations is not None:
+                    self._locations[output_name].modified = True
+        if len(removed_ids) > 0 and self._persister is not None:
+            self._persister.schedule()
+        return sum(len(rule_ids) for rule_ids in removed_ids.values())
+
+    def flush(self):
+        if self._persister is not None:
+            self._persister.flush()
+
+    def close(self):
+        if self._persister is not None:
+            self._persister.close()
+
+    def discard(self):
+        if self._persister is not None:
+            self._persister.cancel()
+
+    def _load_tree(self):
+        if self._tree is None and self._locations is None:
+            self._tree = xml.etree.ElementTree.parse(self._path)
+            for decision in self._tree.getroot().findall(_tags['decision']):
+                self._decisions[_output_names(decision)[0]] = decision
+
+    def _decision(self, output_name):
+        decision = self._decisions.get(output_name)
+        if decision is None and self._locations is not None:
+            with open(self._path, 'rb') as f:
+                decision = _read_decision(f, self._locations[output_name],
+                                          self._namespaces)
+            self._decisions[output_name] = decision
+        return decision
+
+    def _table_rule_ids(self, output_name, rules):
+        # learned rules are inserted into the XML elements at their
+        # knowledge base positions, so if the elements were read, their
+        # order is used
+        decision = self._decisions.get(output_name)
+        if decision is None:
+            return list(rules)
+        return [element.attrib['id'] for element
+                in decision.find(_tags['decisionTable']).findall(
+                    _tags['rule'])]
+
+    def _remove_rule(self, rule, output_name):
+        decision_table = self._tables.get(output_name)
+        index = (decision_table.find(rule)
+                 if decision_table is not None else None)
+        if index is not None:
+            rule_id = decision_table.rule_id(index)
+            decision_table.remove(index)
+            return rule_id
+        for i, (saved_rule, rule_id) in enumerate(self._rule_ids):
+            if saved_rule == rule:
+                del self._rule_ids[i]
+                try:
+                    if self._rule_id_index.get(rule_key(rule)) == rule_id:
+                        del self._rule_id_index[rule_key(rule)]
+                except TypeError:
+                    pass
+                return rule_id
+        return None
+
+    def _import_model(self, model):
+        self._dependencies = model['dependencies']
+        self._hit_policies = {name: common.HitPolicy[hit_policy]
+                              for name, hit_policy
+                              in model['hit_policies'].items()}
+        self._output_values = model['output_values']
+        self._table_outputs = {name: tuple(output_names) for name, output_names
+                               in model['tables'].items()}
+        self._table_names = {output_name: name
+                             for name, output_names
+                             in self._table_outputs.items()
+                             for output_name in output_names}
+        parsed = {}
+        for rule_id, rule_conditions, consequent in model['rules']:
+            output_name = self._table_names[next(iter(consequent))]
+            output_names = self._table_outputs[output_name]
+            output_value = (consequent[output_name] if len(output_names) == 1
+                            else tuple(consequent.get(name)
+                                       for name in output_names))
+            decision_table = self._tables.get(output_name)
+            if decision_table is None:
+                decision_table = table.DecisionTable(
+                    output_name, self._dependencies[output_name],
+                    output_names if len(output_names) > 1 else None)
+                self._tables[output_name] = decision_table
+            row = dict.fromkeys(decision_table.inputs)
+            for name, text in rule_conditions:
+                row[name] = parsed.get((name, text))
+                if row[name] is None:
+                    row[name] = conditions.parse_unary_tests(name, text)
+                    parsed[name, text] = row[name]
+            decision_table.append(row.values(), output_value, rule_id)
+
+    def _add_decision(self, decision):
+        decision_table, hit_policy = _parse_decision(decision)
+        output_name = decision_table.output_name
+        self._add_outputs(decision_table.output_names, decision_table.inputs,
+                          hit_policy, _output_values(decision))
+        self._tables[output_name] = decision_table
+        return decision_table
+
+    def _add_outputs(self, output_names, inputs, hit_policy, output_values):
+        output_names = tuple(output_names)
+        self._table_outputs[output_names[0]] = output_names
+        for output_name in output_names:
+            self._table_names[output_name] = output_names[0]
+            self._dependencies[output_name] = list(inputs)
+            self._hit_policies[output_name] = hit_policy
+            if output_values.get(output_name) is not None:
+                self._output_values[output_name] = \
+                    output_values[output_name]
+
+    def _add_rule_id(self, rule, rule_id):
+        self._rule_ids.append((rule, rule_id))
+        try:
+            self._rule_id_index.setdefault(rule_key(rule),
+                                           rule_id)
+        except TypeError:
+            pass
+
+    def _get_rule_id(self, rule, output_name):
+        decision_table = self._tables.get(output_name)
+        if decision_table is not None:
+            index = decision_table.find(rule)
+            if index is not None:
+                return decision_table.rule_id(index)
+        try:
+            return self._rule_id_index.get(rule_key(rule))
+        except TypeError:
+            return next((rule_id for saved_rule, rule_id in self._rule_ids
+                         if saved_rule == rule), None)
+
+    def _update_table(self, decision, output_name, rules):
+        table = decision.find(_tags['decisionTable'])
+        inputs = self._dependencies[output_name]
+        output_names = self._table_outputs[output_name]
+        new_elements = {}
+        anchor_id = None
+        for rule in reversed(rules):
+            if not set(rule.consequent).issubset(output_names):
+                continue
+            rule_id = self._get_rule_id(rule, output_name)
+            if rule_id is not None:
+                anchor_id = rule_id
+                continue
+            rule_element = _rule_to_xml_element(rule, inputs, output_names)
+            self._add_rule_id(rule, rule_element.attrib['id'])
+            new_elements.setdefault(anchor_id, []).insert(0, rule_element)
+        if len(new_elements) == 0:
+            return False
+        children = []
+        for element in table:
+            if element.tag == _tags['rule']:
+                children.extend(new_elements.pop(element.attrib['id'], ()))
+            children.append(element)
+        children.extend(itertools.chain.from_iterable(new_elements.values()))
+        table[:] = children
+        return True
+
+    def _dump(self):
+        start = time.perf_counter()
+        data = None
+        with self._lock:
+            if self._tree is None:
+                self._dump_lazy()
+            else:
+                data = io.BytesIO()
+                self._tree.write(data)
+        if data is not None:
+            data = data.getvalue()
+
+            def write(dst):
+                dst.write(data)
+                self._dump_digest = hashlib.sha256(data).digest()
+
+            persistence.atomic_write(self._dump_path, write)
+        if self._instrumentation is not None:
+            self._instrumentation.model_dumped(time.perf_counter() - start)
+
+    def _dump_lazy(self):
+        locations = sorted(self._locations.values(),
+                           key=lambda location: location.start)
+        lengths = {}
+
+        def write(dst):
+            digest = hashlib.sha256()
+            dst = _DigestWriter(dst, digest)
+            with open(self._path, 'rb') as src:
+                position = 0
+                for location in locations:
+                    if not location.modified:
+                        continue
+                    _copy(src, dst, position, location.start - position)
+                    data = xml.etree.ElementTree.tostring(
+                        self._decisions[location.output_name],
+                        encoding='unicode').encode('utf-8')
+                    dst.write(data)
+                    lengths[location.output_name] = len(data)
+                    position = location.end
+                _copy(src, dst, position, None)
+            self._dump_digest = digest.digest()
+
+        in_place = (pathlib.Path(self._dump_path).resolve() ==
+                    pathlib.Path(self._path).resolve())
+        persistence.atomic_write(self._dump_path, write)
+        if not in_place:
+            return
+        shift = 0
+        for location in locations:
+            length = lengths.get(location.output_name,
+                                 location.end - location.start)
+            start = location.start + shift
+            shift += length - (location.end - location.start)
+            location.start, location.end = start, start + length
+            location.modified = False
+
+
+class _DigestWriter:
+
+    def __init__(self, f, digest):
+        self._f = f
+        self._digest = digest
+
+    def write(self, data):
+        self._digest.update(data)
+        return self._f.write(data)
 
 
-def _rule_to_xml_element(rule, inputs, output_name):
+class _DecisionLocation:
+
+    def __init__(self, start, end, output_names, inputs, hit_policy,
+                 output_values):
+        self.start = start
+        self.end = end
+        self.output_name = output_names[0]
+        self.output_names = output_names
+        self.inputs = inputs
+        self.hit_policy = hit_policy
+        self.output_values = output_values
+        self.loaded = False
+        self.modified = False
+
+
+def _parse_decision(decision):
+    table_element = decision.find(_tags['decisionTable'])
+    inputs = [e.find(_tags['inputExpression']).find(_tags['text']).text
+              for e in table_element.findall(_tags['input'])]
+    output_names = _output_names(decision)
+    decision_table = table.DecisionTable(
+        output_names[0], inputs,
+        output_names if len(output_names) > 1 else None)
+    hit_policy = _hit_policy(table_element.attrib)
+    parsed = {}
+    for rule_element in table_element.findall(_tags['rule']):
+        input_values = [
+            e.find(_tags['text']).text
+            for e in rule_element.findall(_tags['inputEntry'])]
+        input_conditions = []
+        for input_name, value in zip(inputs, input_values):
+            key = (input_name, value)
+            if key not in parsed:
+                parsed[key] = conditions.parse_unary_tests(input_name, value)
+            input_conditions.append(parsed[key])
+
+        output_values = tuple(
+            _parse_output_entry(e.find(_tags['text']).text)
+            for e in rule_element.findall(_tags['outputEntry']))
+        decision_table.append(
+            input_conditions,
+            output_values[0] if len(output_names) == 1 else output_values,
+            rule_element.attrib['id'])
+    return decision_table, hit_policy
+
+
+def _hit_policy(table_attrib):
+    hit_policy_str = table_attrib.get('hitPolicy') or 'UNIQUE'
+    aggregation = table_attrib.get('aggregation')
+    if hit_policy_str == 'COLLECT' and aggregation:
+        hit_policy_str = f'COLLECT_{aggregation}'
+    return common.HitPolicy[hit_policy_str]
+
+
+def _output_names(decision):
+    table = decision.find(_tags['decisionTable'])
+    return [e.get('name') for e in table.findall(_tags['output'])]
+
+
+def _output_values(decision):
+    output_values = {}
+    for output in decision.find(_tags['decisionTable']).findall(
+            _tags['output']):
+        values = output.find(_tags['outputValues'])
+        if values is not None:
+            output_values[output.get('name')] = _parse_output_values(
+                values.find(_tags['text']).text)
+    return output_values
+
+
+def _parse_output_entry(text):
+    if text is None or text.strip() == '':
+        return None
+    return json.loads(text)
+
+
+def _parse_output_values(text):
+    if not text:
+        return None
+    try:
+        return json.loads(f'[{text}]')
+    except json.JSONDecodeError:
+        return None
+
+
+def _table_revision(knowledge_base, output_names):
+    if not hasattr(knowledge_base, 'revision'):
+        return None
+    return tuple(knowledge_base.revision(output_name)
+                 for output_name in output_names)
+
+
+def _output_rules_fn(knowledge_base):
+    if hasattr(knowledge_base, 'output_rules'):
+        output_rules = knowledge_base.output_rules
+    else:
+        rules_by_output = {}
+        for rule in knowledge_base.rules:
+            for output_name in rule.consequent:
+                rules_by_output.setdefault(output_name, []).append(rule)
+
+        def output_rules(output_name):
+            return rules_by_output.get(output_name, [])
+
+    positions = None
+
+    def table_rules(output_names):
+        nonlocal positions
+        if len(output_names) == 1:
+            return output_rules(output_names[0])
+        if positions is None:
+            positions = {id(rule): position for position, rule
+                         in enumerate(knowledge_base.rules)}
+        rules = {id(rule): rule for output_name in output_names
+                 for rule in output_rules(output_name)}
+        return [rules[rule_id] for rule_id in sorted(rules, key=positions.get)]
+
+    return table_rules
+
+
+def _scan(path):
+    namespaces = {}
+    locations = []
+    stack = []
+    decision = None
+    parser = xml.parsers.expat.ParserCreate(namespace_separator='}')
+
+    def start_namespace_decl(prefix, uri):
+        if len(stack) == 0:
+            namespaces[prefix] = uri
+
+    def start_element(name, attrib):
+        nonlocal decision
+        tag = '{' + name if '}' in name else name
+        stack.append(tag)
+        if tag == _tags['decision'] and len(stack) == 2:
+            decision = {'start': parser.CurrentByteIndex,
+                        'inputs': [],
+                        'outputs': [],
+                        'hit_policy': None,
+                        'output_values': {},
+                        'text': None,
+                        'text_parent': None}
+        elif decision is None:
+            return
+        elif tag == _tags['decisionTable']:
+            decision['hit_policy'] = _hit_policy(attrib)
+        elif tag == _tags['output']:
+            decision['outputs'].append(attrib.get('name'))
+        elif tag == _tags['text'] and (
+                stack[-2] == _tags['inputExpression']
+                or stack[-2] == _tags['outputValues']):
+            decision['text'] = []
+            decision['text_parent'] = stack[-2]
+
+    def end_element(name):
+        nonlocal decision
+        tag = stack.pop()
+        if decision is None:
+            return
+        if tag == _tags['decision'] and len(stack) == 1:
+            locations.append(_DecisionLocation(
+                start=decision['start'],
+                end=parser.CurrentByteIndex,
+                output_names=tuple(decision['outputs']),
+                inputs=decision['inputs'],
+                hit_policy=decision['hit_policy'],
+                output_values=decision['output_values']))
+            decision = None
+        elif decision['text'] is not None:
+            text = ''.join(decision['text']) or None
+            if decision['text_parent'] == _tags['inputExpression']:
+                decision['inputs'].append(text)
+            else:
+                decision['output_values'][decision['outputs'][-1]] = \
+                    _parse_output_values(text)
+            decision['text'] = None
+
+    def character_data(data):
+        if decision is not None and decision['text'] is not None:
+            decision['text'].append(data)
+
+    parser.StartNamespaceDeclHandler = start_namespace_decl
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.CharacterDataHandler = character_data
+    with open(path, 'rb') as f:
+        parser.ParseFile(f)
+        for location in locations:
+            location.end = _element_end(f, location.end)
+    return namespaces, locations
+
+
+def _element_end(f, end_tag_start):
+    f.seek(end_tag_start)
+    data = f.read(2)
+    if data != b'</':
+        return end_tag_start
+    position = end_tag_start + 2
+    while True:
+        chunk = f.read(64)
+        if len(chunk) == 0:
+            raise ValueError('unterminated end tag')
+        index = chunk.find(b'>')
+        if index >= 0:
+            return position + index + 1
+        position += len(chunk)
+
+
+def _read_decision(f, location, namespaces):
+    f.seek(location.start)
+    data = f.read(location.end - location.start)
+    declarations = ' '.join(
+        f'xmlns={xml.sax.saxutils.quoteattr(uri)}' if prefix is None else
+        f'xmlns:{prefix}={xml.sax.saxutils.quoteattr(uri)}'
+        for prefix, uri in namespaces.items())
+    root = xml.etree.ElementTree.fromstring(
+        f'<definitions {declarations}>'.encode('utf-8') + data +
+        b'</definitions>')
+    return root.find(_tags['decision'])
+
+
+def _copy(src, dst, position, size):
+    src.seek(position)
+    while size is None or size > 0:
+        chunk = src.read(1 << 20 if size is None else min(size, 1 << 20))
+        if len(chunk) == 0:
+            break
+        dst.write(chunk)
+        if size is not None:
+            size -= len(chunk)
+
+
+def _rule_to_xml_element(rule, inputs, output_names):
     element = xml.etree.ElementTree.Element(
         _tags['rule'],
         attrib={'id': f'DecisionRule_{uuid.uuid1()}'})
@@ -132,14 +727,16 @@ def _rule_to_xml_element(rule, inputs, output_name):
             attrib={'id': f'UnaryTests_{uuid.uuid1()}'})
         text_element = xml.etree.ElementTree.Element(_tags['text'])
         if len(condition) == 1:
-            text_element.text = json.dumps(condition[0].value)
+            text_element.text = conditions.format_unary_tests(condition[0])
         input_entry_element.append(text_element)
         element.append(input_entry_element)
-    output_entry_element = xml.etree.ElementTree.Element(
-        _tags['outputEntry'],
-        attrib={'id': f'LiteralExpression_{uuid.uuid1()}'})
-    text_element = xml.etree.ElementTree.Element(_tags['text'])
-    text_element.text = json.dumps(rule.consequent[output_name])
-    output_entry_element.append(text_element)
-    element.append(output_entry_element)
+    for output_name in output_names:
+        output_entry_element = xml.etree.ElementTree.Element(
+            _tags['outputEntry'],
+            attrib={'id': f'LiteralExpression_{uuid.uuid1()}'})
+        text_element = xml.etree.ElementTree.Element(_tags['text'])
+        if output_name in rule.consequent:
+            text_element.text = json.dumps(rule.consequent[output_name])
+        output_entry_element.append(text_element)
+        element.append(output_entry_element)
     return element
@@ -0,0 +1,227 @@
+import collections
+import threading
+
+
+class Instrumentation:
+    """Hooks called while decisions are made, used to find out where the time
+    goes. All methods do nothing, subclasses override the ones they need.
+    Hooks may be called from multiple threads at once.
+
+    Instrumentation is passed to :class:`ruly_dmn.DMN`, which passes it to
+    its evaluation engines, and to
+    :class:`ruly_dmn.CamundaModelerHandler`, for dump durations. If it isn't
+    passed, hooks aren't called at all. Durations are in seconds."""
+
+    def decision_made(self, decision, duration):
+        """Called after :meth:`ruly_dmn.DMN.decide` finishes, and after each
+        goal of :meth:`ruly_dmn.DMN.decide_all` is resolved
+
+        Args:
+            decision (str): decision name
+            duration (float): wall time of the call"""
+
+    def batch_made(self, decision, records, duration):
+        """Called after :meth:`ruly_dmn.DMN.decide_many` finishes
+
+        Args:
+            decision (str): decision name
+            records (int): number of records
+            duration (float): wall time of the call"""
+
+    def table_evaluated(self, output_name, evaluated, fired):
+        """Called after rules of a decision table are matched against a
+        state
+
+        Args:
+            output_name (str): table's output name
+            evaluated (int): number of rules whose antecedents were evaluated
+                or looked up
+            fired (int): number of fired rules"""
+
+    def hit_policy_resolved(self, output_name, duration):
+        """Called after the hit policy of a decision table is resolved
+
+        Args:
+            output_name (str): table's output name
+            duration (float): resolution duration"""
+
+    def rule_factory_called(self, output_name, duration):
+        """Called after the rule factory's create_rule returns
+
+        Args:
+            output_name (str): output name passed to the factory
+            duration (float): duration of the call"""
+
+    def evaluation_restarted(self):
+        """Called when evaluation is restarted, because a new rule depends on
+        a variable that wasn't evaluated"""
+
+    def cache_lookup(self, hit):
+        """Called after a decision is looked up in the decision cache
+
+        Args:
+            hit (bool): whether the decision was found"""
+
+    def rules_published(self, rules, duration):
+        """Called after new rules are added to a knowledge base snapshot
+
+        Args:
+            rules (int): number of rules in the new snapshot
+            duration (float): duration of copying the knowledge base and
+                building its evaluation engine"""
+
+    def handler_updated(self, duration):
+        """Called after the model handler is updated with new rules
+
+        Args:
+            duration (float): duration of the update, including the dump if
+                the handler dumps immediately"""
+
+    def model_dumped(self, duration):
+        """Called after a model handler dumps the model
+
+        Args:
+            duration (float): dump duration"""
+
+
+Timing = collections.namedtuple('Timing', ['count', 'total', 'max'])
+Timing.__doc__ = """Aggregated durations
+
+Attributes:
+    count (int): number of measurements
+    total (float): sum of durations, in seconds
+    max (float): longest duration, in seconds"""
+
+TableStats = collections.namedtuple('TableStats',
+                                    ['evaluations', 'evaluated', 'fired'])
+TableStats.__doc__ = """Decision table statistics
+
+Attributes:
+    evaluations (int): number of times the table was matched against a state
+    evaluated (int): total number of evaluated rules
+    fired (int): total number of fired rules"""
+
+StatsSnapshot = collections.namedtuple('StatsSnapshot', [
+    'decisions', 'batches', 'batch_records', 'tables', 'hit_policies',
+    'rule_factory', 'restarts', 'cache_hits', 'cache_misses', 'publications',
+    'updates', 'dumps'])
+StatsSnapshot.__doc__ = """Statistics collected by :class:`Stats`
+
+Attributes:
+    decisions (Dict[str, Timing]): durations of decide calls, by decision
+    batches (Dict[str, Timing]): durations of decide_many calls, by decision
+    batch_records (Dict[str, int]): number of records decided in batches, by
+        decision
+    tables (Dict[str, TableStats]): rule evaluation statistics, by table's
+        output name
+    hit_policies (Timing): durations of hit policy resolutions
+    rule_factory (Timing): durations of rule factory calls
+    restarts (int): number of evaluation restarts
+    cache_hits (int): number of decisions found in the cache
+    cache_misses (int): number of decisions not found in the cache
+    publications (Timing): durations of knowledge base snapshot updates
+    updates (Timing): durations of model handler updates
+    dumps (Timing): durations of model dumps"""
+
+
+class Stats(Instrumentation):
+    """Instrumentation that aggregates measurements into counters, which are
+    cheap enough to be collected all the time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def snapshot(self):
+        """Returns collected statistics
+
+        Returns:
+            ruly_dmn.instrumentation.StatsSnapshot"""
+        with self._lock:
+            return StatsSnapshot(
+                decisions={name: Timing(*timing)
+                           for name, timing in self._decisions.items()},
+                batches={name: Timing(*timing)
+                         for name, timing in self._batches.items()},
+                batch_records=dict(self._batch_records),
+                tables={name: TableStats(*table)
+                        for name, table in self._tables.items()},
+                hit_policies=Timing(*self._hit_policies),
+                rule_factory=Timing(*self._rule_factory),
+                restarts=self._restarts,
+                cache_hits=self._cache_hits,
+                cache_misses=self._cache_misses,
+                publications=Timing(*self._publications),
+                updates=Timing(*self._updates),
+                dumps=Timing(*self._dumps))
+
+    def reset(self):
+        """Clears collected statistics"""
+        with self._lock:
+            self._decisions = {}
+            self._batches = {}
+            self._batch_records = {}
+            self._tables = {}
+            self._hit_policies = [0, 0.0, 0.0]
+            self._rule_factory = [0, 0.0, 0.0]
+            self._restarts = 0
+            self._cache_hits = 0
+            self._cache_misses = 0
+            self._publications = [0, 0.0, 0.0]
+            self._updates = [0, 0.0, 0.0]
+            self._dumps = [0, 0.0, 0.0]
+
+    def decision_made(self, decision, duration):
+        with self._lock:
+            _add(self._decisions.setdefault(decision, [0, 0.0, 0.0]),
+                 duration)
+
+    def batch_made(self, decision, records, duration):
+        with self._lock:
+            _add(self._batches.setdefault(decision, [0, 0.0, 0.0]), duration)
+            self._batch_records[decision] = \
+                self._batch_records.get(decision, 0) + records
+
+    def table_evaluated(self, output_name, evaluated, fired):
+        with self._lock:
+            table = self._tables.setdefault(output_name, [0, 0, 0])
+            table[0] += 1
+            table[1] += evaluated
+            table[2] += fired
+
+    def hit_policy_resolved(self, output_name, duration):
+        with self._lock:
+            _add(self._hit_policies, duration)
+
+    def rule_factory_called(self, output_name, duration):
+        with self._lock:
+            _add(self._rule_factory, duration)
+
+    def evaluation_restarted(self):
+        with self._lock:
+            self._restarts += 1
+
+    def cache_lookup(self, hit):
+        with self._lock:
+            if hit:
+                self._cache_hits += 1
+            else:
+                self._cache_misses += 1
+
+    def rules_published(self, rules, duration):
+        with self._lock:
+            _add(self._publications, duration)
+
+    def handler_updated(self, duration):
+        with self._lock:
+            _add(self._updates, duration)
+
+    def model_dumped(self, duration):
+        with self._lock:
+            _add(self._dumps, duration)
+
+
+def _add(timing, duration):
+    timing[0] += 1
+    timing[1] += duration
+    timing[2] = max(timing[2], duration)
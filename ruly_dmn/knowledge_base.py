@@ -0,0 +1,229 @@
+import itertools
+
+import ruly
+
+
+class KnowledgeBase:
+    """Knowledge base whose rules can be inserted in place, without rebuilding
+    it. Offers the same interface as :class:`ruly.KnowledgeBase`, so it can
+    be passed to :func:`ruly.backward_chain`.
+
+    Args:
+        *rules (ruly.Rule): initial rules"""
+
+    def __init__(self, *rules):
+        self._rules = []
+        self._rules_tuple = None
+        self._positions = {}
+        self._exact_positions = 0
+        self._keys = set()
+        self._output_rules = {}
+        self._revisions = {}
+        self._depending_variables = set()
+        self._derived_variables = set()
+        self._input_variables = set()
+        for rule in rules:
+            self.insert(len(self._rules), rule)
+
+    @property
+    def rules(self):
+        """Tuple[ruly.Rule]: stored rules"""
+        if self._rules_tuple is None:
+            self._rules_tuple = tuple(self._rules)
+        return self._rules_tuple
+
+    @property
+    def input_variables(self):
+        """Set[str]: names of variables that are never contained within a
+        rule's consequent"""
+        return self._input_variables
+
+    @property
+    def derived_variables(self):
+        """Set[str]: names of variables contained within at least one rule's
+        consequent"""
+        return self._derived_variables
+
+    def __len__(self):
+        return len(self._rules)
+
+    def __contains__(self, rule):
+        try:
+            return rule_key(rule) in self._keys
+        except TypeError:
+            return rule in self._rules
+
+    def output_rules(self, output_name):
+        """Returns rules that assign a value to the output
+
+        Args:
+            output_name (str): output name
+
+        Returns:
+            List[ruly.Rule]: rules, in knowledge base order"""
+        return self._output_rules.get(output_name, [])
+
+    def revision(self, output_name):
+        """Returns the revision of the output's rules, which changes whenever
+        a rule assigning a value to the output is inserted. Revisions are
+        unique across knowledge bases, except that copies keep the revisions
+        of the original, so equal revisions mean equal rules
+
+        Args:
+            output_name (str): output name
+
+        Returns:
+            int: revision, 0 if there are no rules for the output"""
+        return self._revisions.get(output_name, 0)
+
+    def index(self, rule):
+        """Finds the position of a rule
+
+        Args:
+            rule (ruly.Rule): rule
+
+        Returns:
+            int: position of the rule
+
+        Raises:
+            ValueError: if the rule isn't in the knowledge base"""
+        position = self._positions.get(id(rule))
+        if position is None or position >= self._exact_positions:
+            self._update_positions()
+            position = self._positions.get(id(rule))
+        if position is None:
+            return self._rules.index(rule)
+        return position
+
+    def insert(self, index, rule):
+        """Inserts a rule before the given position
+
+        Args:
+            index (int): position of the rule in the knowledge base
+            rule (ruly.Rule): rule"""
+        index = min(index, len(self._rules))
+        for output_name in rule.consequent:
+            output_rules = self._output_rules.setdefault(output_name, [])
+            if index == len(self._rules):
+                output_rules.append(rule)
+                continue
+            low, high = 0, len(output_rules)
+            while low < high:
+                middle = (low + high) // 2
+                if self._precedes(output_rules[middle], index):
+                    low = middle + 1
+                else:
+                    high = middle
+            output_rules.insert(low, rule)
+        for output_name in rule.consequent:
+            self._revisions[output_name] = next(_revision_counter)
+        if index == len(self._rules) == self._exact_positions:
+            self._exact_positions += 1
+        else:
+            self._exact_positions = min(self._exact_positions, index)
+        self._rules.insert(index, rule)
+        self._positions.setdefault(id(rule), index)
+        self._rules_tuple = None
+        try:
+            self._keys.add(rule_key(rule))
+        except TypeError:
+            pass
+        self._depending_variables.update(
+            ruly.get_rule_depending_variables(rule))
+        self._derived_variables.update(rule.consequent)
+        self._input_variables = (self._depending_variables -
+                                 self._derived_variables)
+
+    def copy(self):
+        """Creates a copy of the knowledge base, sharing the rule objects.
+        Rules aren't reindexed, so copying is cheaper than creating a new
+        knowledge base with the same rules.
+
+        Returns:
+            ruly_dmn.knowledge_base.KnowledgeBase"""
+        knowledge_base = KnowledgeBase()
+        knowledge_base._rules = list(self._rules)
+        knowledge_base._rules_tuple = self._rules_tuple
+        knowledge_base._positions = dict(self._positions)
+        knowledge_base._exact_positions = self._exact_positions
+        knowledge_base._keys = set(self._keys)
+        knowledge_base._output_rules = {
+            output_name: list(rules)
+            for output_name, rules in self._output_rules.items()}
+        knowledge_base._revisions = dict(self._revisions)
+        knowledge_base._depending_variables = set(self._depending_variables)
+        knowledge_base._derived_variables = set(self._derived_variables)
+        knowledge_base._input_variables = set(self._input_variables)
+        return knowledge_base
+
+    def _precedes(self, rule, index):
+        # stored positions are never greater than the actual ones, because
+        # insertions only move rules back, and they are exact below
+        # _exact_positions, so the positions are updated only if the stored
+        # one is ambiguous
+        position = self._positions.get(id(rule))
+        if position is not None:
+            if position >= index:
+                return False
+            if position < self._exact_positions:
+                return True
+        return self.index(rule) < index
+
+    def _update_positions(self):
+        positions = self._positions
+        start = self._exact_positions
+        for position in range(len(self._rules) - 1, start - 1, -1):
+            key = id(self._rules[position])
+            if positions.get(key, start) >= start:
+                positions[key] = position
+        self._exact_positions = len(self._rules)
+
+
+_revision_counter = itertools.count(1)
+
+
+def rule_key(rule):
+    """Calculates a hashable key of a rule. Keys of two rules are equal if
+    the rules are equal and their conditions are of the same types.
+
+    Args:
+        rule (ruly.Rule): rule
+
+    Returns:
+        Hashable: key
+
+    Raises:
+        TypeError: if the rule contains values that can't be hashed"""
+    return value_key(rule)
+
+
+def value_key(value):
+    """Calculates a hashable key of a value, such as a condition or a JSON
+    value. Keys of two values are equal if the values are equal and their
+    tuples are of the same types.
+
+    Args:
+        value (Any): value
+
+    Returns:
+        Hashable: key
+
+    Raises:
+        TypeError: if the value contains values that can't be hashed"""
+    return _freeze(value)
+
+
+_list_marker = object()
+_dict_marker = object()
+
+
+def _freeze(value):
+    if isinstance(value, tuple):
+        return type(value), tuple(_freeze(item) for item in value)
+    if isinstance(value, list):
+        return _list_marker, tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return _dict_marker, frozenset((key, _freeze(item))
+                                       for key, item in value.items())
+    hash(value)
+    return value
@@ -1,15 +1,28 @@
 import argparse
 import json
+import os
 import sys
+import time
 from pathlib import Path
 
+import ruly_dmn.analysis
+import ruly_dmn.artifact
+import ruly_dmn.batch
 import ruly_dmn.dmn
+import ruly_dmn.registry
+import ruly_dmn.server
 from ruly_dmn.handlers.camunda_modeler import CamundaModelerHandler
 
 
 def main():
+    if (len(sys.argv) > 1 and sys.argv[1] in _commands
+            and not Path(sys.argv[1]).is_file()):
+        create_parser, run = _commands[sys.argv[1]]
+        return run(create_parser().parse_args(sys.argv[2:]))
     args = _create_parser().parse_args()
-    handler = CamundaModelerHandler(args.file, args.output_file)
+    handler = CamundaModelerHandler(args.file, args.output_file,
+                                    lazy=args.lazy,
+                                    artifact_path=args.artifact)
     dmn = ruly_dmn.dmn.DMN(handler)
     inputs = {}
     for k, v in (a.split('=', 2) for a in args.inputs):
@@ -17,11 +30,164 @@ def main():
             inputs[k] = json.loads(v)
         except json.JSONDecodeError:
             inputs[k] = v
-    print(args.goal, '=', dmn.decide(inputs, args.goal))
+    try:
+        print(args.goal, '=', dmn.decide(inputs, args.goal))
+    finally:
+        handler.close()
+
+
+def _compile(args):
+    path = ruly_dmn.artifact.compile_model(args.file, args.output_file)
+    print('Compiled', args.file, 'to', path)
+
+
+def _batch(args):
+    record_format = args.format or _record_format(args.input_file)
+    input_file = (open(args.input_file, newline='')
+                  if args.input_file is not None else sys.stdin)
+    error_file = (open(args.error_file, 'w')
+                  if args.error_file is not None else sys.stderr)
+    writer = ruly_dmn.batch.RecordWriter(
+        sys.stdout, args.output_format or record_format, args.goals)
+    count = 0
+    errors = 0
+    start = time.perf_counter()
+    try:
+        records = ruly_dmn.batch.read_records(input_file, record_format)
+        try:
+            results = ruly_dmn.batch.evaluate(
+                args.file, args.goals, records, workers=args.workers,
+                chunk_size=args.chunk_size, lazy=args.lazy,
+                artifact_path=args.artifact)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        for result in results:
+            count += 1
+            if result.error is None:
+                writer.write(result.record, result.decisions)
+                continue
+            errors += 1
+            error_file.write(json.dumps({'index': result.index,
+                                         'record': result.record,
+                                         'error': result.error}) + '\n')
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if error_file is not sys.stderr:
+            error_file.close()
+    sys.stdout.flush()
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f'Evaluated {count} records ({errors} errors) in {elapsed:.3f} s, '
+          f'{rate:.1f} records/s', file=sys.stderr)
+
+
+def _learn(args):
+    record_format = args.format or _record_format(args.input_file)
+    input_file = (open(args.input_file, newline='')
+                  if args.input_file is not None else sys.stdin)
+    handler = CamundaModelerHandler(
+        args.file, args.file if args.in_place else args.output_file,
+        lazy=args.lazy)
+    start = time.perf_counter()
+    try:
+        dmn = ruly_dmn.dmn.DMN(handler)
+        summary = dmn.learn(
+            _valid_records(
+                ruly_dmn.batch.read_records(input_file, record_format)),
+            args.goals)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        handler.close()
+    elapsed = time.perf_counter() - start
+    print(f'Added {summary.added} rules in {elapsed:.3f} s, skipped '
+          f'{summary.duplicates} duplicate, {summary.redundant} redundant '
+          f'and {summary.conflicts} conflicting', file=sys.stderr)
+
+
+def _analyze(args):
+    handler = CamundaModelerHandler(
+        args.file, (args.output_file or args.file) if args.minimize
+        else None)
+    try:
+        issues = ruly_dmn.analysis.analyze(handler.rules,
+                                           handler.hit_policies)
+        for issue in issues:
+            print(f'{issue.output_name}: {issue.kind}:',
+                  ' / '.join(str(rule) for rule in issue.rules))
+        removed = 0
+        if args.minimize:
+            removed = handler.remove_rules(
+                ruly_dmn.analysis.removable_rules(issues))
+    finally:
+        handler.close()
+    print(f'Found {len(issues)} issues, removed {removed} rules',
+          file=sys.stderr)
+    return 1 if any(issue.kind in ('overlap', 'conflict')
+                    for issue in issues) else 0
+
+
+def _serve(args):
+    resources = []
+    models = {}
+    if args.watch:
+        models = ruly_dmn.registry.Registry(
+            lambda handler: ruly_dmn.dmn.DMN(
+                handler, ruly_dmn.server.rule_factory_cb, indexed=True,
+                cache_size=args.cache_size),
+            write=args.write, flush_interval=args.flush_interval)
+        resources.append(models)
+    try:
+        for model in args.models:
+            name, _, path = model.rpartition('=')
+            path = Path(path)
+            if args.watch:
+                models.add(name or path.stem, path)
+                continue
+            handler = CamundaModelerHandler(
+                path, path if args.write else None, lazy=args.lazy,
+                flush_interval=args.flush_interval)
+            resources.append(handler)
+            models[name or path.stem] = ruly_dmn.dmn.DMN(
+                handler, ruly_dmn.server.rule_factory_cb, indexed=True,
+                cache_size=args.cache_size)
+        server = ruly_dmn.server.create_server(
+            models, host=args.host, port=args.port,
+            unix_path=args.unix_socket)
+        print('Serving', ', '.join(models), 'on', server.server_address,
+              file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    finally:
+        for resource in resources:
+            resource.close()
+
+
+def _valid_records(records):
+    for record in records:
+        if isinstance(record, ruly_dmn.batch.InvalidRecord):
+            print('Skipped invalid record,', record.error, file=sys.stderr)
+            continue
+        yield record
+
+
+def _record_format(path):
+    if path is not None and path.suffix.lower() == '.csv':
+        return 'csv'
+    return 'jsonl'
 
 
 def _create_parser():
-    parser = argparse.ArgumentParser()
+    parser = argparse.ArgumentParser(
+        epilog='Other commands are available by calling ruly-dmn <command> '
+        '--help, where command is one of: ' + ', '.join(_commands) + '. A '
+        'DMN file with the same name as a command is used as a file.')
 
     parser.add_argument('file', type=Path,
                         help='DMN file.')
@@ -38,9 +204,189 @@ def _create_parser():
                         'added. Can be the same path as the input file. If '
                         'not set, DMN changes are not written anywhere.',
                         default=None)
+    parser.add_argument('--lazy', action='store_true',
+                        help='Parse decision tables only when a decision '
+                        'needs them, useful for very large DMN files.')
+    parser.add_argument('--artifact', '-a', metavar='path', type=Path,
+                        help='Artifact created with ruly-dmn compile. If it '
+                        'was compiled from the current content of the DMN '
+                        'file, the model is loaded from it, otherwise the DMN '
+                        'file is parsed.',
+                        default=None)
 
     return parser
 
 
+def _create_compile_parser():
+    parser = argparse.ArgumentParser(
+        prog='ruly-dmn compile',
+        description='Compiles a DMN file into a binary artifact that can be '
+        'loaded faster than the DMN file.')
+
+    parser.add_argument('file', type=Path,
+                        help='DMN file.')
+    parser.add_argument('--output-file', '-o', metavar='path', type=Path,
+                        help='Artifact path, if not set, the artifact is '
+                        'stored next to the DMN file, with the .compiled '
+                        'suffix appended to its name.',
+                        default=None)
+
+    return parser
+
+
+def _create_batch_parser():
+    parser = argparse.ArgumentParser(
+        prog='ruly-dmn batch',
+        description='Evaluates decisions for a stream of records, loading '
+        'the DMN file once. Records are read from a file or the standard '
+        'input and written, extended with their decisions, to the standard '
+        'output, in input order. Records whose evaluation fails, e.g. '
+        'because a hit policy is violated, are written to the error stream. '
+        'New rules are never created.')
+
+    parser.add_argument('file', type=Path,
+                        help='DMN file.')
+    parser.add_argument('goals', nargs='+',
+                        help='Names of the goal decisions.')
+    parser.add_argument('--input-file', '-i', metavar='path', type=Path,
+                        help='Input records file, if not set, records are '
+                        'read from the standard input.',
+                        default=None)
+    parser.add_argument('--format', '-f', choices=['jsonl', 'csv'],
+                        help='Input records format, one JSON object per line '
+                        'or CSV with a header row. If not set, CSV is used '
+                        'for input files with the .csv suffix, JSONL '
+                        'otherwise.',
+                        default=None)
+    parser.add_argument('--output-format', choices=['jsonl', 'csv'],
+                        help='Output records format, same as the input '
+                        'format if not set.',
+                        default=None)
+    parser.add_argument('--error-file', '-e', metavar='path', type=Path,
+                        help='File where failed records are written as JSON '
+                        'lines, if not set, the standard error is used.',
+                        default=None)
+    parser.add_argument('--workers', '-w', metavar='count', type=int,
+                        help='Number of worker processes, records are '
+                        'evaluated in the main process if less than 2. '
+                        'Defaults to the number of CPUs.',
+                        default=os.cpu_count())
+    parser.add_argument('--chunk-size', metavar='count', type=int,
+                        help='Number of records sent to a worker at once.',
+                        default=100)
+    parser.add_argument('--lazy', action='store_true',
+                        help='Parse decision tables only when a decision '
+                        'needs them.')
+    parser.add_argument('--artifact', '-a', metavar='path', type=Path,
+                        help='Artifact created with ruly-dmn compile.',
+                        default=None)
+
+    return parser
+
+
+def _create_learn_parser():
+    parser = argparse.ArgumentParser(
+        prog='ruly-dmn learn',
+        description='Learns rules from labeled records, e.g. historical '
+        'decisions. Each record contains input values and expected values '
+        'of the goal decisions, and a rule is created for every expected '
+        'decision that the model doesn\'t already make. Records that '
+        'duplicate existing rules or contradict earlier records are skipped. '
+        'All new rules are written into the output DMN file at once.')
+
+    parser.add_argument('file', type=Path,
+                        help='DMN file.')
+    parser.add_argument('goals', nargs='+',
+                        help='Names of the learned decisions.')
+    parser.add_argument('--input-file', '-i', metavar='path', type=Path,
+                        help='Labeled records file, if not set, records are '
+                        'read from the standard input.',
+                        default=None)
+    parser.add_argument('--format', '-f', choices=['jsonl', 'csv'],
+                        help='Records format, one JSON object per line or '
+                        'CSV with a header row. If not set, CSV is used for '
+                        'input files with the .csv suffix, JSONL otherwise.',
+                        default=None)
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument('--output-file', '-o', metavar='path', type=Path,
+                        help='Output DMN file path.',
+                        default=None)
+    output.add_argument('--in-place', action='store_true',
+                        help='Update the DMN file in place.')
+    parser.add_argument('--lazy', action='store_true',
+                        help='Parse decision tables only when a decision '
+                        'needs them.')
+
+    return parser
+
+
+def _create_analyze_parser():
+    parser = argparse.ArgumentParser(
+        prog='ruly-dmn analyze',
+        description='Checks decision tables for overlapping rules of UNIQUE '
+        'tables, conflicting rules of ANY tables, rules of FIRST tables '
+        'shadowed by earlier rules and rules subsumed by another rule with '
+        'the same output. Issues are written to the standard output, and the '
+        'exit status is 1 if any rules overlap or conflict.')
+
+    parser.add_argument('file', type=Path,
+                        help='DMN file.')
+    parser.add_argument('--minimize', action='store_true',
+                        help='Remove shadowed and subsumed rules, which never '
+                        'change a decision.')
+    parser.add_argument('--output-file', '-o', metavar='path', type=Path,
+                        help='Output DMN file path used with --minimize, if '
+                        'not set, the DMN file is updated in place.',
+                        default=None)
+
+    return parser
+
+
+def _create_serve_parser():
+    parser = argparse.ArgumentParser(
+        prog='ruly-dmn serve',
+        description='Loads DMN models once and answers decision requests over '
+        'HTTP. GET /models lists the models, POST /models/<name>/decide '
+        'accepts a JSON object, or a list of them, with inputs, goals and '
+        'optionally expected decisions. Rules are created only when no rule '
+        'fires for an expected decision.')
+
+    parser.add_argument('models', nargs='+', metavar='[name=]file',
+                        help='DMN files, served under the given name or the '
+                        'file name without suffix.')
+    parser.add_argument('--host', help='Host address.', default='127.0.0.1')
+    parser.add_argument('--port', '-p', type=int, help='TCP port.',
+                        default=8080)
+    parser.add_argument('--unix-socket', '-u', metavar='path',
+                        help='Listen on a Unix domain socket instead of a TCP '
+                        'port.',
+                        default=None)
+    parser.add_argument('--write', action='store_true',
+                        help='Write created rules into the DMN files.')
+    parser.add_argument('--flush-interval', metavar='seconds', type=float,
+                        help='Maximum delay of writing created rules, they '
+                        'are written immediately if not set.',
+                        default=None)
+    parser.add_argument('--cache-size', metavar='count', type=int,
+                        help='Number of cached decisions per model.',
+                        default=None)
+    parser.add_argument('--lazy', action='store_true',
+                        help='Parse decision tables only when a decision '
+                        'needs them, ignored with --watch.')
+    parser.add_argument('--watch', action='store_true',
+                        help='Reload models in the background when their '
+                        'files change, while the old models keep answering '
+                        'requests.')
+
+    return parser
+
+
+_commands = {'compile': (_create_compile_parser, _compile),
+             'batch': (_create_batch_parser, _batch),
+             'learn': (_create_learn_parser, _learn),
+             'analyze': (_create_analyze_parser, _analyze),
+             'serve': (_create_serve_parser, _serve)}
+
+
 if __name__ == '__main__':
     sys.exit(main())
@@ -0,0 +1,157 @@
+import os
+import pathlib
+import tempfile
+import threading
+
+
+def atomic_write(path, write_fn):
+    """Writes a file atomically, by writing into a temporary file in the same
+    directory and renaming it to the target path. Readers see either the old
+    or the new content, never a partially written file.
+
+    Args:
+        path (pathlib.Path): target path
+        write_fn (Callable[[BinaryIO], None]): function that writes the
+            content into the given binary file object"""
+    path = pathlib.Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.',
+                                    suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write_fn(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class Persister:
+    """Schedules dumps of a model, coalescing multiple updates into a single
+    dump. If neither flush_interval nor flush_count are set, every scheduled
+    dump is made immediately, on the caller's thread. Otherwise, dumps are
+    made on a background thread, once an interval passes or a number of
+    updates is scheduled, whichever happens first.
+
+    Args:
+        dump_fn (Callable[[], None]): function that dumps the model
+        flush_interval (Optional[float]): maximum number of seconds a
+            scheduled dump waits
+        flush_count (Optional[int]): number of scheduled dumps after which
+            the model is dumped"""
+
+    def __init__(self, dump_fn, flush_interval=None, flush_count=None):
+        self._dump_fn = dump_fn
+        self._flush_interval = flush_interval
+        self._flush_count = flush_count
+        self._condition = threading.Condition()
+        self._dump_lock = threading.Lock()
+        self._pending = 0
+        self._closed = False
+        self._cancelled = False
+        self._error = None
+        self._thread = None
+        if flush_interval is not None or flush_count is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True,
+                                            name='ruly-dmn-persister')
+            self._thread.start()
+
+    def schedule(self):
+        """Schedules a dump
+
+        Raises:
+            Exception: error raised by a previous background dump"""
+        self._raise_error()
+        if self._cancelled:
+            return
+        if self._thread is None:
+            with self._condition:
+                self._pending += 1
+            self._dump()
+            return
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('persister is closed')
+            self._pending += 1
+            if (self._flush_count is not None
+                    and self._pending >= self._flush_count):
+                self._condition.notify()
+
+    def flush(self):
+        """Dumps the model if there are scheduled dumps, blocking until the
+        dump is finished
+
+        Raises:
+            Exception: error raised by the dump or by a previous background
+            dump"""
+        self._raise_error()
+        self._dump()
+
+    def close(self):
+        """Dumps the model if there are scheduled dumps and stops the
+        background thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def cancel(self):
+        """Drops scheduled dumps and stops the background thread, waiting for
+        a dump that is in progress. Dumps scheduled afterwards are dropped
+        too."""
+        with self._condition:
+            self._closed = True
+            self._cancelled = True
+            self._pending = 0
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        with self._dump_lock:
+            with self._condition:
+                self._pending = 0
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(self._flush_due,
+                                         self._flush_interval)
+                if self._closed:
+                    return
+                if self._pending == 0:
+                    continue
+            try:
+                self._dump()
+            except Exception as e:
+                self._error = e
+
+    def _flush_due(self):
+        # checked before waiting too, so the count being reached while a dump
+        # was in progress isn't missed. After a failed dump, the count is
+        # ignored until the error is reported, instead of retrying at once
+        return self._closed or (self._error is None
+                                and self._flush_count is not None
+                                and self._pending >= self._flush_count)
+
+    def _dump(self):
+        with self._dump_lock:
+            with self._condition:
+                if self._pending == 0:
+                    return
+                self._pending = 0
+            try:
+                self._dump_fn()
+            except BaseException:
+                with self._condition:
+                    self._pending += 1
+                raise
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
@@ -0,0 +1,141 @@
+import collections
+import itertools
+
+import ruly
+
+
+class ModelError(Exception):
+    """Exception raised when a DMN model is invalid, e.g. when its decisions
+    depend on each other cyclically"""
+
+
+Plan = collections.namedtuple('Plan', ['goal', 'order', 'inputs',
+                                       'dependencies'])
+Plan.__doc__ = """Evaluation plan of a decision
+
+Attributes:
+    goal (str): name of the decision
+    order (Tuple[str, ...]): decisions the goal transitively depends on and
+        the goal itself, each decision after the decisions it depends on
+    inputs (Tuple[str, ...]): sorted names of input variables the goal
+        transitively depends on
+    dependencies (Dict[str, Tuple[str, ...]]): names of variables each
+        decision of the plan directly depends on"""
+
+
+def dependency_graph(dependencies, rules=()):
+    """Creates a graph of variable dependencies from decision table inputs
+    and rules, which may depend on variables that aren't table inputs
+
+    Args:
+        dependencies (Dict[str, Iterable[str]]): decision names and names of
+            their table's inputs
+        rules (Iterable[ruly.Rule]): rules
+
+    Returns:
+        Dict[str, Tuple[str, ...]]: decision names and names of variables
+        they depend on
+
+    Raises:
+        ruly_dmn.ModelError: if a table input doesn't have a name"""
+    graph = {}
+    for decision, names in dependencies.items():
+        names = tuple(names)
+        if any(not name for name in names):
+            raise ModelError(f'decision {decision} has an input without a '
+                             f'name')
+        graph[decision] = names
+    return add_rules(graph, rules)
+
+
+def add_rules(graph, rules):
+    """Adds dependencies of rules into a dependency graph
+
+    Args:
+        graph (Dict[str, Tuple[str, ...]]): graph created with
+            :func:`dependency_graph`, it isn't modified
+        rules (Iterable[ruly.Rule]): rules
+
+    Returns:
+        Dict[str, Tuple[str, ...]]: new graph, or the same graph if rules
+        don't add any dependencies"""
+    new_graph = graph
+    for rule in rules:
+        rule_variables = ruly.get_rule_depending_variables(rule)
+        for decision in rule.consequent:
+            names = new_graph.get(decision, ())
+            missing = [name for name in rule_variables if name not in names]
+            if not missing:
+                continue
+            if new_graph is graph:
+                new_graph = dict(graph)
+            new_graph[decision] = names + tuple(dict.fromkeys(missing))
+    return new_graph
+
+
+def create_plan(graph, goal):
+    """Creates the evaluation plan of a decision, containing only the
+    decisions it transitively depends on
+
+    Args:
+        graph (Dict[str, Tuple[str, ...]]): graph created with
+            :func:`dependency_graph`
+        goal (str): decision name
+
+    Returns:
+        ruly_dmn.planner.Plan
+
+    Raises:
+        ruly_dmn.ModelError: if decisions depend on each other cyclically"""
+    order = []
+    inputs = set()
+    done = set()
+    path = [goal]
+    stack = [iter(graph.get(goal, ()))]
+    while stack:
+        name = next(stack[-1], None)
+        if name is None:
+            stack.pop()
+            done.add(path[-1])
+            order.append(path.pop())
+            continue
+        if name in done:
+            continue
+        if name not in graph:
+            inputs.add(name)
+            continue
+        if name in path:
+            cycle = path[path.index(name):] + [name]
+            raise ModelError(f'cyclic dependency: {" -> ".join(cycle)}')
+        path.append(name)
+        stack.append(iter(graph[name]))
+    return Plan(goal=goal,
+                order=tuple(order),
+                inputs=tuple(sorted(inputs)),
+                dependencies={name: graph.get(name, ()) for name in order})
+
+
+def create_plans(graph):
+    """Creates evaluation plans of all decisions of a graph
+
+    Args:
+        graph (Dict[str, Tuple[str, ...]]): graph created with
+            :func:`dependency_graph`
+
+    Returns:
+        Dict[str, ruly_dmn.planner.Plan]: plans by decision name
+
+    Raises:
+        ruly_dmn.ModelError: if decisions depend on each other cyclically"""
+    return {goal: create_plan(graph, goal) for goal in graph}
+
+
+def plan_variables(plan):
+    """Returns names of all variables of a plan
+
+    Args:
+        plan (ruly_dmn.planner.Plan): plan
+
+    Returns:
+        Tuple[str, ...]: names of inputs and decisions"""
+    return tuple(itertools.chain(plan.inputs, plan.order))
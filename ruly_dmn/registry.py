@@ -0,0 +1,283 @@
+import collections.abc
+import os
+import pathlib
+import threading
+
+from ruly_dmn import artifact
+from ruly_dmn import dmn
+from ruly_dmn.handlers.camunda_modeler import CamundaModelerHandler
+
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+
+class Registry(collections.abc.Mapping):
+    """Models loaded by name from Camunda Modeler DMN files, which are
+    reloaded when the files change. The registry is a mapping of model names
+    to :class:`ruly_dmn.DMN` instances, so it can be passed to
+    :func:`ruly_dmn.server.create_server`.
+
+    Names registered with the same file share one handler and one
+    :class:`ruly_dmn.DMN`. A changed file is parsed in the background, on the
+    watcher thread, while the old model keeps answering, and the new model
+    then replaces the old one under all its names at once. Decisions that
+    already got the old model finish with it. If the file can't be parsed,
+    the old model is kept and the error is available in :attr:`errors`
+    until the file changes again and is parsed successfully.
+
+    Files are compared by content, so a file rewritten with the same content
+    isn't reloaded, and neither is a file dumped by the model's own handler.
+    Updates that the old handler didn't write yet are dropped when its file
+    is changed by someone else.
+
+    Handlers are created eagerly, because lazily parsed decisions would be
+    read from a file that may have changed in the meantime.
+
+    Args:
+        dmn_cb (Optional[Callable[[ruly_dmn.ModelHandler], ruly_dmn.DMN]]):
+            function that creates a model from a handler, if None,
+            :class:`ruly_dmn.DMN` is created with default arguments
+        write (bool): if True, handlers dump updates into their files
+        flush_interval (Optional[float]): maximum delay of handler dumps,
+            see :class:`ruly_dmn.CamundaModelerHandler`
+        watch (bool): if True, files are watched on a background thread,
+            with inotify if ``pyinotify`` is installed, otherwise by polling.
+            If False, files are checked only by :meth:`check`
+        poll_interval (float): number of seconds between checks when
+            polling"""
+
+    def __init__(self, dmn_cb=None, write=False, flush_interval=None,
+                 watch=True, poll_interval=1.0):
+        self._dmn_cb = dmn_cb or dmn.DMN
+        self._write = write
+        self._flush_interval = flush_interval
+        self._poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._models = {}
+        self._entries = {}
+        self._names = {}
+        self._errors = {}
+        self._condition = threading.Condition()
+        self._changed = set()
+        self._closed = False
+        self._notifier = None
+        self._thread = None
+        if not watch:
+            return
+        if pyinotify is not None:
+            self._manager = pyinotify.WatchManager()
+            self._watched = set()
+            self._notifier = pyinotify.ThreadedNotifier(
+                self._manager, _EventHandler(notify_cb=self._notify))
+            self._notifier.daemon = True
+            self._notifier.start()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='ruly-dmn-registry')
+        self._thread.start()
+
+    def __getitem__(self, name):
+        return self._models[name]
+
+    def __iter__(self):
+        return iter(self._models)
+
+    def __len__(self):
+        return len(self._models)
+
+    @property
+    def errors(self):
+        """Dict[str, Exception]: errors of the last reload of models whose
+        files couldn't be parsed, by model name"""
+        with self._lock:
+            return {name: self._errors[path]
+                    for name, path in self._names.items()
+                    if path in self._errors}
+
+    def add(self, name, path):
+        """Loads a model from a file and registers it under a name, replacing
+        the model previously registered under that name. If the file is
+        already loaded under another name, the loaded model is reused.
+
+        Args:
+            name (str): model name
+            path (pathlib.Path): path to the DMN file
+
+        Returns:
+            ruly_dmn.DMN: model"""
+        path = pathlib.Path(path).resolve()
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is None:
+            entry = self._load(path)
+        with self._lock:
+            if self._entries.setdefault(path, entry) is not entry:
+                entry.handler.close()
+                entry = self._entries[path]
+            self._watch(path)
+            old_path = self._names.get(name)
+            self._names[name] = path
+            self._models[name] = entry.model
+            old_entry = self._unused_entry(old_path)
+        if old_entry is not None:
+            old_entry.handler.close()
+        return entry.model
+
+    def remove(self, name):
+        """Unregisters a model. Its handler is closed once no other name
+        refers to it.
+
+        Args:
+            name (str): model name"""
+        with self._lock:
+            path = self._names.pop(name, None)
+            self._models.pop(name, None)
+            entry = self._unused_entry(path)
+        if entry is not None:
+            entry.handler.close()
+
+    def check(self, paths=None):
+        """Checks whether files changed and reloads models of the changed
+        ones, on the calling thread
+
+        Args:
+            paths (Optional[Iterable[pathlib.Path]]): paths to check, if None,
+                files of all models are checked
+
+        Returns:
+            List[str]: names of reloaded models"""
+        with self._lock:
+            paths = (list(self._entries) if paths is None
+                     else [pathlib.Path(path).resolve() for path in paths])
+        reloaded = []
+        for path in paths:
+            with self._lock:
+                entry = self._entries.get(path)
+            stat = None if entry is None else self._changed_stat(entry)
+            if stat is None:
+                continue
+            try:
+                new_entry = self._load(path)
+            except Exception as e:
+                entry.stat = stat
+                with self._lock:
+                    self._errors[path] = e
+                continue
+            with self._lock:
+                if self._entries.get(path) is not entry:
+                    new_entry.handler.close()
+                    continue
+                self._entries[path] = new_entry
+                self._errors.pop(path, None)
+                names = [name for name, name_path in self._names.items()
+                         if name_path == path]
+                for name in names:
+                    self._models[name] = new_entry.model
+            entry.handler.discard()
+            reloaded.extend(names)
+        return reloaded
+
+    def close(self):
+        """Stops watching files and closes handlers of all models"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        if self._notifier is not None:
+            self._notifier.stop()
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries = {}
+            self._names = {}
+            self._models = {}
+        for entry in entries:
+            entry.handler.close()
+
+    def _unused_entry(self, path):
+        if path is None or path in self._names.values():
+            return None
+        self._errors.pop(path, None)
+        return self._entries.pop(path)
+
+    def _load(self, path):
+        stat = _stat(path)
+        digest = artifact.content_hash(path)
+        handler = CamundaModelerHandler(
+            path, path if self._write else None,
+            flush_interval=self._flush_interval)
+        try:
+            model = self._dmn_cb(handler)
+        except BaseException:
+            handler.close()
+            raise
+        return _Entry(path, handler, model, stat, digest)
+
+    def _changed_stat(self, entry):
+        try:
+            stat = _stat(entry.path)
+            if stat == entry.stat:
+                return None
+            digest = artifact.content_hash(entry.path)
+        except OSError:
+            return None
+        if digest in (entry.digest, entry.handler.dump_digest):
+            entry.stat = stat
+            entry.digest = digest
+            with self._lock:
+                self._errors.pop(entry.path, None)
+            return None
+        return stat
+
+    def _watch(self, path):
+        if self._notifier is None or path.parent in self._watched:
+            return
+        self._manager.add_watch(str(path.parent),
+                                pyinotify.IN_CLOSE_WRITE
+                                | pyinotify.IN_MOVED_TO)
+        self._watched.add(path.parent)
+
+    def _notify(self, path):
+        with self._condition:
+            self._changed.add(path)
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._closed and len(self._changed) == 0:
+                    self._condition.wait(self._poll_interval)
+                if self._closed:
+                    return
+                changed, self._changed = self._changed, set()
+            if self._notifier is None:
+                self.check()
+            elif len(changed) > 0:
+                self.check(changed)
+
+
+class _Entry:
+
+    def __init__(self, path, handler, model, stat, digest):
+        self.path = path
+        self.handler = handler
+        self.model = model
+        self.stat = stat
+        self.digest = digest
+
+
+if pyinotify is not None:
+
+    class _EventHandler(pyinotify.ProcessEvent):
+
+        def my_init(self, notify_cb):
+            self._notify_cb = notify_cb
+
+        def process_default(self, event):
+            self._notify_cb(pathlib.Path(event.pathname).resolve())
+
+
+def _stat(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,167 @@
+import contextvars
+import http.server
+import json
+import os
+import re
+import ruly
+import socketserver
+
+from ruly_dmn import common
+from ruly_dmn import dmn
+
+
+def create_server(models, host='127.0.0.1', port=0, unix_path=None):
+    """Creates an HTTP server that answers decision requests for preloaded
+    models. Connections are kept alive between requests (HTTP/1.1), and each
+    connection is served on its own thread.
+
+    Available endpoints:
+
+        * ``GET /models`` - names of models, with their decisions and inputs
+        * ``POST /models/<name>/decide`` - makes decisions, body is either a
+          request object or a list of request objects, and the response is
+          a result object or a list of result objects, in request order
+
+    Request object contains ``inputs`` (name-value pairs), ``goals`` (list
+    of decision names) and optionally ``expected`` (decision name-value
+    pairs). If a decision can't be made because no rule fired and its value
+    is expected, a rule that assigns the expected value for the available
+    inputs is created and the decision is made again. Result object contains
+    either ``decisions`` (goal-decision pairs) or ``error`` (message), e.g.
+    when a hit policy is violated. Other errors fail the whole body, with
+    status 500 and an object with the ``error`` message.
+
+    Args:
+        models (Dict[str, ruly_dmn.DMN]): models by name, they should be
+            created with :func:`rule_factory_cb` as their rule factory
+            callback, otherwise the factory they use decides whether rules
+            are created
+        host (str): host address the server listens on
+        port (int): TCP port, if 0, a free port is chosen
+        unix_path (Optional[str]): if set, the server listens on a Unix
+            domain socket with this path instead of host and port
+
+    Returns:
+        socketserver.BaseServer: server, see :meth:`serve_forever`,
+        :meth:`shutdown` and :meth:`server_close` and ``server_address``"""
+    if unix_path is not None:
+        if os.path.exists(unix_path):
+            os.unlink(unix_path)
+        server = _UnixHTTPServer(unix_path, _RequestHandler)
+    else:
+        server = _HTTPServer((host, port), _RequestHandler)
+    server.models = models
+    return server
+
+
+def rule_factory_cb(handler):
+    """Rule factory callback of models served with :func:`create_server`,
+    creates rules only from expected values within decision requests
+
+    Args:
+        handler (ruly_dmn.ModelHandler): model handler
+
+    Returns:
+        ruly_dmn.RuleFactory: rule factory"""
+    return _ExpectedRuleFactory(handler)
+
+
+_expected = contextvars.ContextVar('expected', default={})
+
+
+class _HTTPServer(http.server.ThreadingHTTPServer):
+    pass
+
+
+class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    _decide_path = re.compile('^/models/([^/]+)/decide$')
+
+    def do_GET(self):
+        if self.path != '/models':
+            return self._send_json(404, {'error': 'not found'})
+        self._send_json(200, {
+            name: {'decisions': model.decisions,
+                   'inputs': sorted(model.inputs)}
+            for name, model in self.server.models.items()})
+
+    def do_POST(self):
+        match = self._decide_path.match(self.path)
+        model = self.server.models.get(match.group(1)) if match else None
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if model is None:
+            return self._send_json(404, {'error': 'not found'})
+        try:
+            requests = json.loads(body)
+        except json.JSONDecodeError as e:
+            return self._send_json(400, {'error': f'invalid JSON: {e}'})
+        try:
+            if isinstance(requests, list):
+                results = [_decide(model, request) for request in requests]
+            else:
+                results = _decide(model, requests)
+        except Exception as e:
+            return self._send_json(500, {'error': f'{type(e).__name__}: {e}'})
+        self._send_json(200, results)
+
+    def address_string(self):
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _ExpectedRuleFactory(common.RuleFactory):
+
+    def __init__(self, handler):
+        self._handler = handler
+
+    def create_rule(self, state, fired_rules, output_name):
+        expected = _expected.get()
+        if len(fired_rules) > 0 or output_name not in expected:
+            return None
+        input_values = {name: state[name]
+                        for name in self._handler.dependencies[output_name]
+                        if state.get(name) is not None}
+        antecedent = ruly.Expression(
+            ruly.Operator.AND, tuple(ruly.EqualsCondition(name, value)
+                                     for name, value in input_values.items()))
+        return ruly.Rule(antecedent, {output_name: expected[output_name]})
+
+
+def _decide(model, request):
+    if not isinstance(request, dict):
+        return {'error': 'request should be an object'}
+    inputs = request.get('inputs', {})
+    goals = request.get('goals', [])
+    expected = request.get('expected', {})
+    if (not isinstance(inputs, dict) or not isinstance(goals, list)
+            or not isinstance(expected, dict)):
+        return {'error': 'inputs and expected should be objects and goals '
+                         'should be a list'}
+    unknown = [goal for goal in goals if goal not in model.decisions]
+    if unknown:
+        return {'error': f'unknown decisions: {unknown}'}
+    token = _expected.set(expected)
+    try:
+        return {'decisions': model.decide_all(inputs, goals)}
+    except dmn.HitPolicyViolation as e:
+        return {'error': str(e)}
+    finally:
+        _expected.reset(token)
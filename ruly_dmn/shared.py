@@ -0,0 +1,440 @@
+import collections
+import json
+import math
+import mmap
+import pathlib
+import struct
+
+import ruly
+
+from ruly_dmn import common
+from ruly_dmn import conditions
+from ruly_dmn import dmn
+from ruly_dmn import persistence
+from ruly_dmn import planner
+
+
+version = 1
+"""int: version of the shared model format"""
+
+_magic = b'RULYSHM\0'
+_header = struct.Struct('<8sHI')
+_offset = struct.Struct('<I')
+_counts = struct.Struct('<HH')
+_pair = struct.Struct('<II')
+_byte = struct.Struct('<B')
+_range = struct.Struct('<BB')
+_any = struct.Struct('<BH')
+_not = struct.Struct('<BI')
+_int = struct.Struct('<q')
+_float = struct.Struct('<d')
+
+_equals, _in_range, _any_of, _negated = range(4)
+_null, _integer, _real, _text, _json = range(5)
+_start, _end, _start_closed, _end_closed = (1, 2, 4, 8)
+
+
+class SharedModel:
+    """Read-only model evaluated directly from its flat encoding, written by
+    :func:`dump` and opened with :func:`load`. The encoding is memory mapped,
+    so processes that open the same file share its pages and every process
+    keeps only the model's metadata (decision names, dependencies and hit
+    policies) in its own memory. Rules aren't materialized - conditions are
+    read from the encoding while they are evaluated, and consequents are
+    decoded only for fired rules.
+
+    Decisions match those of :meth:`ruly_dmn.DMN.decide` with an indexed
+    engine, but without a rule factory, so a decision that no rule fires for
+    is None. There is no index though: rows of a table are scanned in order,
+    so evaluating a table costs O(rows), except that scans of FIRST and
+    UNIQUE tables stop once the hit policy is decided.
+
+    Args:
+        buffer (Union[bytes, mmap.mmap]): encoded model
+        close_cb (Optional[Callable[[], None]]): called on :meth:`close`"""
+
+    def __init__(self, buffer, close_cb=None):
+        if len(buffer) < _header.size:
+            raise ValueError('unsupported shared model format')
+        magic, model_version, size = _header.unpack_from(buffer, 0)
+        if magic != _magic or model_version != version:
+            raise ValueError('unsupported shared model format')
+        metadata = json.loads(bytes(
+            buffer[_header.size:_header.size + size]).decode())
+        self._buffer = buffer
+        self._view = memoryview(buffer)[_header.size + size:]
+        self._close_cb = close_cb
+        self._variables = metadata['variables']
+        self._dependencies = metadata['dependencies']
+        self._graph = {name: tuple(names)
+                       for name, names in metadata['graph'].items()}
+        self._hit_policies = {name: common.HitPolicy[hit_policy]
+                              for name, hit_policy
+                              in metadata['hit_policies'].items()}
+        self._output_values = metadata['output_values']
+        self._tables = {name: tuple(table)
+                        for name, table in metadata['tables'].items()}
+        self._plans = {}
+        all_outputs = set(self._dependencies)
+        self._inputs = set(name for names in self._dependencies.values()
+                           for name in names) - all_outputs
+
+    @property
+    def inputs(self):
+        """Set[str]: input variables for all available decisions"""
+        return self._inputs
+
+    @property
+    def decisions(self):
+        """List[str]: names of all available decisions"""
+        return list(self._dependencies)
+
+    @property
+    def size(self):
+        """int: size of the encoded model in bytes"""
+        return len(self._buffer)
+
+    def decide(self, inputs, decision):
+        """Solves for decision based on given inputs
+
+        Args:
+            inputs (Dict[str, Any]): name-value pairs of all inputs
+            decision (str): name of the decision that should be resolved
+
+        Returns:
+            Any: calculated decision, None if it can't be made
+
+        Raises:
+            ruly_dmn.HitPolicyViolation: raised if hit policy violation is
+            detected
+            ruly_dmn.ModelError: raised if decisions depend on each other
+            cyclically"""
+        plan = self._plans.get(decision)
+        if plan is None:
+            plan = planner.create_plan(self._graph, decision)
+            self._plans[decision] = plan
+        state = {name: inputs.get(name)
+                 for name in planner.plan_variables(plan)}
+        needed = {plan.goal}
+        for name in reversed(plan.order):
+            if name in needed and state[name] is None:
+                needed.update(plan.dependencies[name])
+        keys = {}
+        for name in plan.order:
+            if name not in needed or state[name] is not None:
+                continue
+            table = self._tables.get(name)
+            if table is None:
+                continue
+            hit_policy = self._hit_policies.get(name)
+            _, consequent = dmn._resolve_hit_policy(
+                self._fired_rows(table, state, keys, hit_policy), hit_policy,
+                name, self._output_values.get(name))
+            if consequent is not None:
+                state.update(consequent)
+        return state[decision]
+
+    def close(self):
+        """Releases the encoded model, decisions can't be made afterwards"""
+        self._view.release()
+        self._view = None
+        if self._close_cb is not None:
+            self._close_cb()
+
+    def _fired_rows(self, table, state, keys, hit_policy):
+        view = self._view
+        offset, count = table
+        fired_rows = []
+        for index in range(count):
+            [rule_offset] = _offset.unpack_from(view, offset + index * 4)
+            condition_count, consequent_count = _counts.unpack_from(
+                view, rule_offset)
+            position = rule_offset + _counts.size
+            for _ in range(condition_count):
+                variable, condition_offset = _pair.unpack_from(view, position)
+                position += _pair.size
+                if not self._satisfies(condition_offset, variable, state,
+                                       keys):
+                    break
+            else:
+                consequent = {}
+                for _ in range(consequent_count):
+                    variable, value_offset = _pair.unpack_from(view,
+                                                               position)
+                    position += _pair.size
+                    consequent[self._variables[variable]] = \
+                        _read_value(view, value_offset)[0]
+                fired_rows.append(_Row(index=index, consequent=consequent))
+                if hit_policy == common.HitPolicy.FIRST or (
+                        hit_policy == common.HitPolicy.UNIQUE
+                        and len(fired_rows) > 1):
+                    break
+        return fired_rows
+
+    def _satisfies(self, offset, variable, state, keys):
+        view = self._view
+        [kind] = _byte.unpack_from(view, offset)
+        if kind == _equals:
+            if variable not in keys:
+                keys[variable] = _key(state.get(self._variables[variable]))
+            key = keys[variable]
+            start = offset + _byte.size
+            return (key is not None
+                    and view[start:start + len(key)] == key)
+        value = state.get(self._variables[variable])
+        if value is None:
+            return False
+        if kind == _in_range:
+            return self._in_range(offset, value)
+        if kind == _any_of:
+            _, count = _any.unpack_from(view, offset)
+            position = offset + _any.size
+            return any(self._satisfies(
+                _offset.unpack_from(view, position + i * 4)[0], variable,
+                state, keys) for i in range(count))
+        if kind == _negated:
+            _, child_offset = _not.unpack_from(view, offset)
+            return not self._satisfies(child_offset, variable, state, keys)
+        return False
+
+    def _in_range(self, offset, value):
+        _, flags = _range.unpack_from(self._view, offset)
+        position = offset + _range.size
+        try:
+            if flags & _start:
+                start, position = _read_typed(self._view, position)
+                if (value < start if flags & _start_closed
+                        else value <= start):
+                    return False
+            if flags & _end:
+                end, position = _read_typed(self._view, position)
+                if value > end if flags & _end_closed else value >= end:
+                    return False
+        except TypeError:
+            return False
+        return True
+
+
+_Row = collections.namedtuple('_Row', ['index', 'consequent'])
+
+
+def dump(handler, path):
+    """Writes the rules of a model into a file, in the flat encoding that can
+    be opened with :func:`load`. All rules of lazy handlers are loaded
+    first. The file is written atomically, so it can be replaced while
+    other processes have the old one opened. To keep the encoding in memory
+    instead of on disk, it can be written to a memory file system, such as
+    ``/dev/shm``.
+
+    Args:
+        handler (ruly_dmn.ModelHandler): model handler
+        path (pathlib.Path): path of the file
+
+    Returns:
+        pathlib.Path: path of the file
+
+    Raises:
+        ValueError: raised if a rule contains conditions other than those of
+        :mod:`ruly_dmn.conditions` or values that can't be encoded as JSON"""
+    handler.load_rules(handler.dependencies)
+    buffer = _encode(handler)
+    persistence.atomic_write(path, lambda f: f.write(buffer))
+    return pathlib.Path(path)
+
+
+def load(path):
+    """Opens a model written with :func:`dump`, by memory mapping its file
+
+    Args:
+        path (pathlib.Path): path of the file
+
+    Returns:
+        ruly_dmn.shared.SharedModel
+
+    Raises:
+        ValueError: raised if the file doesn't contain a supported model"""
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return SharedModel(buffer, buffer.close)
+    except BaseException:
+        buffer.close()
+        raise
+
+
+def _encode(handler):
+    rules = handler.rules
+    encoder = _Encoder()
+    tables = {}
+    for rule in rules:
+        for output_name in rule.consequent:
+            tables.setdefault(output_name, []).append(rule)
+    rule_offsets = {id(rule): encoder.rule(rule) for rule in rules}
+    table_offsets = {}
+    for output_name, table_rules in tables.items():
+        table_offsets[output_name] = (len(encoder.body), len(table_rules))
+        for rule in table_rules:
+            encoder.body += _offset.pack(rule_offsets[id(rule)])
+    graph = planner.dependency_graph(handler.dependencies, rules)
+    metadata = json.dumps({
+        'variables': encoder.variables,
+        'dependencies': {name: list(names) for name, names
+                         in handler.dependencies.items()},
+        'graph': {name: list(names) for name, names in graph.items()},
+        'hit_policies': {name: hit_policy.name for name, hit_policy
+                         in handler.hit_policies.items()},
+        'output_values': handler.output_values,
+        'tables': table_offsets}).encode()
+    return (_header.pack(_magic, version, len(metadata)) + metadata
+            + encoder.body)
+
+
+class _Encoder:
+
+    def __init__(self):
+        self.body = bytearray()
+        self.variables = []
+        self._variable_indices = {}
+        self._conditions = {}
+        self._values = {}
+
+    def variable(self, name):
+        index = self._variable_indices.get(name)
+        if index is None:
+            index = len(self.variables)
+            self.variables.append(name)
+            self._variable_indices[name] = index
+        return index
+
+    def rule(self, rule):
+        rule_conditions = list(_flatten(rule.antecedent))
+        entries = [(self.variable(condition.name), self.condition(condition))
+                   for condition in rule_conditions]
+        entries.extend((self.variable(name), self.value(value))
+                       for name, value in rule.consequent.items())
+        offset = len(self.body)
+        self.body += _counts.pack(len(rule_conditions), len(rule.consequent))
+        for variable, entry_offset in entries:
+            self.body += _pair.pack(variable, entry_offset)
+        return offset
+
+    def condition(self, condition):
+        key = _condition_key(condition)
+        offset = self._conditions.get(key)
+        if offset is not None:
+            return offset
+        if isinstance(condition, ruly.EqualsCondition):
+            data = _byte.pack(_equals) + _typed(condition.value)
+            children = []
+        elif isinstance(condition, conditions.RangeCondition):
+            flags = ((_start if condition.start is not None else 0)
+                     | (_end if condition.end is not None else 0)
+                     | (_start_closed if condition.start_closed else 0)
+                     | (_end_closed if condition.end_closed else 0))
+            data = _range.pack(_in_range, flags)
+            if condition.start is not None:
+                data += _typed(condition.start)
+            if condition.end is not None:
+                data += _typed(condition.end)
+            children = []
+        elif isinstance(condition, conditions.AnyCondition):
+            children = [self.condition(child)
+                        for child in condition.conditions]
+            data = _any.pack(_any_of, len(children))
+        elif isinstance(condition, conditions.NotCondition):
+            children = [self.condition(condition.condition)]
+            data = _byte.pack(_negated)
+        else:
+            raise ValueError(f'unsupported condition: {condition}')
+        offset = len(self.body)
+        self.body += data
+        for child in children:
+            self.body += _offset.pack(child)
+        self._conditions[key] = offset
+        return offset
+
+    def value(self, value):
+        try:
+            data = json.dumps(value, allow_nan=False).encode()
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'value can\'t be encoded: {value!r}') from e
+        offset = self._values.get(data)
+        if offset is None:
+            offset = len(self.body)
+            self.body += _byte.pack(_json) + _offset.pack(len(data)) + data
+            self._values[data] = offset
+        return offset
+
+
+def _flatten(antecedent):
+    if isinstance(antecedent, ruly.Expression):
+        for child in antecedent.children:
+            yield from _flatten(child)
+    else:
+        yield antecedent
+
+
+def _condition_key(condition):
+    if isinstance(condition, ruly.EqualsCondition):
+        return _equals, _typed(condition.value)
+    if isinstance(condition, conditions.RangeCondition):
+        return (_in_range, _typed(condition.start), _typed(condition.end),
+                condition.start_closed, condition.end_closed)
+    if isinstance(condition, conditions.AnyCondition):
+        return _any_of, tuple(_condition_key(child)
+                              for child in condition.conditions)
+    if isinstance(condition, conditions.NotCondition):
+        return _negated, _condition_key(condition.condition)
+    raise ValueError(f'unsupported condition: {condition}')
+
+
+def _typed(value):
+    if value is None:
+        return _byte.pack(_null)
+    if isinstance(value, (bool, int, float)):
+        if isinstance(value, float) and not math.isfinite(value):
+            return _byte.pack(_real) + _float.pack(value)
+        if value == int(value) and -2 ** 63 <= value < 2 ** 63:
+            return _byte.pack(_integer) + _int.pack(int(value))
+        if isinstance(value, float):
+            return _byte.pack(_real) + _float.pack(value)
+    if isinstance(value, str):
+        data = value.encode()
+        return _byte.pack(_text) + _offset.pack(len(data)) + data
+    try:
+        data = json.dumps(value, sort_keys=True, allow_nan=False).encode()
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'value can\'t be encoded: {value!r}') from e
+    return _byte.pack(_json) + _offset.pack(len(data)) + data
+
+
+def _key(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    try:
+        return _typed(value)
+    except ValueError:
+        return None
+
+
+def _read_typed(view, offset):
+    value, size = _read_value(view, offset)
+    return value, offset + size
+
+
+def _read_value(view, offset):
+    [tag] = _byte.unpack_from(view, offset)
+    position = offset + _byte.size
+    if tag == _null:
+        return None, _byte.size
+    if tag == _integer:
+        return _int.unpack_from(view, position)[0], _byte.size + 8
+    if tag == _real:
+        return _float.unpack_from(view, position)[0], _byte.size + 8
+    [length] = _offset.unpack_from(view, position)
+    start = position + _offset.size
+    data = bytes(view[start:start + length])
+    size = _byte.size + _offset.size + length
+    if tag == _text:
+        return data.decode(), size
+    return json.loads(data), size
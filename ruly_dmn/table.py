@@ -0,0 +1,205 @@
+import array
+import ruly
+
+from ruly_dmn.knowledge_base import value_key
+
+
+class DecisionTable:
+    """Column-oriented decision table. Every input column and the output
+    column are arrays of integer codes, and each code refers to a cell
+    interned in the column's pool, so equal cells are stored once per
+    column. Rules are materialized when they are first requested and kept
+    afterwards, and materialized rules share the interned conditions and
+    values.
+
+    A table with multiple outputs stores a tuple of output values in each
+    cell of its output column, and its rules assign all outputs whose values
+    aren't None.
+
+    Args:
+        output_name (str): name of the first output, used as the table's
+            name
+        inputs (Iterable[str]): names of input columns
+        output_names (Optional[Iterable[str]]): names of all outputs,
+            starting with output_name, if None, the table has only one
+            output"""
+
+    __slots__ = ('output_name', 'output_names', 'inputs', '_pools',
+                 '_columns', '_output_pool', '_output_column', '_rule_ids',
+                 '_rows', '_rules')
+
+    def __init__(self, output_name, inputs, output_names=None):
+        self.output_name = output_name
+        self.output_names = (tuple(output_names) if output_names is not None
+                             else (output_name,))
+        self.inputs = tuple(inputs)
+        self._pools = [_Pool() for _ in self.inputs]
+        self._columns = [array.array('I') for _ in self.inputs]
+        self._output_pool = _Pool()
+        self._output_column = array.array('I')
+        self._rule_ids = []
+        self._rows = None
+        self._rules = None
+
+    def __len__(self):
+        return len(self._output_column)
+
+    def append(self, conditions, output_value, rule_id):
+        """Appends a row
+
+        Args:
+            conditions (Iterable[Optional[ruly.Condition]]): condition of
+                each input column, None for a column that matches any value
+            output_value (Any): output value, or a tuple with the value of
+                each output if the table has multiple outputs
+            rule_id (str): rule ID
+
+        Raises:
+            TypeError: if a cell contains values that can't be hashed"""
+        codes = tuple(pool.intern(condition) for pool, condition
+                      in zip(self._pools, conditions))
+        output_code = self._output_pool.intern(output_value)
+        for column, code in zip(self._columns, codes):
+            column.append(code)
+        self._output_column.append(output_code)
+        self._rule_ids.append(rule_id)
+        if self._rows is not None:
+            self._rows.setdefault(codes + (output_code,), len(self) - 1)
+        if self._rules is not None:
+            self._rules.append(self._materialize(len(self) - 1))
+
+    def remove(self, index):
+        """Removes a row, cells stay in the column pools
+
+        Args:
+            index (int): row index"""
+        for column in self._columns:
+            del column[index]
+        del self._output_column[index]
+        del self._rule_ids[index]
+        self._rows = None
+        if self._rules is not None:
+            del self._rules[index]
+
+    def rule(self, index):
+        """Materializes a row as a rule
+
+        Args:
+            index (int): row index
+
+        Returns:
+            ruly.Rule"""
+        if self._rules is not None:
+            return self._rules[index]
+        return self._materialize(index)
+
+    def rules(self):
+        """Materializes all rows as rules on the first call, later calls
+        return the same rule objects
+
+        Returns:
+            List[ruly.Rule]: rules, in row order"""
+        if self._rules is None:
+            self._rules = [self._materialize(index)
+                           for index in range(len(self))]
+        return list(self._rules)
+
+    def rule_id(self, index):
+        """Returns the rule ID of a row
+
+        Args:
+            index (int): row index
+
+        Returns:
+            str"""
+        return self._rule_ids[index]
+
+    def find(self, rule):
+        """Finds the first row equal to a rule, as it would be written into
+        the table - conditions of variables that aren't inputs of the table
+        are ignored. An index of rows is built on the first call.
+
+        Args:
+            rule (ruly.Rule): rule
+
+        Returns:
+            Optional[int]: row index, None if the rule isn't in the table"""
+        if len(self.output_names) == 1:
+            if set(rule.consequent) != {self.output_name}:
+                return None
+            output_value = rule.consequent[self.output_name]
+        else:
+            if (len(rule.consequent) == 0
+                    or not set(rule.consequent).issubset(self.output_names)):
+                return None
+            output_value = tuple(rule.consequent.get(name)
+                                 for name in self.output_names)
+        if self._rows is None:
+            rows = {}
+            for index, codes in enumerate(zip(*self._columns,
+                                              self._output_column)):
+                rows.setdefault(codes, index)
+            self._rows = rows
+        children = (rule.antecedent.children
+                    if isinstance(rule.antecedent, ruly.Expression)
+                    else (rule.antecedent,))
+        conditions = {child.name: child for child in children}
+        try:
+            codes = tuple(pool.code(conditions.get(name)) for name, pool
+                          in zip(self.inputs, self._pools))
+            codes += (self._output_pool.code(output_value),)
+        except (KeyError, TypeError):
+            return None
+        return self._rows.get(codes)
+
+    def _materialize(self, index):
+        antecedent = ruly.Expression(ruly.Operator.AND, tuple(
+            pool.values[column[index]]
+            for pool, column in zip(self._pools, self._columns)
+            if column[index] != 0))
+        output_value = self._output_pool.values[self._output_column[index]]
+        if len(self.output_names) == 1:
+            return ruly.Rule(antecedent, {self.output_name: output_value})
+        return ruly.Rule(antecedent, {
+            name: value for name, value in zip(self.output_names, output_value)
+            if value is not None})
+
+
+class _Pool:
+
+    __slots__ = ('values', '_codes')
+
+    def __init__(self):
+        self.values = [None]
+        self._codes = {}
+
+    def intern(self, value):
+        if value is None:
+            return 0
+        key = _pool_key(value)
+        code = self._codes.get(key)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self._codes[key] = code
+        return code
+
+    def code(self, value):
+        if value is None:
+            return 0
+        return self._codes[_pool_key(value)]
+
+
+def _pool_key(value):
+    # equal values of different types, such as 1, 1.0 and True, have equal
+    # value keys, but they must not share a cell
+    return value_key(value), _types(value)
+
+
+def _types(value):
+    if isinstance(value, (tuple, list)):
+        return type(value), tuple(_types(item) for item in value)
+    if isinstance(value, dict):
+        return dict, frozenset((key, _types(item))
+                               for key, item in value.items())
+    return type(value)
@@ -0,0 +1,79 @@
+import pytest
+import ruly
+
+import ruly_dmn.analysis
+import ruly_dmn.common
+import ruly_dmn.conditions
+
+
+def _rule(tests, output_value):
+    return ruly.Rule(
+        ruly.Expression(ruly.Operator.AND, tuple(
+            ruly_dmn.conditions.parse_unary_tests(name, text)
+            for name, text in tests.items())),
+        {'y': output_value})
+
+
+@pytest.mark.parametrize('rule, other, overlaps, subsumes', [
+    (_rule({'x': '"a"'}, 1), _rule({'x': '"b"'}, 1), False, False),
+    (_rule({'x': '"a", "b"'}, 1), _rule({'x': '"b"'}, 1), True, True),
+    (_rule({'x': '< 10'}, 1), _rule({'x': '[10..20]'}, 1), False, False),
+    (_rule({'x': '<= 10'}, 1), _rule({'x': '[10..20]'}, 1), True, False),
+    (_rule({'x': '< 10', 'z': '1'}, 1), _rule({'x': '[3..5]', 'z': '1'}, 1),
+     True, True),
+    (_rule({'x': '[0..10)'}, 1), _rule({'x': '[0..5), [5..10)'}, 1),
+     True, True),
+    (_rule({'x': 'not("a")'}, 1), _rule({'x': '"b", "c"'}, 1), True, True),
+    (_rule({'x': 'not("a")'}, 1), _rule({'x': '"a"'}, 1), False, False),
+    (_rule({}, 1), _rule({'x': '> 3', 'z': '"a"'}, 1), True, True),
+    (_rule({'x': '> 3'}, 1), _rule({'x': '"a"'}, 1), False, False),
+])
+def test_overlaps_subsumes(rule, other, overlaps, subsumes):
+    assert ruly_dmn.analysis.overlaps(rule, other) == overlaps
+    assert ruly_dmn.analysis.overlaps(other, rule) == overlaps
+    assert ruly_dmn.analysis.subsumes(rule, other) == subsumes
+
+
+@pytest.mark.parametrize('hit_policy, kinds', [
+    (ruly_dmn.common.HitPolicy.UNIQUE, ['overlap', 'overlap']),
+    (ruly_dmn.common.HitPolicy.ANY, ['redundant', 'conflict']),
+    (ruly_dmn.common.HitPolicy.PRIORITY, ['redundant']),
+    (ruly_dmn.common.HitPolicy.FIRST, ['unreachable']),
+    (ruly_dmn.common.HitPolicy.COLLECT, []),
+])
+def test_analyze(hit_policy, kinds):
+    rules = [_rule({'x': '< 10'}, 1),
+             _rule({'x': '[3..5]'}, 1),
+             _rule({'x': '[8..20]'}, 2),
+             _rule({'x': '> 20'}, 3)]
+    issues = ruly_dmn.analysis.analyze(rules, {'y': hit_policy})
+    assert [issue.kind for issue in issues] == kinds
+    for issue in issues:
+        assert issue.output_name == 'y'
+        if issue.kind in ('unreachable', 'redundant'):
+            assert issue.rules == (rules[1], rules[0])
+
+
+def test_minimize():
+    rules = [_rule({'x': '"a"', 'z': '< 10'}, 1),
+             _rule({'x': '"a"', 'z': '[0..5]'}, 2),
+             _rule({'x': '"b"', 'z': '[0..5]'}, 1),
+             _rule({'x': '"a", "b"'}, 3),
+             _rule({'x': '"b"', 'z': '> 100'}, 4)]
+    hit_policies = {'y': ruly_dmn.common.HitPolicy.FIRST}
+    minimized = ruly_dmn.analysis.minimize(rules, hit_policies)
+    assert minimized == [rules[0], rules[2], rules[3]]
+    assert ruly_dmn.analysis.minimize(minimized, hit_policies) == minimized
+
+
+def test_new_rules():
+    rules = [_rule({'x': '"a"'}, 1),
+             _rule({'x': '"b"'}, 2),
+             _rule({'x': '"a"'}, 3)]
+    issues = ruly_dmn.analysis.table_issues(
+        'y', rules, ruly_dmn.common.HitPolicy.UNIQUE, new_rules=rules[1:2])
+    assert issues == []
+    issues = ruly_dmn.analysis.table_issues(
+        'y', rules, ruly_dmn.common.HitPolicy.UNIQUE, new_rules=rules[2:])
+    assert issues == [ruly_dmn.analysis.Issue('overlap', 'y',
+                                              (rules[0], rules[2]))]
@@ -0,0 +1,48 @@
+from pathlib import Path
+import shutil
+import ruly
+
+import ruly_dmn.artifact
+import ruly_dmn.dmn
+from ruly_dmn.handlers.camunda_modeler import CamundaModelerHandler
+
+
+example_path = (Path(__file__).parent.parent / 'examples' / '0001' /
+                'diagram.dmn')
+
+
+def test_compile(tmp_path):
+    path = tmp_path / 'diagram.dmn'
+    shutil.copy(example_path, path)
+    artifact_path = ruly_dmn.artifact.compile_model(path)
+    assert artifact_path == tmp_path / 'diagram.dmn.compiled'
+
+    handler = CamundaModelerHandler(path)
+    compiled_handler = CamundaModelerHandler(path,
+                                             artifact_path=artifact_path)
+    assert compiled_handler._tree is None
+    assert compiled_handler.rules == handler.rules
+    assert compiled_handler.dependencies == handler.dependencies
+    assert compiled_handler.hit_policies == handler.hit_policies
+
+    path.write_text(path.read_text().replace('"Fall"', '"Autumn"'))
+    assert ruly_dmn.artifact.read(artifact_path, path) is None
+    stale_handler = CamundaModelerHandler(path, path,
+                                          artifact_path=artifact_path)
+    assert stale_handler.rules == CamundaModelerHandler(path).rules
+    assert stale_handler.rules != handler.rules
+
+
+def test_update(tmp_path):
+    path = tmp_path / 'diagram.dmn'
+    shutil.copy(example_path, path)
+    artifact_path = ruly_dmn.artifact.compile_model(path)
+    handler = CamundaModelerHandler(path, path, artifact_path=artifact_path)
+    knowledge_base = ruly.KnowledgeBase(
+        ruly.Rule(ruly.Expression(
+            ruly.Operator.AND,
+            (ruly.EqualsCondition('Season', 'Monsoon'),)), {'Dish': 'Curry'}),
+        *handler.rules)
+    handler.update(knowledge_base)
+    assert CamundaModelerHandler(path).rules == list(knowledge_base.rules)
+    assert ruly_dmn.artifact.read(artifact_path, path) is None
@@ -0,0 +1,92 @@
+import io
+
+import pytest
+
+import ruly_dmn.batch
+from test_artifact import example_path
+
+
+@pytest.fixture
+def unique_path(tmp_path):
+    path = tmp_path / 'diagram.dmn'
+    path.write_text(example_path.read_text().replace(
+        '<decisionTable id="DecisionTable_082ueac" hitPolicy="FIRST">',
+        '<decisionTable id="DecisionTable_082ueac" hitPolicy="UNIQUE">'))
+    return path
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_evaluate(unique_path, workers):
+    records = [{'Season': 'Fall', 'Guests with children': True},
+               {'Season': 'Fall', 'Vegetarian Guests': True},
+               {'Season': 'Winter'},
+               {}]
+    results = list(ruly_dmn.batch.evaluate(
+        unique_path, ['Dish', 'Beverage'], iter(records), workers=workers,
+        chunk_size=3))
+
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    assert [result.record for result in results] == records
+    assert results[0].decisions == {'Dish': 'Spareribs',
+                                    'Beverage': 'Aecht Schlenkerla Rauchbier'}
+    assert results[1].decisions is None
+    assert 'unique' in results[1].error
+    assert results[2].decisions == {'Dish': 'Roastbeef',
+                                    'Beverage': 'Bordeaux'}
+    assert results[3].decisions == {'Dish': None, 'Beverage': 'Water'}
+    assert results[3].error is None
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_evaluate_errors(workers):
+    records = [{'Season': 'Winter'}, 'Winter', {'Season': 'Fall'}]
+    results = list(ruly_dmn.batch.evaluate(
+        example_path, ['Dish'], iter(records), workers=workers))
+
+    assert [result.decisions for result in results] == [
+        {'Dish': 'Roastbeef'}, None, {'Dish': 'Spareribs'}]
+    assert results[1].error.startswith('ValueError: ')
+    assert results[2].error is None
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_evaluate_unknown_goals(workers):
+    def records():
+        raise AssertionError('records read')
+        yield
+
+    with pytest.raises(ValueError, match='Lunch'):
+        ruly_dmn.batch.evaluate(example_path, ['Dish', 'Lunch'], records(),
+                                workers=workers)
+
+
+def test_invalid_records():
+    records = list(ruly_dmn.batch.read_records(io.StringIO(
+        '{"Season": "Winter"}\n\n{"Season": \n{"Season": "Fall"}\n'),
+        'jsonl'))
+    assert records[0] == {'Season': 'Winter'}
+    assert records[1].text == '{"Season": '
+    assert records[1].error.startswith('line 3: ')
+    assert records[2] == {'Season': 'Fall'}
+
+    results = list(ruly_dmn.batch.evaluate(example_path, ['Dish'],
+                                           iter(records)))
+    assert [result.decisions for result in results] == [
+        {'Dish': 'Roastbeef'}, None, {'Dish': 'Spareribs'}]
+    assert [result.record for result in results] == [
+        records[0], '{"Season": ', records[2]]
+    assert results[1].error == records[1].error
+
+
+def test_records_csv():
+    records = list(ruly_dmn.batch.read_records(
+        io.StringIO('a,b\n1,x\n,true\n'), 'csv'))
+    assert records == [{'a': 1, 'b': 'x'}, {'b': True}]
+
+    output = io.StringIO()
+    writer = ruly_dmn.batch.RecordWriter(output, 'csv', ['c'])
+    for record in records:
+        writer.write(record, {'c': [1]})
+    assert list(ruly_dmn.batch.read_records(
+        io.StringIO(output.getvalue()), 'csv')) == [
+            {'a': 1, 'b': 'x', 'c': [1]}, {'b': True, 'c': [1]}]
@@ -0,0 +1,144 @@
+from pathlib import Path
+import random
+
+import pytest
+import ruly
+
+import ruly_dmn.codegen
+import ruly_dmn.common
+import ruly_dmn.conditions
+import ruly_dmn.dmn
+import ruly_dmn.planner
+from ruly_dmn.handlers.camunda_modeler import CamundaModelerHandler
+
+
+example_path = (Path(__file__).parent.parent / 'examples' / '0001' /
+                'diagram.dmn')
+
+
+class MockModelHandler(ruly_dmn.common.ModelHandler):
+
+    def __init__(self, dependencies, hit_policies, rules, output_values={}):
+        self._dependencies = dependencies
+        self._hit_policies = hit_policies
+        self._rules = rules
+        self._output_values = output_values
+
+    @property
+    def dependencies(self):
+        return self._dependencies
+
+    @property
+    def hit_policies(self):
+        return self._hit_policies
+
+    @property
+    def rules(self):
+        return self._rules
+
+    @property
+    def output_values(self):
+        return self._output_values
+
+    def update(self, knowledge_base):
+        pass
+
+
+class MockRuleFactory(ruly_dmn.common.RuleFactory):
+
+    def create_rule(self, state, fired_rules, output_names):
+        return None
+
+
+def _decide(dmn, inputs, decision):
+    try:
+        return dmn.decide(inputs, decision)
+    except ruly_dmn.dmn.HitPolicyViolation:
+        return ruly_dmn.dmn.HitPolicyViolation
+
+
+def _random_condition(rng, name):
+    if rng.random() < 0.7:
+        return ruly.EqualsCondition(name, rng.choice([1, 2, 3, 'a']))
+    tests = ['< 2', '>= 3', '[1..2]', '(1..3]', '1, 3', 'not(2)',
+             'not(< 2, "a")', '"a", > 2']
+    return ruly_dmn.conditions.parse_unary_tests(name, rng.choice(tests))
+
+
+def _random_rules(rng, output_name, inputs, count):
+    rules = []
+    for _ in range(count):
+        children = tuple(_random_condition(rng, name) for name in inputs
+                         if rng.random() < 0.7)
+        rules.append(ruly.Rule(ruly.Expression(ruly.Operator.AND, children),
+                               {output_name: rng.randint(0, 3)}))
+    return rules
+
+
+@pytest.mark.parametrize('hit_policy', list(ruly_dmn.common.HitPolicy))
+@pytest.mark.parametrize('seed', range(3))
+def test_equivalence(hit_policy, seed):
+    rng = random.Random(seed)
+    rules = [*_random_rules(rng, 'y', ['a', 'b', 'c'], 30),
+             *_random_rules(rng, 'z', ['a', 'y'], 10)]
+    handler = MockModelHandler(
+        {'y': ['a', 'b', 'c'], 'z': ['a', 'y']},
+        {'y': hit_policy, 'z': ruly_dmn.common.HitPolicy.FIRST}, rules,
+        {'y': [3, 1, 2, 0]})
+    interpreted = ruly_dmn.dmn.DMN(handler, lambda _: MockRuleFactory())
+    compiled = ruly_dmn.dmn.DMN(handler, lambda _: MockRuleFactory(),
+                                compiled=True)
+    values = [None, 0, 1, 2, 3, 2.5, 'a', 'b', [1]]
+    graph = ruly_dmn.planner.dependency_graph(handler.dependencies, rules)
+    assert '_node' in ruly_dmn.codegen.compile_rules(
+        rules, graph, handler.hit_policies).source
+    for _ in range(200):
+        inputs = {name: rng.choice(values) for name in ('a', 'b', 'c')}
+        if rng.random() < 0.1:
+            inputs['y'] = rng.randint(0, 3)
+        for decision in ('y', 'z'):
+            assert (_decide(compiled, inputs, decision)
+                    == _decide(interpreted, inputs, decision))
+
+
+def test_example(tmp_path):
+    handler = CamundaModelerHandler(example_path)
+    path = tmp_path / 'diagram.py'
+    interpreted = ruly_dmn.dmn.DMN(handler, lambda _: MockRuleFactory())
+    compiled = ruly_dmn.dmn.DMN(handler, lambda _: MockRuleFactory(),
+                                compiled=True, compiled_path=path)
+    for season in ('Fall', 'Winter', 'Spring', 'Summer', 'Monsoon'):
+        for guests in (1, 4, 8):
+            for vegetarian in (True, False, None):
+                inputs = {'Season': season, 'Number of Guests': guests,
+                          'Vegetarian Guests': vegetarian}
+                for decision in ('Dish', 'Beverage'):
+                    assert (compiled.decide(inputs, decision)
+                            == interpreted.decide(inputs, decision))
+    assert path.exists()
+
+
+def test_cache(tmp_path):
+    path = tmp_path / 'model.py'
+    rules = [ruly.Rule(ruly.EqualsCondition('x', x), {'y': x * 2})
+             for x in range(10)]
+    graph = ruly_dmn.planner.dependency_graph({'y': ['x']}, rules)
+    hit_policies = {'y': ruly_dmn.common.HitPolicy.UNIQUE}
+    model = ruly_dmn.codegen.compile_rules(rules, graph, hit_policies,
+                                           path=path)
+    assert model.evaluate('y', {'x': 3}) == {'x': 3, 'y': 6}
+    assert model.evaluate('y', {'x': 10}) is None
+    assert path.read_text() == model.source
+
+    path.write_text(model.source.replace("{'y': 6}", "{'y': 7}"))
+    assert ruly_dmn.codegen.compile_rules(
+        rules, graph, hit_policies, path=path).evaluate(
+            'y', {'x': 3}) == {'x': 3, 'y': 7}
+
+    rules.append(ruly.Rule(ruly.EqualsCondition('x', 10), {'y': 0}))
+    graph = ruly_dmn.planner.dependency_graph({'y': ['x']}, rules)
+    model = ruly_dmn.codegen.compile_rules(rules, graph, hit_policies,
+                                           path=path)
+    assert model.evaluate('y', {'x': 3}) == {'x': 3, 'y': 6}
+    assert model.evaluate('y', {'x': 10}) == {'x': 10, 'y': 0}
+    assert path.read_text() == model.source
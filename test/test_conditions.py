@@ -0,0 +1,115 @@
+import random
+
+import pytest
+import ruly
+
+from ruly_dmn.conditions import (AnyCondition,
+                                 IntervalIndex,
+                                 NotCondition,
+                                 RangeCondition)
+import ruly_dmn.conditions
+
+
+@pytest.mark.parametrize('text,condition', [
+    (None, None),
+    ('"Fall"', ruly.EqualsCondition('x', 'Fall')),
+    ('[1, 2]', ruly.EqualsCondition('x', [1, 2])),
+    ('< 18', RangeCondition('x', None, 18, False, False)),
+    ('<= 18', RangeCondition('x', None, 18, False, True)),
+    ('> 65', RangeCondition('x', 65, None, False, False)),
+    ('>= 65', RangeCondition('x', 65, None, True, False)),
+    ('[18..65]', RangeCondition('x', 18, 65, True, True)),
+    ('(0.5..1]', RangeCondition('x', 0.5, 1, False, True)),
+    ('"a", "b, c"', AnyCondition('x', (
+        ruly.EqualsCondition('x', 'a'),
+        ruly.EqualsCondition('x', 'b, c')))),
+    ('< 0, [10..20)', AnyCondition('x', (
+        RangeCondition('x', None, 0, False, False),
+        RangeCondition('x', 10, 20, True, False)))),
+    ('(1..2], 5, [3..4)', AnyCondition('x', (
+        RangeCondition('x', 1, 2, False, True),
+        ruly.EqualsCondition('x', 5),
+        RangeCondition('x', 3, 4, True, False)))),
+    ('[1, 2], [1..2], {"a": [1, 2]}', AnyCondition('x', (
+        ruly.EqualsCondition('x', [1, 2]),
+        RangeCondition('x', 1, 2, True, True),
+        ruly.EqualsCondition('x', {'a': [1, 2]})))),
+    ('not("a", > 3)', NotCondition('x', AnyCondition('x', (
+        ruly.EqualsCondition('x', 'a'),
+        RangeCondition('x', 3, None, False, False))))),
+])
+def test_parse_format(text, condition):
+    assert ruly_dmn.conditions.parse_unary_tests('x', text) == condition
+    assert ruly_dmn.conditions.format_unary_tests(condition) == text
+
+
+def test_parse_alternative_syntax():
+    assert ruly_dmn.conditions.parse_unary_tests('x', '-') is None
+    assert ruly_dmn.conditions.parse_unary_tests('x', ' ') is None
+    assert (ruly_dmn.conditions.parse_unary_tests('x', ']1..5[') ==
+            RangeCondition('x', 1, 5, False, False))
+    assert (ruly_dmn.conditions.parse_unary_tests('x', ']1..2], 5') ==
+            AnyCondition('x', (RangeCondition('x', 1, 2, False, True),
+                               ruly.EqualsCondition('x', 5))))
+    assert (ruly_dmn.conditions.parse_unary_tests('x', '[1..2[, 5') ==
+            AnyCondition('x', (RangeCondition('x', 1, 2, True, False),
+                               ruly.EqualsCondition('x', 5))))
+    assert (ruly_dmn.conditions.parse_unary_tests('x', 'not(]1..2[, (3..4))')
+            == NotCondition('x', AnyCondition('x', (
+                RangeCondition('x', 1, 2, False, False),
+                RangeCondition('x', 3, 4, False, False)))))
+
+
+@pytest.mark.parametrize('text', ['< null', '[1..]', 'not(', '"a" "b"',
+                                  ']1..2], [3'])
+def test_parse_invalid(text):
+    with pytest.raises(ValueError):
+        ruly_dmn.conditions.parse_unary_tests('x', text)
+
+
+@pytest.mark.parametrize('text,value,expected', [
+    ('< 18', 17.5, True),
+    ('< 18', 18, False),
+    ('[18..65]', 18, True),
+    ('[18..65)', 65, False),
+    ('[18..65]', None, False),
+    ('[18..65]', 'a', False),
+    ('"a", [1..2]', 'a', True),
+    ('"a", [1..2]', 3, False),
+    ('not("a", [1..2])', 3, True),
+    ('not("a", [1..2])', None, False),
+])
+def test_evaluate(text, value, expected):
+    condition = ruly_dmn.conditions.parse_unary_tests('x', text)
+    assert ruly_dmn.conditions.evaluate({'x': value}, condition) is expected
+
+
+def test_interval_index():
+    texts = ['< 18', '[18..65]', '> 65', '>= 60', '3, 70']
+    index = IntervalIndex(
+        (ruly_dmn.conditions.intervals(
+            ruly_dmn.conditions.parse_unary_tests('x', text)), i)
+        for i, text in enumerate(texts))
+    for value in [-1, 3, 17.9, 18, 40, 60, 65, 65.5, 70, 100]:
+        assert index.lookup(value) == [
+            i for i, text in enumerate(texts)
+            if ruly_dmn.conditions.evaluate(
+                {'x': value},
+                ruly_dmn.conditions.parse_unary_tests('x', text))]
+
+
+def test_interval_index_overlapping():
+    rng = random.Random(0)
+    texts = [rng.choice([f'>= {i}', f'< {i}', f'[{i}..{i + 50})',
+                         f'{i}, > {i + 20}', f'({i}..{i + 5}], {i + 3}'])
+             for i in range(300)]
+    index = IntervalIndex(
+        (ruly_dmn.conditions.intervals(
+            ruly_dmn.conditions.parse_unary_tests('x', text)), i)
+        for i, text in enumerate(texts))
+    for value in [-1, 0, 0.5, 17, 150, 299, 299.5, 350]:
+        assert index.lookup(value) == [
+            i for i, text in enumerate(texts)
+            if ruly_dmn.conditions.evaluate(
+                {'x': value},
+                ruly_dmn.conditions.parse_unary_tests('x', text))]
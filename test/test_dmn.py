@@ -1,18 +1,27 @@
+import asyncio
+import concurrent.futures
+import random
+
 import pytest
 import ruly
 
+import ruly_dmn.analysis
+import ruly_dmn.cache
 import ruly_dmn.common
 import ruly_dmn.dmn
+import ruly_dmn.instrumentation
+import ruly_dmn.planner
 
 
 class MockModelHandler(ruly_dmn.common.ModelHandler):
 
     def __init__(self, dependencies={}, hit_policies={}, rules=[],
-                 update_fn=None):
+                 update_fn=None, output_values={}):
         self._dependencies = dependencies
         self._hit_policies = hit_policies
         self._rules = rules
         self._update_fn = update_fn
+        self._output_values = output_values
 
     @property
     def dependencies(self):
@@ -26,6 +35,10 @@ class MockModelHandler(ruly_dmn.common.ModelHandler):
     def rules(self):
         return self._rules
 
+    @property
+    def output_values(self):
+        return self._output_values
+
     def update(self, knowledge_base):
         if self._update_fn is not None:
             return self._update_fn(knowledge_base)
@@ -48,6 +61,28 @@ def test_inputs():
     assert dmn.inputs == {'c', 'd', 'f', 'g'}
 
 
+def test_cyclic_model():
+    handler = MockModelHandler({'a': ('b',), 'b': ('a',)})
+    with pytest.raises(ruly_dmn.planner.ModelError):
+        ruly_dmn.dmn.DMN(handler)
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_unrelated_tables_skipped(indexed):
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2}),
+             ruly.Rule(ruly.EqualsCondition('x', 1), {'u': 2})]
+    stats = ruly_dmn.instrumentation.Stats()
+    dmn = ruly_dmn.dmn.DMN(
+        MockModelHandler({'y': ('x',), 'u': ('x',)},
+                         {k: ruly_dmn.common.HitPolicy.FIRST
+                          for k in ('y', 'u')},
+                         rules),
+        lambda _: MockRuleFactory(), indexed=indexed, instrumentation=stats)
+    assert dmn.plan('y').order == ('y',)
+    assert dmn.decide({'x': 1}, 'y') == 2
+    assert set(stats.snapshot().tables) == {'y'}
+
+
 @pytest.mark.parametrize('rules,inputs,decision,expected', [
     ([ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2})], {'x': 1}, 'y', 2),
     ([ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2}),
@@ -88,4 +123,489 @@ def test_factory_called():
     assert create_args == {'state': {'x': 1, 'y': None},
                            'fired_rules': rules,
                            'output_names': 'y'}
-    assert dmn._knowledge_base.rules == tuple([new_rule] + rules)
+    assert dmn.knowledge_base.rules == tuple([new_rule] + rules)
+
+
+@pytest.mark.parametrize('inputs', [
+    [{'x': 1}, {'x': 2}, {'x': 1}, {}, {'x': [1]}],
+    {'x': [1, 2, 1, None, [1]]},
+])
+def test_decide_many(inputs):
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2}),
+             ruly.Rule(ruly.EqualsCondition('x', [1]), {'y': 3}),
+             ruly.Rule(ruly.EqualsCondition('y', 2), {'z': 3}),
+             ruly.Rule(ruly.EqualsCondition('y', 3), {'z': 4})]
+    handler = MockModelHandler(hit_policies={k: ruly_dmn.common.HitPolicy.FIRST
+                                             for k in ('y', 'z')},
+                               rules=rules)
+    dmn = ruly_dmn.dmn.DMN(handler, lambda _: MockRuleFactory())
+    assert dmn.decide_many(inputs, 'z') == [3, None, 3, None, 4]
+
+
+def test_decide_many_factory():
+    new_rule = ruly.Rule(ruly.EqualsCondition('x', 2), {'y': 3})
+    created = []
+
+    def create_rule_fn(state, fired_rules, output_names):
+        if state['x'] == 2 and new_rule not in created:
+            created.append(new_rule)
+            return new_rule
+
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2})]
+    updates = []
+    dmn = ruly_dmn.dmn.DMN(
+        MockModelHandler(rules=rules,
+                         hit_policies={'y': ruly_dmn.common.HitPolicy.FIRST},
+                         update_fn=updates.append),
+        lambda _: MockRuleFactory(create_rule_fn))
+    assert dmn.decide_many([{'x': 2}, {'x': 1}, {'x': 2}], 'y') == [3, 2, 3]
+    assert len(updates) == 1
+    assert updates[0].rules == tuple(rules + [new_rule])
+
+
+def test_cache():
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2}),
+             ruly.Rule(ruly.EqualsCondition('y', 2), {'z': 3}),
+             ruly.Rule(ruly.EqualsCondition('w', 1), {'v': 4})]
+    new_rule = ruly.Rule(ruly.EqualsCondition('x', 2), {'y': 2})
+    learn = False
+
+    def create_rule_fn(state, fired_rules, output_names):
+        if learn and output_names == 'y' and len(fired_rules) == 0:
+            return new_rule
+
+    dmn = ruly_dmn.dmn.DMN(
+        MockModelHandler(rules=rules,
+                         hit_policies={k: ruly_dmn.common.HitPolicy.FIRST
+                                       for k in ('y', 'z', 'v')}),
+        lambda _: MockRuleFactory(create_rule_fn),
+        cache_size=1)
+    assert dmn.decide({'x': 1, 'w': 1}, 'z') == 3
+    assert dmn.decide({'x': 1, 'w': 2}, 'z') == 3
+    assert dmn.cache_info() == ruly_dmn.cache.CacheInfo(
+        hits=1, misses=1, maxsize=1, currsize=1)
+
+    assert dmn.decide({'x': 2}, 'z') is None
+    assert dmn.decide({'w': 1}, 'v') == 4
+    assert dmn.decide({'x': 1}, 'z') == 3
+    assert dmn.cache_info() == ruly_dmn.cache.CacheInfo(
+        hits=1, misses=4, maxsize=1, currsize=1)
+
+    learn = True
+    assert dmn.decide({'x': 2}, 'z') == 3
+    assert dmn.decide({'x': 1}, 'z') == 3
+    assert dmn.cache_info().misses == 6
+
+
+def test_cache_given_decisions():
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2}),
+             ruly.Rule(ruly.EqualsCondition('y', 2), {'z': 3}),
+             ruly.Rule(ruly.EqualsCondition('y', 99), {'z': 7})]
+    dmn = ruly_dmn.dmn.DMN(
+        MockModelHandler(rules=rules,
+                         hit_policies={k: ruly_dmn.common.HitPolicy.FIRST
+                                       for k in ('y', 'z')}),
+        lambda _: MockRuleFactory(), cache_size=10)
+    assert dmn.decide({'x': 1}, 'z') == 3
+    assert dmn.decide({'x': 1, 'y': 99}, 'z') == 7
+    assert dmn.decide({'x': 1}, 'z') == 3
+    assert dmn.cache_info().hits == 1
+
+    session = dmn.session({'x': 1, 'y': 99})
+    assert session.decide('z') == 7
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_rule_inserted_in_place(indexed):
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2}),
+             ruly.Rule(ruly.EqualsCondition('y', 2), {'z': 3})]
+    new_rule = ruly.Rule(ruly.EqualsCondition('y', 2), {'z': 4})
+    calls = []
+
+    def create_rule_fn(state, fired_rules, output_names):
+        calls.append(output_names)
+        if output_names == 'z' and fired_rules[0] != new_rule:
+            return new_rule
+
+    updates = []
+    dmn = ruly_dmn.dmn.DMN(
+        MockModelHandler(rules=rules,
+                         hit_policies={k: ruly_dmn.common.HitPolicy.FIRST
+                                       for k in ('y', 'z')},
+                         update_fn=updates.append),
+        lambda _: MockRuleFactory(create_rule_fn),
+        indexed=indexed)
+    assert dmn.decide({'x': 1}, 'z') == 4
+    assert calls == ['y', 'z', 'z']
+    assert dmn.knowledge_base.rules == (rules[0], new_rule, rules[1])
+    assert updates == [dmn.knowledge_base]
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+@pytest.mark.parametrize('hit_policy,expected', [
+    (ruly_dmn.common.HitPolicy.FIRST, 'b'),
+    (ruly_dmn.common.HitPolicy.PRIORITY, 'a'),
+    (ruly_dmn.common.HitPolicy.COLLECT, ['b', 'c', 'a']),
+    (ruly_dmn.common.HitPolicy.RULE_ORDER, ['b', 'c', 'a']),
+    (ruly_dmn.common.HitPolicy.OUTPUT_ORDER, ['a', 'b', 'c']),
+    (ruly_dmn.common.HitPolicy.COLLECT_COUNT, 3),
+    (ruly_dmn.common.HitPolicy.COLLECT_MIN, 'a'),
+    (ruly_dmn.common.HitPolicy.COLLECT_MAX, 'c'),
+])
+def test_hit_policies(indexed, hit_policy, expected):
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 'b'}),
+             ruly.Rule(ruly.EqualsCondition('x', 2), {'y': 'd'}),
+             ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 'c'}),
+             ruly.Rule(ruly.Expression(ruly.Operator.AND, ()), {'y': 'a'})]
+    handler = MockModelHandler(hit_policies={'y': hit_policy}, rules=rules,
+                               output_values={'y': ['a', 'b', 'c', 'd']})
+    dmn = ruly_dmn.dmn.DMN(handler, lambda _: MockRuleFactory(),
+                           indexed=indexed)
+    assert dmn.decide({'x': 1}, 'y') == expected
+    assert dmn.decide_many([{'x': 1}, {'x': 1}], 'y') == [expected] * 2
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_collect_sum(indexed):
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2}),
+             ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 3})]
+    handler = MockModelHandler(
+        hit_policies={'y': ruly_dmn.common.HitPolicy.COLLECT_SUM},
+        rules=rules)
+    dmn = ruly_dmn.dmn.DMN(handler, lambda _: MockRuleFactory(),
+                           indexed=indexed)
+    assert dmn.decide({'x': 1}, 'y') == 5
+    assert dmn.decide({'x': 2}, 'y') is None
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+@pytest.mark.parametrize('hit_policy,violated', [
+    (ruly_dmn.common.HitPolicy.UNIQUE, True),
+    (ruly_dmn.common.HitPolicy.ANY, True),
+    (ruly_dmn.common.HitPolicy.FIRST, False),
+])
+def test_short_circuit(indexed, hit_policy, violated):
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 1}),
+             ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2}),
+             ruly.Rule(ruly.EqualsCondition('z', 1), {'y': 3}),
+             ruly.Rule(ruly.EqualsCondition('x', 1), {'z': 1})]
+    handler = MockModelHandler(
+        hit_policies={'y': hit_policy,
+                      'z': ruly_dmn.common.HitPolicy.FIRST},
+        rules=rules)
+    fired = []
+
+    def create_rule_fn(state, fired_rules, output_name):
+        fired.append((output_name, fired_rules))
+
+    dmn = ruly_dmn.dmn.DMN(handler,
+                           lambda _: MockRuleFactory(create_rule_fn),
+                           indexed=indexed)
+    if violated:
+        with pytest.raises(ruly_dmn.dmn.HitPolicyViolation):
+            dmn.decide({'x': 1}, 'y')
+    else:
+        assert dmn.decide({'x': 1}, 'y') == 1
+        assert fired[-1] == ('y', rules[:1])
+        if not indexed:
+            assert len(fired) == 1
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+@pytest.mark.parametrize('cache_size', [None, 16])
+def test_concurrent_decide(indexed, cache_size):
+    rules = [ruly.Rule(ruly.EqualsCondition('x', x), {'y': x})
+             for x in range(0, 100, 2)]
+    rules.extend(ruly.Rule(ruly.EqualsCondition('y', y), {'z': -y})
+                 for y in range(100))
+    updates = []
+
+    def create_rule_fn(state, fired_rules, output_name):
+        if output_name == 'y' and len(fired_rules) == 0:
+            return ruly.Rule(ruly.EqualsCondition('x', state['x']),
+                             {'y': state['x']})
+
+    dmn = ruly_dmn.dmn.DMN(
+        MockModelHandler(rules=rules,
+                         hit_policies={k: ruly_dmn.common.HitPolicy.FIRST
+                                       for k in ('y', 'z')},
+                         update_fn=updates.append),
+        lambda _: MockRuleFactory(create_rule_fn),
+        indexed=indexed, cache_size=cache_size)
+
+    def decide(seed):
+        randomizer = random.Random(seed)
+        for _ in range(200):
+            x = randomizer.randrange(100)
+            assert dmn.decide({'x': x}, 'z') == -x
+
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        for future in [executor.submit(decide, seed) for seed in range(8)]:
+            future.result()
+
+    y_rules = dmn.knowledge_base.output_rules('y')
+    assert sorted(rule.consequent['y'] for rule in y_rules) == list(range(100))
+    assert len(updates) == 50
+    assert updates[-1] is dmn.knowledge_base
+
+
+class MockAsyncRuleFactory(ruly_dmn.common.AsyncRuleFactory):
+
+    def __init__(self, create_rule_fn):
+        self._create_rule_fn = create_rule_fn
+
+    async def create_rule(self, state, fired_rules, output_names):
+        return await self._create_rule_fn(state, fired_rules, output_names)
+
+
+@pytest.mark.parametrize('threaded', [False, True])
+def test_adecide(threaded):
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2}),
+             ruly.Rule(ruly.EqualsCondition('y', 3), {'z': 4})]
+    new_rule = ruly.Rule(ruly.EqualsCondition('x', 2), {'y': 3})
+    reviews = []
+    updates = []
+
+    async def create_rule_fn(state, fired_rules, output_names):
+        if state['x'] == 2 and output_names == 'y' and not fired_rules:
+            reviews.append(state)
+            await reviewed.wait()
+            return new_rule
+
+    dmn = ruly_dmn.dmn.DMN(
+        MockModelHandler(rules=rules,
+                         hit_policies={k: ruly_dmn.common.HitPolicy.FIRST
+                                       for k in ('y', 'z')},
+                         update_fn=updates.append),
+        lambda _: MockAsyncRuleFactory(create_rule_fn))
+
+    async def run():
+        nonlocal reviewed
+        reviewed = asyncio.Event()
+        pending = asyncio.ensure_future(
+            dmn.adecide({'x': 2}, 'z', executor=executor))
+        assert await dmn.adecide({'x': 1}, 'y', executor=executor) == 2
+        assert not pending.done()
+        reviewed.set()
+        assert await pending == 4
+        assert await dmn.decide_many_async(
+            [{'x': 1}, {'x': 2}], 'y', executor=executor) == [2, 3]
+
+    reviewed = None
+    executor = None
+    if threaded:
+        executor = concurrent.futures.ThreadPoolExecutor(2)
+    asyncio.run(run())
+    if executor is not None:
+        executor.shutdown()
+    assert len(reviews) == 1
+    assert updates == [dmn.knowledge_base]
+    with pytest.raises(TypeError):
+        dmn.decide({'x': 1}, 'y')
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_instrumentation(indexed):
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2}),
+             ruly.Rule(ruly.EqualsCondition('x', 2), {'y': 3}),
+             ruly.Rule(ruly.EqualsCondition('y', 2), {'z': 3})]
+    new_rule = ruly.Rule(ruly.EqualsCondition('w', 1), {'z': 4})
+
+    def create_rule_fn(state, fired_rules, output_name):
+        if output_name == 'z' and len(fired_rules) == 0:
+            return new_rule
+
+    stats = ruly_dmn.instrumentation.Stats()
+    dmn = ruly_dmn.dmn.DMN(
+        MockModelHandler(rules=rules,
+                         hit_policies={k: ruly_dmn.common.HitPolicy.FIRST
+                                       for k in ('y', 'z')}),
+        lambda _: MockRuleFactory(create_rule_fn),
+        indexed=indexed, cache_size=10, instrumentation=stats)
+    assert dmn.decide({'x': 1}, 'z') == 3
+    assert dmn.decide({'x': 1}, 'z') == 3
+    assert dmn.decide({'x': 3, 'w': 1}, 'z') == 4
+    assert dmn.decide_many([{'x': 1}, {'x': 2}], 'y') == [2, 3]
+
+    snapshot = stats.snapshot()
+    assert snapshot.decisions['z'].count == 3
+    assert snapshot.batches['y'].count == 1
+    assert snapshot.batch_records == {'y': 2}
+    assert snapshot.cache_hits == 1
+    assert snapshot.cache_misses == 2
+    assert snapshot.restarts == 1
+    assert snapshot.publications.count == 2
+    assert snapshot.updates.count == 1
+    assert snapshot.tables['y'].evaluations == 5
+    assert snapshot.tables['y'].fired == 3
+    assert snapshot.tables['z'].evaluations == 3
+    assert snapshot.tables['z'].fired == 2
+    assert snapshot.rule_factory.count == snapshot.hit_policies.count
+
+    stats.reset()
+    assert stats.snapshot().decisions == {}
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_learn(indexed):
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2}),
+             ruly.Rule(ruly.Expression(ruly.Operator.AND, ()), {'y': 0})]
+    updates = []
+    handler = MockModelHandler({'y': ('x', 'w')},
+                               {'y': ruly_dmn.common.HitPolicy.FIRST},
+                               rules, update_fn=updates.append)
+    dmn = ruly_dmn.dmn.DMN(handler, lambda _: MockRuleFactory(),
+                           indexed=indexed)
+    summary = dmn.learn([{'x': 1, 'y': 2},
+                         {'x': 2, 'w': 1, 'y': 3},
+                         {'x': 3, 'y': 4},
+                         {'x': 2, 'w': 1, 'y': 3},
+                         {'x': 3, 'y': 5},
+                         {'x': 4},
+                         {'x': 1, 'y': 6}], ['y'])
+    assert summary == ruly_dmn.dmn.LearnSummary(added=3, duplicates=1,
+                                                redundant=1, conflicts=1)
+    assert len(updates) == 1
+    assert len(dmn.knowledge_base) == 5
+    assert dmn.decide({'x': 2, 'w': 1}, 'y') == 3
+    assert dmn.decide({'x': 3}, 'y') == 4
+    assert dmn.decide({'x': 1}, 'y') == 6
+    assert dmn.decide({'x': 4}, 'y') == 0
+
+    assert dmn.learn([{'x': 3, 'y': 4}], ['y']).duplicates == 1
+    assert len(updates) == 1
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_learn_upstream_decisions(indexed):
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2}),
+             ruly.Rule(ruly.EqualsCondition('x', 2), {'y': 3}),
+             ruly.Rule(ruly.EqualsCondition('y', 2), {'z': 1})]
+    handler = MockModelHandler({'y': ('x',), 'z': ('y', 'w')},
+                               {'y': ruly_dmn.common.HitPolicy.FIRST,
+                                'z': ruly_dmn.common.HitPolicy.FIRST},
+                               rules)
+    dmn = ruly_dmn.dmn.DMN(handler, lambda _: MockRuleFactory(),
+                           indexed=indexed)
+    summary = dmn.learn([{'x': 2, 'w': 1, 'z': 5},
+                         {'x': 1, 'z': 1},
+                         {'x': 1, 'y': 3, 'w': 1, 'z': 6}], ['z'])
+    assert summary == ruly_dmn.dmn.LearnSummary(added=1, duplicates=0,
+                                                redundant=1, conflicts=1)
+    assert dmn.knowledge_base.output_rules('z')[1:] == [
+        ruly.Rule(ruly.Expression(ruly.Operator.AND, (
+            ruly.EqualsCondition('y', 3), ruly.EqualsCondition('w', 1))),
+            {'z': 5})]
+    assert dmn.decide({'x': 2, 'w': 1}, 'z') == 5
+    assert dmn.decide({'x': 1, 'w': 1}, 'z') == 1
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_analyze(indexed):
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 1}),
+             ruly.Rule(ruly.EqualsCondition('x', 2), {'y': 2}),
+             ruly.Rule(ruly.EqualsCondition('x', 1), {'z': 1}),
+             ruly.Rule(ruly.EqualsCondition('x', 1), {'z': 2}),
+             ruly.Rule(ruly.EqualsCondition('x', 3), {'w': 1}),
+             ruly.Rule(ruly.EqualsCondition('x', 3), {'w': 2})]
+    new_rules = [ruly.Rule(ruly.EqualsCondition('x', 3), {'y': 3}),
+                 ruly.Rule(ruly.EqualsCondition('v', 1), {'y': 4})]
+    new_rules_iter = iter(new_rules)
+
+    def create_rule_fn(state, fired_rules, output_name):
+        if len(fired_rules) == 0:
+            return next(new_rules_iter)
+
+    stats = ruly_dmn.instrumentation.Stats()
+    dmn = ruly_dmn.dmn.DMN(
+        MockModelHandler(
+            hit_policies={'y': ruly_dmn.common.HitPolicy.UNIQUE,
+                          'z': ruly_dmn.common.HitPolicy.UNIQUE,
+                          'w': ruly_dmn.common.HitPolicy.FIRST},
+            rules=rules),
+        lambda _: MockRuleFactory(create_rule_fn),
+        indexed=indexed, instrumentation=stats, analyze=True)
+    assert dmn.issues == [
+        ruly_dmn.analysis.Issue('overlap', 'z', (rules[2], rules[3])),
+        ruly_dmn.analysis.Issue('unreachable', 'w', (rules[5], rules[4]))]
+    assert rules[5] not in dmn.knowledge_base
+
+    assert dmn.decide({'x': 1}, 'y') == 1
+    table_stats = stats.snapshot().tables['y']
+    assert table_stats.evaluated == table_stats.evaluations
+    with pytest.raises(ruly_dmn.dmn.HitPolicyViolation):
+        dmn.decide({'x': 1}, 'z')
+    assert dmn.decide({'x': 3}, 'w') == 1
+
+    assert dmn.decide({'x': 3}, 'y') == 3
+    assert len(dmn.issues) == 2
+    assert dmn.decide({'x': 4, 'v': 1}, 'y') == 4
+    assert [issue.rules[1] for issue in dmn.issues[2:]] == [new_rules[1]] * 3
+    with pytest.raises(ruly_dmn.dmn.HitPolicyViolation):
+        dmn.decide({'x': 3, 'v': 1}, 'y')
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+@pytest.mark.parametrize('compiled', [False, True])
+def test_decide_all(indexed, compiled):
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2}),
+             ruly.Rule(ruly.EqualsCondition('y', 2), {'z': 3}),
+             ruly.Rule(ruly.EqualsCondition('y', 2), {'u': 4, 'v': 5})]
+    stats = ruly_dmn.instrumentation.Stats()
+    dmn = ruly_dmn.dmn.DMN(
+        MockModelHandler({'y': ('x',), 'z': ('y',), 'u': ('y',),
+                          'v': ('y',)},
+                         {k: ruly_dmn.common.HitPolicy.FIRST
+                          for k in ('y', 'z', 'u', 'v')},
+                         rules),
+        lambda _: MockRuleFactory(), indexed=indexed, compiled=compiled,
+        instrumentation=stats)
+    assert dmn.decide_all({'x': 1}, ['z', 'u', 'v']) == {
+        'z': 3, 'u': 4, 'v': 5}
+    assert dmn.decide_all({'x': 2}, ['z', 'y']) == {'z': None, 'y': None}
+    snapshot = stats.snapshot()
+    assert set(snapshot.decisions) == {'z', 'u', 'y'}
+    if not compiled:
+        assert {name: table.evaluations
+                for name, table in snapshot.tables.items()} == {
+                    'y': 3, 'z': 2, 'u': 1}
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_session(indexed):
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 2}),
+             ruly.Rule(ruly.EqualsCondition('y', 2), {'z': 3}),
+             ruly.Rule(ruly.EqualsCondition('w', 1), {'u': 4})]
+    stats = ruly_dmn.instrumentation.Stats()
+    dmn = ruly_dmn.dmn.DMN(
+        MockModelHandler({'y': ('x',), 'z': ('y',), 'u': ('w',)},
+                         {k: ruly_dmn.common.HitPolicy.FIRST
+                          for k in ('y', 'z', 'u')},
+                         rules),
+        lambda _: MockRuleFactory(), indexed=indexed, instrumentation=stats)
+
+    def evaluations():
+        return {name: table.evaluations
+                for name, table in stats.snapshot().tables.items()}
+
+    session = dmn.session({'x': 1, 'w': 1})
+    assert session.decide('z') == 3
+    assert session.decide('u') == 4
+    assert session.decide('z') == 3
+    assert session.decisions == {'y': 2, 'z': 3, 'u': 4}
+    assert evaluations() == {'y': 1, 'z': 1, 'u': 1}
+
+    assert session.update({'w': 2, 'x': 1}) == {'u'}
+    assert session.decide('z') == 3
+    assert session.decide('u') is None
+    assert evaluations() == {'y': 1, 'z': 1, 'u': 2}
+
+    dmn.learn([{'w': 2, 'u': 5}], ['u'])
+    assert session.decide('z') == 3
+    assert session.decide('u') == 5
+    assert evaluations() == {'y': 1, 'z': 1, 'u': 3}
+
+    assert session.update({'x': None}) == {'y', 'z'}
+    assert session.inputs == {'w': 2}
+    assert session.decide('z') is None
+    assert session.decisions == {'u': 5}
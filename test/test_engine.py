@@ -0,0 +1,120 @@
+import itertools
+from pathlib import Path
+import pytest
+import ruly
+
+import ruly_dmn.common
+import ruly_dmn.conditions
+import ruly_dmn.dmn
+import ruly_dmn.engine
+from ruly_dmn.handlers.camunda_modeler import CamundaModelerHandler
+
+
+example_path = (Path(__file__).parent.parent / 'examples' / '0001' /
+                'diagram.dmn')
+
+
+def _rule(conditions, consequent):
+    return ruly.Rule(
+        ruly.Expression(ruly.Operator.AND,
+                        tuple(ruly.EqualsCondition(name, value)
+                              for name, value in conditions.items())),
+        consequent)
+
+
+@pytest.mark.parametrize('rules,state,expected_indices', [
+    ([_rule({'x': 1}, {'y': 1}), _rule({'x': 2}, {'y': 2})],
+     {'x': 2, 'y': None}, [1]),
+    ([_rule({'x': 1}, {'y': 1}), _rule({}, {'y': 2}),
+      _rule({'x': 1, 'z': 3}, {'y': 3})],
+     {'x': 1, 'z': 3, 'y': None}, [0, 1, 2]),
+    ([_rule({'z': 3}, {'y': 1}), _rule({'x': 1}, {'y': 2})],
+     {'x': 1, 'z': 3, 'y': None}, [0, 1]),
+    ([_rule({'x': [1]}, {'y': 1}), _rule({'x': 1}, {'y': 2})],
+     {'x': [1], 'y': None}, [0]),
+    ([ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 1})],
+     {'x': 1, 'y': None}, [0]),
+    ([_rule({'x': 1}, {'y': 1})], {'x': 2, 'y': None}, []),
+])
+def test_fired_rules(rules, state, expected_indices):
+    engine = ruly_dmn.engine.IndexedEngine(ruly.KnowledgeBase(*rules))
+    assert (engine.fired_rules(state, 'y') ==
+            [rules[i] for i in expected_indices])
+
+
+def test_unary_tests():
+    cells = [('< 18', None), ('[18..65]', None), ('> 65', None),
+             ('[18..65]', '"a"'), ('not(1, 2)', None), ('0, [3..5)', '"b"'),
+             ('"x"', None), (None, '"a", "b"'), ('"a", > 70', None),
+             (None, None)]
+    rules = [ruly.Rule(ruly.Expression(ruly.Operator.AND, tuple(
+        condition for condition in (
+            ruly_dmn.conditions.parse_unary_tests('x', x_text),
+            ruly_dmn.conditions.parse_unary_tests('z', z_text))
+        if condition is not None)), {'y': i})
+        for i, (x_text, z_text) in enumerate(cells)]
+    knowledge_base = ruly.KnowledgeBase(*rules)
+    linear = ruly_dmn.engine.LinearEngine(knowledge_base)
+    indexed = ruly_dmn.engine.IndexedEngine(knowledge_base)
+    for x, z in itertools.product([None, -1, 0, 1, 3, 5, 18, 40.5, 65, 70,
+                                   'x'],
+                                  [None, 'a', 'b', 'c']):
+        state = {'x': x, 'z': z, 'y': None}
+        assert (indexed.fired_rules(state, 'y') ==
+                linear.fired_rules(state, 'y'))
+
+
+def test_backward_chain():
+    rules = [_rule({'x': 1}, {'y': 2}),
+             _rule({'y': 2, 'w': 1}, {'z': 3}),
+             _rule({'y': 2}, {'z': 4})]
+    knowledge_base = ruly.KnowledgeBase(*rules)
+    engine = ruly_dmn.engine.IndexedEngine(knowledge_base)
+    for inputs in ({'x': 1}, {'x': 1, 'w': 1}, {'x': 2}):
+        assert (engine.backward_chain('z', **inputs) ==
+                ruly.backward_chain(knowledge_base, 'z', **inputs))
+
+
+def test_updated():
+    rules = [_rule({'x': 1}, {'y': 2}),
+             _rule({'y': 2}, {'z': 3})]
+    engine = ruly_dmn.engine.IndexedEngine(ruly.KnowledgeBase(*rules))
+    new_rule = _rule({'x': 2, 'w': 1}, {'y': 5})
+    knowledge_base = ruly.KnowledgeBase(new_rule, *rules)
+    updated = engine.updated(knowledge_base, ['y'])
+    assert updated.knowledge_base is knowledge_base
+    assert updated._tables['z'] is engine._tables['z']
+    assert updated._tables['y'] is not engine._tables['y']
+    for inputs in ({'x': 1}, {'x': 2, 'w': 1}, {'x': 2}):
+        assert (updated.backward_chain('y', **inputs) ==
+                ruly.backward_chain(knowledge_base, 'y', **inputs))
+    assert engine.fired_rules({'x': 2, 'w': 1}, 'y') == []
+
+
+@pytest.mark.parametrize('decision', ['Dish', 'Beverage'])
+def test_indexed_dmn(decision):
+    handler = CamundaModelerHandler(example_path)
+
+    def factory_cb(handler):
+        return MockRuleFactory()
+
+    linear = ruly_dmn.dmn.DMN(handler, factory_cb)
+    indexed = ruly_dmn.dmn.DMN(handler, factory_cb, indexed=True)
+    records = [{'Season': season,
+                'Vegetarian Guests': vegetarian,
+                'Guests with children': children}
+               for season, vegetarian, children in itertools.product(
+                   ['Fall', 'Winter', 'Spring', 'Summer', 'Monsoon'],
+                   [True, False, None],
+                   [True, False, None])]
+    expected = [linear.decide(inputs, decision) for inputs in records]
+    assert [indexed.decide(inputs, decision)
+            for inputs in records] == expected
+    assert linear.decide_many(records, decision) == expected
+    assert indexed.decide_many(records, decision) == expected
+
+
+class MockRuleFactory(ruly_dmn.common.RuleFactory):
+
+    def create_rule(self, state, fired_rules, output_names):
+        return None
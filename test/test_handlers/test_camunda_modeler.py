@@ -0,0 +1,259 @@
+from pathlib import Path
+import shutil
+import pytest
+import ruly
+
+import ruly_dmn.artifact
+import ruly_dmn.common
+import ruly_dmn.conditions
+import ruly_dmn.dmn
+import ruly_dmn.instrumentation
+from ruly_dmn.handlers.camunda_modeler import CamundaModelerHandler
+
+
+example_path = (Path(__file__).parent.parent.parent / 'examples' / '0001' /
+                'diagram.dmn')
+
+
+class MockRuleFactory(ruly_dmn.common.RuleFactory):
+
+    def __init__(self, new_rules):
+        self._new_rules = new_rules
+
+    def create_rule(self, state, fired_rules, output_name):
+        for rule in self._new_rules:
+            if (output_name in rule.consequent
+                    and ruly.evaluate(state, rule.antecedent)):
+                return rule
+
+
+def _rule(conditions, consequent):
+    return ruly.Rule(
+        ruly.Expression(ruly.Operator.AND,
+                        tuple(ruly.EqualsCondition(name, value)
+                              for name, value in conditions.items())),
+        consequent)
+
+
+def test_parse():
+    handler = CamundaModelerHandler(example_path)
+    assert handler.dependencies == {
+        'Dish': ['Season', 'Vegetarian Guests'],
+        'Beverage': ['Dish', 'Guests with children']}
+    assert handler.hit_policies == {
+        'Dish': ruly_dmn.common.HitPolicy.FIRST,
+        'Beverage': ruly_dmn.common.HitPolicy.FIRST}
+    assert len(handler.rules) == 11
+    assert handler.rules[0] == _rule({'Season': 'Fall'},
+                                     {'Dish': 'Spareribs'})
+    assert handler.rules[-1] == _rule({}, {'Beverage': 'Water'})
+
+
+def test_lazy_parse():
+    handler = CamundaModelerHandler(example_path)
+    lazy_handler = CamundaModelerHandler(example_path, lazy=True)
+    assert lazy_handler.dependencies == handler.dependencies
+    assert lazy_handler.hit_policies == handler.hit_policies
+    assert lazy_handler.rules == []
+
+    assert lazy_handler.load_rules(['Season', 'Dish']) == handler.rules[:5]
+    assert lazy_handler.load_rules(['Dish']) == []
+    assert lazy_handler.load_rules(['Beverage']) == handler.rules[5:]
+    assert lazy_handler.rules == handler.rules
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_parse_hit_policy_values(tmp_path, lazy):
+    path = tmp_path / 'diagram.dmn'
+    text = example_path.read_text()
+    text = text.replace('<decisionTable id="DecisionTable_082ueac" '
+                        'hitPolicy="FIRST">',
+                        '<decisionTable id="DecisionTable_082ueac" '
+                        'hitPolicy="COLLECT" aggregation="COUNT">')
+    text = text.replace('<output id="OutputClause_1hjiayc" name="Dish" '
+                        'typeRef="string" />',
+                        '<output id="OutputClause_1hjiayc" name="Dish" '
+                        'typeRef="string"><outputValues><text>'
+                        '"Stew","Roastbeef"</text></outputValues></output>')
+    path.write_text(text)
+
+    handler = CamundaModelerHandler(path, lazy=lazy)
+    assert handler.hit_policies == {
+        'Dish': ruly_dmn.common.HitPolicy.COLLECT_COUNT,
+        'Beverage': ruly_dmn.common.HitPolicy.FIRST}
+    assert handler.output_values == {'Dish': ['Stew', 'Roastbeef']}
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_update(tmp_path, lazy):
+    path = tmp_path / 'diagram.dmn'
+    shutil.copy(example_path, path)
+    new_rules = [_rule({'Season': 'Monsoon'}, {'Dish': 'Curry'}),
+                 _rule({'Dish': 'Curry'}, {'Beverage': 'Lassi'}),
+                 _rule({'Season': 'Spring', 'Vegetarian Guests': True},
+                       {'Dish': 'Risotto'})]
+    handler = CamundaModelerHandler(path, path, lazy=lazy)
+    dmn = ruly_dmn.dmn.DMN(handler, lambda _: MockRuleFactory(new_rules))
+
+    assert dmn.decide({'Season': 'Monsoon'}, 'Dish') == 'Curry'
+    assert dmn.decide({'Season': 'Monsoon'}, 'Beverage') == 'Lassi'
+    assert dmn.decide({'Season': 'Spring', 'Vegetarian Guests': True},
+                      'Dish') == 'Risotto'
+
+    rules = CamundaModelerHandler(path).rules
+    assert len(rules) == 14
+    assert rules[2] == new_rules[2]
+    assert rules[6] == new_rules[0]
+    assert rules[-2] == new_rules[1]
+
+
+def test_unary_tests(tmp_path):
+    path = tmp_path / 'diagram.dmn'
+    text = example_path.read_text()
+    text = text.replace('<text>"Fall"</text>', '<text>"Fall", "Winter"</text>',
+                        1)
+    path.write_text(text)
+    handler = CamundaModelerHandler(path, path)
+    assert handler.rules[0].antecedent.children == (
+        ruly_dmn.conditions.AnyCondition('Season', (
+            ruly.EqualsCondition('Season', 'Fall'),
+            ruly.EqualsCondition('Season', 'Winter'))),)
+
+    antecedent = ruly.Expression(ruly.Operator.AND, (
+        ruly_dmn.conditions.parse_unary_tests('Season', 'not("Fall")'),
+        ruly_dmn.conditions.parse_unary_tests('Vegetarian Guests',
+                                              '[false..true)')))
+    rule = ruly.Rule(antecedent, {'Dish': 'Curry'})
+    rules = [rule, *handler.rules]
+    handler.update(ruly.KnowledgeBase(*rules))
+    assert CamundaModelerHandler(path).rules == rules
+
+
+def test_update_dirty_tables(tmp_path):
+    dump_path = tmp_path / 'diagram.dmn'
+    stats = ruly_dmn.instrumentation.Stats()
+    handler = CamundaModelerHandler(example_path, dump_path,
+                                    instrumentation=stats)
+    rules = list(handler.rules)
+    handler.update(ruly.KnowledgeBase(*rules))
+    assert not dump_path.exists()
+
+    new_rules = [_rule({'Season': 'Monsoon'}, {'Dish': 'Curry'}),
+                 _rule({'Season': 'Spring', 'Vegetarian Guests': True},
+                       {'Dish': 'Risotto'})]
+    rules = [rules[0], new_rules[1], *rules[1:5], new_rules[0], *rules[5:]]
+    handler.update(ruly.KnowledgeBase(*rules))
+    assert CamundaModelerHandler(dump_path).rules == rules
+    assert stats.snapshot().dumps.count == 1
+
+    dump_path.unlink()
+    handler.update(ruly.KnowledgeBase(*rules))
+    assert not dump_path.exists()
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_export_model(tmp_path, lazy):
+    dump_path = tmp_path / 'diagram.dmn'
+    handler = CamundaModelerHandler(example_path, dump_path, lazy=lazy)
+    handler.load_rules(handler.dependencies)
+    rules = list(handler.rules)
+    new_rules = [_rule({'Season': 'Monsoon'}, {'Dish': 'Curry'}),
+                 _rule({'Season': 'Spring', 'Vegetarian Guests': True},
+                       {'Dish': 'Risotto'})]
+    rules = [rules[0], new_rules[1], *rules[1:5], new_rules[0], *rules[5:]]
+    handler.update(ruly.KnowledgeBase(*rules))
+
+    model = handler.export_model()
+    assert model == CamundaModelerHandler(dump_path).export_model()
+    assert [consequent for _, _, consequent in model['rules']] == [
+        rule.consequent for rule in rules]
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_remove_rules(tmp_path, lazy):
+    dump_path = tmp_path / 'diagram.dmn'
+    handler = CamundaModelerHandler(example_path, dump_path, lazy=lazy)
+    handler.load_rules(handler.dependencies)
+    rules = handler.rules
+    new_rule = _rule({'Season': 'Monsoon'}, {'Dish': 'Curry'})
+    handler.update(ruly.KnowledgeBase(*rules, new_rule))
+
+    assert handler.remove_rules([rules[1], new_rule, rules[1]]) == 2
+    assert handler.rules == [rules[0], *rules[2:]]
+    assert CamundaModelerHandler(dump_path).rules == [rules[0], *rules[2:]]
+    assert handler.remove_rules([new_rule]) == 0
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_multiple_outputs(tmp_path, lazy):
+    path = tmp_path / 'diagram.dmn'
+    text = example_path.read_text()
+    dish_start = text.index('<output id="OutputClause_1hjiayc"')
+    dish_end = text.index('</decisionTable>')
+    dish_table = text[dish_start:dish_end].replace(
+        'typeRef="string" />',
+        'typeRef="string" /><output id="Output_Side" name="Side" '
+        'typeRef="string"><outputValues><text>"Salad","Bread"</text>'
+        '</outputValues></output>', 1)
+    dish_table = dish_table.replace(
+        '</outputEntry>',
+        '</outputEntry><outputEntry><text></text></outputEntry>')
+    dish_table = dish_table.replace(
+        '"Spareribs"</text>\n        </outputEntry><outputEntry><text>',
+        '"Spareribs"</text>\n        </outputEntry><outputEntry><text>'
+        '"Bread"')
+    path.write_text(text[:dish_start] + dish_table + text[dish_end:])
+
+    new_rule = _rule({'Season': 'Monsoon'}, {'Dish': 'Curry',
+                                             'Side': 'Salad'})
+    handler = CamundaModelerHandler(path, path, lazy=lazy)
+    assert handler.dependencies['Side'] == ['Season', 'Vegetarian Guests']
+    assert handler.output_values == {'Side': ['Salad', 'Bread']}
+    handler.load_rules(['Side'])
+    rules = handler.rules
+    assert rules[0] == _rule({'Season': 'Fall'}, {'Dish': 'Spareribs',
+                                                  'Side': 'Bread'})
+    assert rules[1] == _rule({'Season': 'Winter'}, {'Dish': 'Roastbeef'})
+
+    dmn = ruly_dmn.dmn.DMN(handler, lambda _: MockRuleFactory([new_rule]))
+    assert dmn.decide_all({'Season': 'Fall'}, ['Side', 'Dish']) == {
+        'Side': 'Bread', 'Dish': 'Spareribs'}
+    assert dmn.decide_all({'Season': 'Monsoon'}, ['Dish', 'Side']) == {
+        'Dish': 'Curry', 'Side': 'Salad'}
+    handler.close()
+
+    rules = CamundaModelerHandler(path).rules
+    assert new_rule in rules
+    assert rules[1] == _rule({'Season': 'Winter'}, {'Dish': 'Roastbeef'})
+
+    artifact_path = ruly_dmn.artifact.compile_model(path)
+    compiled_handler = CamundaModelerHandler(path,
+                                             artifact_path=artifact_path)
+    assert compiled_handler.rules == rules
+    assert compiled_handler.dependencies['Side'] == ['Season',
+                                                     'Vegetarian Guests']
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_analyze_learn_dump(tmp_path, lazy):
+    path = tmp_path / 'diagram.dmn'
+    text = example_path.read_text()
+    rule_start = text.index('<rule id="DecisionRule_1c70b33">')
+    duplicate = text[text.index('<rule id="DecisionRule_0ce297f">'):
+                     rule_start].replace('DecisionRule_0ce297f',
+                                         'DecisionRule_duplicate')
+    path.write_text(text[:rule_start] + duplicate + text[rule_start:])
+    dump_path = tmp_path / 'dump.dmn'
+    handler = CamundaModelerHandler(path, dump_path, lazy=lazy)
+    new_rule = _rule({'Season': 'Monsoon'}, {'Dish': 'Curry'})
+    dmn = ruly_dmn.dmn.DMN(handler, lambda _: MockRuleFactory([new_rule]),
+                           analyze=True)
+    assert dmn.decide({'Season': 'Monsoon',
+                       'Vegetarian Guests': False}, 'Dish') == 'Curry'
+    assert [issue.kind for issue in dmn.issues] == ['unreachable']
+    assert len(dmn.knowledge_base.output_rules('Dish')) == 6
+
+    handler.flush()
+    dumped_rules = CamundaModelerHandler(dump_path).rules
+    assert new_rule in dumped_rules
+    assert len(dumped_rules) == len(CamundaModelerHandler(path).rules) + 1
@@ -0,0 +1,87 @@
+import random
+
+import ruly
+
+import ruly_dmn.knowledge_base
+
+
+def test_insert():
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 1}),
+             ruly.Rule(ruly.EqualsCondition('y', 1), {'z': 1}),
+             ruly.Rule(ruly.EqualsCondition('x', 2), {'y': 2})]
+    knowledge_base = ruly_dmn.knowledge_base.KnowledgeBase(*rules)
+    assert knowledge_base.input_variables == {'x'}
+    assert knowledge_base.derived_variables == {'y', 'z'}
+
+    new_rule = ruly.Rule(ruly.EqualsCondition('x', 3), {'y': 3})
+    assert new_rule not in knowledge_base
+    knowledge_base.insert(knowledge_base.index(rules[2]), new_rule)
+    assert new_rule in knowledge_base
+    assert (ruly.Rule(ruly.EqualsCondition('x', 3), {'y': 3})
+            in knowledge_base)
+    assert knowledge_base.rules == (rules[0], rules[1], new_rule, rules[2])
+    assert knowledge_base.output_rules('y') == [rules[0], new_rule, rules[2]]
+    assert knowledge_base.index(rules[2]) == 3
+
+    nested_rule = ruly.Rule(ruly.EqualsCondition('w', [1]), {'z': {}})
+    knowledge_base.insert(0, nested_rule)
+    assert nested_rule in knowledge_base
+    assert knowledge_base.input_variables == {'x', 'w'}
+    assert knowledge_base.output_rules('z') == [nested_rule, rules[1]]
+
+
+def test_copy():
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 1}),
+             ruly.Rule(ruly.EqualsCondition('x', 2), {'y': 2})]
+    knowledge_base = ruly_dmn.knowledge_base.KnowledgeBase(*rules)
+    copy = knowledge_base.copy()
+    new_rule = ruly.Rule(ruly.EqualsCondition('z', 3), {'w': 3})
+    copy.insert(copy.index(rules[1]), new_rule)
+
+    assert copy.rules == (rules[0], new_rule, rules[1])
+    assert new_rule in copy
+    assert copy.input_variables == {'x', 'z'}
+    assert knowledge_base.rules == tuple(rules)
+    assert new_rule not in knowledge_base
+    assert knowledge_base.input_variables == {'x'}
+    assert knowledge_base.output_rules('w') == []
+
+
+def test_insert_positions():
+    rng = random.Random(0)
+    knowledge_base = ruly_dmn.knowledge_base.KnowledgeBase()
+    rules = []
+    for i in range(200):
+        rule = ruly.Rule(ruly.EqualsCondition('x', i),
+                         {rng.choice(['y', 'z']): i})
+        index = rng.randint(0, len(rules) + 5)
+        knowledge_base.insert(index, rule)
+        rules.insert(index, rule)
+        if rng.random() < 0.3:
+            checked = rng.choice(rules)
+            assert knowledge_base.index(checked) == rules.index(checked)
+    assert knowledge_base.rules == tuple(rules)
+    for output_name in ('y', 'z'):
+        assert knowledge_base.output_rules(output_name) == [
+            rule for rule in rules if output_name in rule.consequent]
+    assert [knowledge_base.index(rule) for rule in rules] == list(
+        range(len(rules)))
+
+
+def test_revision():
+    rules = [ruly.Rule(ruly.EqualsCondition('x', 1), {'y': 1}),
+             ruly.Rule(ruly.EqualsCondition('x', 2), {'z': 2})]
+    knowledge_base = ruly_dmn.knowledge_base.KnowledgeBase(*rules)
+    assert knowledge_base.revision('w') == 0
+    revision = knowledge_base.revision('y')
+    assert revision > 0
+
+    copy = knowledge_base.copy()
+    assert copy.revision('y') == revision
+    copy.insert(0, ruly.Rule(ruly.EqualsCondition('x', 3), {'y': 3}))
+    assert copy.revision('y') != revision
+    assert copy.revision('z') == knowledge_base.revision('z')
+    assert knowledge_base.revision('y') == revision
+
+    other = ruly_dmn.knowledge_base.KnowledgeBase(*rules)
+    assert other.revision('y') not in (revision, copy.revision('y'))
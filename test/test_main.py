@@ -0,0 +1,19 @@
+import shutil
+import sys
+
+import ruly_dmn.main
+from test_artifact import example_path
+
+
+def test_command_named_file(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(example_path, tmp_path / 'diagram.dmn')
+    monkeypatch.setattr(sys, 'argv', ['ruly-dmn', 'compile', 'diagram.dmn'])
+    ruly_dmn.main.main()
+    assert (tmp_path / 'diagram.dmn.compiled').exists()
+
+    shutil.copy(example_path, tmp_path / 'compile')
+    monkeypatch.setattr(sys, 'argv', ['ruly-dmn', 'compile', 'Dish',
+                                      'Season=Fall'])
+    ruly_dmn.main.main()
+    assert capsys.readouterr().out.endswith('Dish = Spareribs\n')
@@ -0,0 +1,120 @@
+import threading
+import pytest
+import ruly
+
+import ruly_dmn.persistence
+from ruly_dmn.handlers.camunda_modeler import CamundaModelerHandler
+
+from test_artifact import example_path
+
+
+def test_atomic_write(tmp_path):
+    path = tmp_path / 'file'
+    ruly_dmn.persistence.atomic_write(path, lambda f: f.write(b'old'))
+
+    def write(f):
+        f.write(b'new')
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        ruly_dmn.persistence.atomic_write(path, write)
+    assert path.read_bytes() == b'old'
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_synchronous():
+    dumps = []
+    persister = ruly_dmn.persistence.Persister(lambda: dumps.append(1))
+    persister.schedule()
+    persister.schedule()
+    assert len(dumps) == 2
+    persister.flush()
+    persister.close()
+    assert len(dumps) == 2
+
+
+def test_flush_count():
+    dumped = threading.Event()
+    dumps = []
+
+    def dump():
+        dumps.append(1)
+        dumped.set()
+
+    persister = ruly_dmn.persistence.Persister(dump, flush_count=3)
+    persister.schedule()
+    persister.schedule()
+    assert len(dumps) == 0
+    persister.schedule()
+    assert dumped.wait(5)
+    assert len(dumps) == 1
+
+    persister.schedule()
+    persister.close()
+    assert len(dumps) == 2
+
+
+def test_flush_count_during_dump():
+    dumping = threading.Event()
+    release = threading.Event()
+    dumped = threading.Semaphore(0)
+
+    def dump():
+        dumping.set()
+        release.wait(5)
+        dumped.release()
+
+    persister = ruly_dmn.persistence.Persister(dump, flush_count=1)
+    persister.schedule()
+    assert dumping.wait(5)
+    persister.schedule()
+    release.set()
+    assert dumped.acquire(timeout=5)
+    assert dumped.acquire(timeout=5)
+    persister.close()
+
+
+def test_cancel():
+    dumps = []
+    persister = ruly_dmn.persistence.Persister(lambda: dumps.append(1),
+                                               flush_count=10)
+    persister.schedule()
+    persister.cancel()
+    persister.schedule()
+    persister.flush()
+    assert dumps == []
+
+
+def test_flush_interval():
+    dumped = threading.Event()
+    persister = ruly_dmn.persistence.Persister(dumped.set,
+                                               flush_interval=0.01)
+    persister.schedule()
+    assert dumped.wait(5)
+    persister.close()
+
+
+def test_background_error():
+    def dump():
+        raise ValueError()
+
+    persister = ruly_dmn.persistence.Persister(dump, flush_count=1)
+    persister.schedule()
+    with pytest.raises(ValueError):
+        persister.close()
+
+
+def test_handler_flush(tmp_path):
+    dump_path = tmp_path / 'diagram.dmn'
+    handler = CamundaModelerHandler(example_path, dump_path,
+                                    flush_interval=60)
+    new_rule = ruly.Rule(
+        ruly.Expression(ruly.Operator.AND,
+                        (ruly.EqualsCondition('Season', 'Monsoon'),)),
+        {'Dish': 'Curry'})
+    rules = [*handler.rules[:5], new_rule, *handler.rules[5:]]
+    handler.update(ruly.KnowledgeBase(*rules))
+    assert not dump_path.exists()
+    handler.flush()
+    assert CamundaModelerHandler(dump_path).rules == rules
+    handler.close()
@@ -0,0 +1,45 @@
+import pytest
+import ruly
+
+import ruly_dmn.planner
+
+
+def test_create_plan():
+    graph = ruly_dmn.planner.dependency_graph({'a': ('b', 'x'),
+                                               'b': ('c', 'y'),
+                                               'c': ('x',),
+                                               'd': ('z',)})
+    plan = ruly_dmn.planner.create_plan(graph, 'a')
+    assert plan.goal == 'a'
+    assert plan.order == ('c', 'b', 'a')
+    assert plan.inputs == ('x', 'y')
+    assert 'd' not in plan.dependencies
+    assert set(ruly_dmn.planner.plan_variables(plan)) == {'a', 'b', 'c',
+                                                          'x', 'y'}
+
+
+def test_add_rules():
+    graph = ruly_dmn.planner.dependency_graph({'a': ('x',)})
+    assert ruly_dmn.planner.add_rules(
+        graph, [ruly.Rule(ruly.EqualsCondition('x', 1), {'a': 1})]) is graph
+
+    new_graph = ruly_dmn.planner.add_rules(
+        graph, [ruly.Rule(ruly.EqualsCondition('w', 1), {'a': 1})])
+    assert new_graph == {'a': ('x', 'w')}
+    assert graph == {'a': ('x',)}
+
+
+@pytest.mark.parametrize('dependencies', [
+    {'a': ('a',)},
+    {'a': ('b',), 'b': ('c',), 'c': ('a', 'x')},
+])
+def test_cycle(dependencies):
+    graph = ruly_dmn.planner.dependency_graph(dependencies)
+    with pytest.raises(ruly_dmn.planner.ModelError,
+                       match='cyclic dependency: a -> .*a$'):
+        ruly_dmn.planner.create_plan(graph, 'a')
+
+
+def test_unnamed_input():
+    with pytest.raises(ruly_dmn.planner.ModelError):
+        ruly_dmn.planner.dependency_graph({'a': ('x', '')})
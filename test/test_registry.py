@@ -0,0 +1,93 @@
+from pathlib import Path
+import os
+import shutil
+import time
+
+import ruly
+
+import ruly_dmn.common
+import ruly_dmn.dmn
+import ruly_dmn.registry
+
+
+example_path = (Path(__file__).parent.parent / 'examples' / '0001' /
+                'diagram.dmn')
+
+
+class MockRuleFactory(ruly_dmn.common.RuleFactory):
+
+    def __init__(self, new_rule):
+        self._new_rule = new_rule
+
+    def create_rule(self, state, fired_rules, output_name):
+        if len(fired_rules) == 0 and output_name in self._new_rule.consequent:
+            return self._new_rule
+
+
+def _edit(path, old, new):
+    stat = path.stat()
+    path.write_text(path.read_text().replace(old, new))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_reload(tmp_path):
+    path = tmp_path / 'diagram.dmn'
+    shutil.copy(example_path, path)
+    registry = ruly_dmn.registry.Registry(watch=False)
+    model = registry.add('a', path)
+    assert registry.add('b', path) is model
+    assert dict(registry) == {'a': model, 'b': model}
+    assert model.decide({'Season': 'Fall'}, 'Dish') == 'Spareribs'
+    assert registry.check() == []
+
+    _edit(path, '"Spareribs"', '"Ribs"')
+    assert registry.check() == ['a', 'b']
+    new_model = registry['a']
+    assert new_model is not model and registry['b'] is new_model
+    assert new_model.decide({'Season': 'Fall'}, 'Dish') == 'Ribs'
+    assert model.decide({'Season': 'Fall'}, 'Dish') == 'Spareribs'
+
+    _edit(path, '<decision', '<decision<')
+    assert registry.check() == []
+    assert isinstance(registry.errors['a'], Exception)
+    assert registry['a'] is new_model
+
+    _edit(path, '<decision<', '<decision')
+    assert registry.check() == []
+    assert registry.errors == {}
+    assert registry['a'] is new_model
+
+    registry.remove('a')
+    assert list(registry) == ['b']
+    registry.close()
+    assert len(registry) == 0
+
+
+def test_own_dump(tmp_path):
+    path = tmp_path / 'diagram.dmn'
+    shutil.copy(example_path, path)
+    new_rule = ruly.Rule(ruly.Expression(ruly.Operator.AND, (
+        ruly.EqualsCondition('Season', 'Monsoon'),)), {'Dish': 'Curry'})
+    registry = ruly_dmn.registry.Registry(
+        lambda handler: ruly_dmn.dmn.DMN(
+            handler, lambda _: MockRuleFactory(new_rule)),
+        write=True, watch=False)
+    model = registry.add('a', path)
+    assert model.decide({'Season': 'Monsoon'}, 'Dish') == 'Curry'
+    assert new_rule.antecedent.children[0].value in path.read_text()
+    assert registry.check() == []
+    assert registry['a'] is model
+    registry.close()
+
+
+def test_watch(tmp_path):
+    path = tmp_path / 'diagram.dmn'
+    shutil.copy(example_path, path)
+    registry = ruly_dmn.registry.Registry(poll_interval=0.01)
+    model = registry.add('a', path)
+    _edit(path, '"Spareribs"', '"Ribs"')
+    deadline = time.monotonic() + 5
+    while registry['a'] is model and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert registry['a'].decide({'Season': 'Fall'}, 'Dish') == 'Ribs'
+    registry.close()
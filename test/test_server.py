@@ -0,0 +1,105 @@
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+import ruly_dmn.dmn
+import ruly_dmn.server
+from ruly_dmn.handlers.camunda_modeler import CamundaModelerHandler
+from test_artifact import example_path
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, path):
+        super().__init__('localhost')
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self._path)
+
+
+@pytest.fixture(params=['tcp', 'unix'])
+def connection(request, tmp_path):
+    dmn = ruly_dmn.dmn.DMN(CamundaModelerHandler(example_path),
+                           ruly_dmn.server.rule_factory_cb)
+    if request.param == 'tcp':
+        server = ruly_dmn.server.create_server({'example': dmn})
+        connection = http.client.HTTPConnection(*server.server_address)
+    else:
+        path = str(tmp_path / 'server.sock')
+        server = ruly_dmn.server.create_server({'example': dmn},
+                                               unix_path=path)
+        connection = UnixHTTPConnection(path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield connection
+    connection.close()
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def request(connection, method, path, body=None):
+    connection.request(method, path,
+                       body=json.dumps(body) if body is not None else None)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_models(connection):
+    assert request(connection, 'GET', '/models') == (200, {
+        'example': {'decisions': ['Dish', 'Beverage'],
+                    'inputs': ['Guests with children', 'Season',
+                               'Vegetarian Guests']}})
+    assert request(connection, 'GET', '/other')[0] == 404
+
+
+def test_decide(connection):
+    path = '/models/example/decide'
+    assert request(connection, 'POST', path, {
+        'inputs': {'Season': 'Spring'},
+        'goals': ['Dish', 'Beverage']}) == (200, {
+            'decisions': {'Dish': 'Steak', 'Beverage': 'Pinot Noir'}})
+    assert request(connection, 'POST', path, [
+        {'inputs': {'Season': 'Winter'}, 'goals': ['Dish']},
+        {'inputs': {}, 'goals': ['Dish']},
+        {'inputs': {}, 'goals': ['Other']},
+        {'inputs': {'Season': 'Monsoon'}, 'goals': ['Dish'],
+         'expected': {'Dish': 'Curry'}},
+        {'inputs': {'Season': 'Monsoon'}, 'goals': ['Dish']}]) == (200, [
+            {'decisions': {'Dish': 'Roastbeef'}},
+            {'decisions': {'Dish': None}},
+            {'error': "unknown decisions: ['Other']"},
+            {'decisions': {'Dish': 'Curry'}},
+            {'decisions': {'Dish': 'Curry'}}])
+    assert request(connection, 'POST', '/models/other/decide', {})[0] == 404
+
+
+def test_internal_error():
+
+    class FailingModel:
+        decisions = ['x']
+        inputs = set()
+
+        def decide_all(self, inputs, goals):
+            raise RuntimeError('failed')
+
+    server = ruly_dmn.server.create_server({'failing': FailingModel()})
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    connection = http.client.HTTPConnection(*server.server_address)
+    try:
+        path = '/models/failing/decide'
+        for body in [{'goals': ['x']}, [{'goals': []}, {'goals': ['x']}]]:
+            assert request(connection, 'POST', path, body) == (
+                500, {'error': 'RuntimeError: failed'})
+        assert request(connection, 'GET', '/models')[0] == 200
+    finally:
+        connection.close()
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -0,0 +1,126 @@
+from pathlib import Path
+import random
+
+import pytest
+import ruly
+
+import ruly_dmn.common
+import ruly_dmn.conditions
+import ruly_dmn.dmn
+import ruly_dmn.shared
+from ruly_dmn.handlers.camunda_modeler import CamundaModelerHandler
+
+
+example_path = (Path(__file__).parent.parent / 'examples' / '0001' /
+                'diagram.dmn')
+
+
+class MockModelHandler(ruly_dmn.common.ModelHandler):
+
+    def __init__(self, dependencies, hit_policies, rules, output_values={}):
+        self._dependencies = dependencies
+        self._hit_policies = hit_policies
+        self._rules = rules
+        self._output_values = output_values
+
+    @property
+    def dependencies(self):
+        return self._dependencies
+
+    @property
+    def hit_policies(self):
+        return self._hit_policies
+
+    @property
+    def rules(self):
+        return self._rules
+
+    @property
+    def output_values(self):
+        return self._output_values
+
+    def update(self, knowledge_base):
+        pass
+
+
+class MockRuleFactory(ruly_dmn.common.RuleFactory):
+
+    def create_rule(self, state, fired_rules, output_names):
+        return None
+
+
+def _decide(model, inputs, decision):
+    try:
+        return model.decide(inputs, decision)
+    except (ruly_dmn.dmn.HitPolicyViolation, TypeError) as e:
+        return type(e)
+
+
+def _random_condition(rng, name):
+    if rng.random() < 0.7:
+        return ruly.EqualsCondition(name, rng.choice([1, 2, 3, 'a', True]))
+    tests = ['< 2', '>= 3', '[1..2]', '(1..3]', '1, 3', 'not(2)',
+             'not(< 2, "a")', '"a", > 2']
+    return ruly_dmn.conditions.parse_unary_tests(name, rng.choice(tests))
+
+
+def _random_rules(rng, output_names, inputs, count):
+    rules = []
+    for _ in range(count):
+        children = tuple(_random_condition(rng, name) for name in inputs
+                         if rng.random() < 0.7)
+        rules.append(ruly.Rule(
+            ruly.Expression(ruly.Operator.AND, children),
+            {name: rng.choice([0, 1, 2, 3, [1, 'a']])
+             for name in output_names}))
+    return rules
+
+
+@pytest.mark.parametrize('hit_policy', list(ruly_dmn.common.HitPolicy))
+@pytest.mark.parametrize('seed', range(3))
+def test_equivalence(tmp_path, hit_policy, seed):
+    rng = random.Random(seed)
+    rules = [*_random_rules(rng, ['y'], ['a', 'b', 'c'], 30),
+             *_random_rules(rng, ['z', 'u'], ['a', 'y'], 10)]
+    handler = MockModelHandler(
+        {'y': ['a', 'b', 'c'], 'z': ['a', 'y'], 'u': ['a', 'y']},
+        {'y': hit_policy, 'z': ruly_dmn.common.HitPolicy.FIRST,
+         'u': ruly_dmn.common.HitPolicy.FIRST}, rules,
+        {'y': [3, 1, 2, 0]})
+    dmn = ruly_dmn.dmn.DMN(handler, lambda _: MockRuleFactory(),
+                           indexed=True)
+    model = ruly_dmn.shared.load(
+        ruly_dmn.shared.dump(handler, tmp_path / 'model'))
+    values = [None, 0, 1, 1.0, 2, 3, 2.5, 'a', 'b', True, [1]]
+    for _ in range(200):
+        inputs = {name: rng.choice(values) for name in ('a', 'b', 'c')}
+        if rng.random() < 0.1:
+            inputs['y'] = rng.randint(0, 3)
+        for decision in ('y', 'z', 'u'):
+            assert (_decide(model, inputs, decision)
+                    == _decide(dmn, inputs, decision))
+    model.close()
+
+
+def test_example(tmp_path):
+    handler = CamundaModelerHandler(example_path, lazy=True)
+    path = ruly_dmn.shared.dump(handler, tmp_path / 'diagram.shm')
+    dmn = ruly_dmn.dmn.DMN(CamundaModelerHandler(example_path),
+                           lambda _: MockRuleFactory())
+    model = ruly_dmn.shared.load(path)
+    assert model.size == path.stat().st_size
+    assert set(model.decisions) == set(dmn.decisions)
+    assert model.inputs == dmn.inputs
+    for season in ('Fall', 'Winter', 'Spring', 'Summer', 'Monsoon'):
+        for guests in (1, 4, 8):
+            for vegetarian in (True, False, None):
+                inputs = {'Season': season, 'Number of Guests': guests,
+                          'Vegetarian Guests': vegetarian}
+                for decision in ('Dish', 'Beverage'):
+                    assert (model.decide(inputs, decision)
+                            == dmn.decide(inputs, decision))
+    model.close()
+
+    path.write_bytes(b'not a model')
+    with pytest.raises(ValueError):
+        ruly_dmn.shared.load(path)
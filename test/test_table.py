@@ -0,0 +1,113 @@
+import ruly
+
+import ruly_dmn.conditions
+import ruly_dmn.table
+
+
+def _table():
+    decision_table = ruly_dmn.table.DecisionTable('y', ['x', 'z'])
+    for i, (x_text, z_text, output_value) in enumerate([
+            ('"a"', '< 3', 1),
+            ('"a"', None, [1, 2]),
+            ('"b", "c"', '< 3', 1)]):
+        decision_table.append(
+            [ruly_dmn.conditions.parse_unary_tests('x', x_text),
+             ruly_dmn.conditions.parse_unary_tests('z', z_text)],
+            output_value, f'Rule_{i}')
+    return decision_table
+
+
+def test_rules():
+    decision_table = _table()
+    below_3 = ruly_dmn.conditions.RangeCondition('z', None, 3, False, False)
+    b_or_c = ruly_dmn.conditions.AnyCondition('x', (
+        ruly.EqualsCondition('x', 'b'), ruly.EqualsCondition('x', 'c')))
+    assert len(decision_table) == 3
+    assert decision_table.rules() == [
+        ruly.Rule(ruly.Expression(ruly.Operator.AND, (
+            ruly.EqualsCondition('x', 'a'), below_3)), {'y': 1}),
+        ruly.Rule(ruly.Expression(ruly.Operator.AND, (
+            ruly.EqualsCondition('x', 'a'),)), {'y': [1, 2]}),
+        ruly.Rule(ruly.Expression(ruly.Operator.AND, (b_or_c, below_3)),
+                  {'y': 1})]
+    assert decision_table.rule_id(2) == 'Rule_2'
+
+
+def test_interned():
+    first, _, third = _table().rules()
+    assert first.antecedent.children[1] is third.antecedent.children[1]
+
+
+def test_materialized_once():
+    decision_table = _table()
+    rules = decision_table.rules()
+    assert all(rule is cached for rule, cached
+               in zip(rules, decision_table.rules()))
+    assert decision_table.rule(1) is rules[1]
+
+    decision_table.append([ruly.EqualsCondition('x', 'd'), None], 4,
+                          'Rule_3')
+    decision_table.remove(0)
+    assert decision_table.rules() == [*rules[1:], _rule('d', 4)]
+    assert decision_table.rules()[0] is rules[1]
+
+
+def _rule(x, output_value):
+    return ruly.Rule(ruly.Expression(ruly.Operator.AND,
+                                     (ruly.EqualsCondition('x', x),)),
+                     {'y': output_value})
+
+
+def test_find():
+    decision_table = _table()
+    for index, rule in enumerate(decision_table.rules()):
+        assert decision_table.find(rule) == index
+    assert decision_table.find(_rule('a', 2)) is None
+    assert decision_table.find(_rule('d', 1)) is None
+
+    decision_table.append([ruly.EqualsCondition('x', 'd'), None], 1,
+                          'Rule_3')
+    assert decision_table.find(_rule('d', 1)) == 3
+
+
+def test_interned_types():
+    decision_table = ruly_dmn.table.DecisionTable('y', ['x'])
+    values = [1, True, 1.0, [1], [True], (1,)]
+    for i, value in enumerate(values):
+        decision_table.append([ruly.EqualsCondition('x', value)], value,
+                              f'Rule_{i}')
+    for rule, value in zip(decision_table.rules(), values):
+        assert type(rule.consequent['y']) is type(value)
+        assert rule.consequent['y'] == value
+        condition_value = rule.antecedent.children[0].value
+        assert type(condition_value) is type(value)
+        if isinstance(value, list):
+            assert type(condition_value[0]) is type(value[0])
+    assert [decision_table.find(_rule(value, value))
+            for value in values] == list(range(len(values)))
+
+
+def test_remove():
+    decision_table = _table()
+    rules = decision_table.rules()
+    assert decision_table.find(rules[2]) == 2
+    decision_table.remove(1)
+    assert len(decision_table) == 2
+    assert decision_table.rules() == [rules[0], rules[2]]
+    assert decision_table.rule_id(1) == 'Rule_2'
+    assert decision_table.find(rules[1]) is None
+    assert decision_table.find(rules[2]) == 1
+
+
+def test_multiple_outputs():
+    decision_table = ruly_dmn.table.DecisionTable('y', ['x'], ['y', 'u'])
+    decision_table.append([ruly.EqualsCondition('x', 'a')], (1, 2),
+                          'Rule_0')
+    decision_table.append([ruly.EqualsCondition('x', 'b')], (3, None),
+                          'Rule_1')
+    rules = decision_table.rules()
+    assert [rule.consequent for rule in rules] == [{'y': 1, 'u': 2},
+                                                   {'y': 3}]
+    assert decision_table.find(rules[0]) == 0
+    assert decision_table.find(rules[1]) == 1
+    assert decision_table.find(_rule('a', 1)) is None